@@ -0,0 +1,13 @@
+"""
+Logging handlers dùng trong settings.LOGGING
+"""
+import logging.handlers
+import os
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Như RotatingFileHandler nhưng tạo thư mục chứa file log ở lần ghi đầu tiên, không phải lúc import settings."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
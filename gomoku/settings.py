@@ -92,6 +92,89 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Băm mật khẩu khi đăng nhập/đăng ký chạy ở pool process riêng (xem users/hashing.py);
+# quá số việc đang chạy + đang chờ thì trả 429 ngay
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_QUEUE_SIZE = 32
+
+# Giới hạn số lần thử đăng nhập/đăng ký: (số lần, cửa sổ tính bằng giây)
+AUTH_THROTTLE_IP = (30, 60)
+AUTH_THROTTLE_EMAIL = (10, 300)
+
+# Thời gian tối đa (ms) cho việc tính gợi ý sau mỗi nước đi (xem matches/threats.py)
+HINT_TIME_BUDGET_MS = 20
+
+# Các thay đổi online/offline được gom trong cửa sổ này (giây) rồi phát một lần (xem users/presence.py)
+PRESENCE_BATCH_WINDOW = 1.0
+
+# Giám sát tầng realtime (xem matches/monitoring.py)
+SOCKET_SLOW_HANDLER_MS = 100      # Handler chậm hơn ngưỡng này bị ghi log
+SOCKET_TRACE_SAMPLE_RATE = 0.2    # Tỉ lệ lượt gọi handler được ghi chi tiết các đoạn chờ
+LOOP_LAG_INTERVAL = 0.5           # Chu kỳ đo độ trễ event loop (giây)
+LOOP_LAG_WARN_MS = 100
+PROFILER_INTERVAL_MS = 5
+
+# Flood control sự kiện Socket.IO (xem matches/flood.py): (token hồi mỗi giây, tối đa)
+SOCKET_EVENT_BUDGETS = {
+    'default': (5, 10),
+    'make_move': (4, 8),
+    'send_message': (2, 5),
+    'join_room': (1, 5),
+    'watch_replay': (0.5, 3),
+}
+SOCKET_USER_BUDGET = (20, 40)   # Tổng mọi sự kiện của một người dùng trên mọi tab
+SOCKET_FLOOD_STRIKES = (1, 20)  # Số lần vượt ngân sách cho phép trước khi ngắt kết nối
+SOCKET_OUTBOUND_QUEUE_MAX = 256
+# Actor của phòng dừng sau chừng này giây không có lệnh (xem matches/room_actor.py)
+ROOM_ACTOR_IDLE_TIMEOUT = 60
+# Phòng đã xong ván mà không tái đấu trong chừng này giây bị thu hồi; bộ quét chạy mỗi ROOM_SWEEP_INTERVAL giây
+ROOM_IDLE_AFTER_GAME = 300
+ROOM_SWEEP_INTERVAL = 30
+# Chỉ mục phòng chờ trong bộ nhớ được dựng lại khi sảnh thay đổi, tối đa một lần mỗi chừng này giây (xem matches/lobby.py)
+LOBBY_INDEX_REFRESH = 1.0
+LOBBY_PAGE_SIZE = 20
+# Pipeline fair-play (xem matches/fairplay.py): chỉ chấm người đã chơi đủ FAIRPLAY_MIN_RATED_GAMES trận;
+# nước đi nằm trong FAIRPLAY_TOP_CANDIDATES ứng viên của engine là trùng, người chơi bình thường trùng
+# khoảng FAIRPLAY_BASELINE_MATCH_RATE; lệnh fair_play_report liệt kê người có điểm từ FAIRPLAY_REPORT_THRESHOLD
+FAIRPLAY_MIN_RATED_GAMES = 10
+FAIRPLAY_TOP_CANDIDATES = 3
+FAIRPLAY_BASELINE_MATCH_RATE = 0.55
+FAIRPLAY_TIMING_WEIGHT = 2.0
+FAIRPLAY_REPORT_THRESHOLD = 3.0
+# Lịch sử ELO (xem users/rating_history.py): điểm từng trận được giữ chừng này ngày rồi gộp theo ngày,
+# điểm theo ngày được giữ RATING_HISTORY_DAY_DAYS ngày rồi gộp theo tuần
+RATING_HISTORY_RAW_DAYS = 30
+RATING_HISTORY_DAY_DAYS = 365
+# Bộ đếm bảng xếp hạng tuần/tháng (xem users/standings.py) được giữ chừng này ngày, xóa khi chuyển mùa
+LEADERBOARD_PERIOD_RETENTION_DAYS = 400
+# Chỉ mục tìm người chơi trong bộ nhớ được dựng lại khi có đăng ký/đổi tên, tối đa một lần mỗi chừng này giây (xem users/search.py)
+USER_SEARCH_INDEX_REFRESH = 5.0
+
+# Thư mục được tạo khi cần (lần ghi log / lưu profile đầu tiên)
+LOG_DIR = BASE_DIR / 'logs'
+PROFILER_OUTPUT = LOG_DIR / 'realtime_profile.collapsed'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'realtime_slow': {
+            'class': 'gomoku.log_handlers.RotatingFileHandler',
+            'filename': LOG_DIR / 'realtime_slow.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'gomoku.realtime.slow': {
+            'handlers': ['realtime_slow'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -128,6 +211,29 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Khi chạy nhiều process, đổi sang backend dùng chung để version response đồng bộ, vd:
+# 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Alias cache và thời gian sống (giây) của response đã cache cho leaderboard/hồ sơ
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Fast path của token blacklist (xem users/tokens.py), TẮT mặc định: None thì mỗi lượt refresh đều
+# hỏi bảng blacklist. Muốn bật, thêm một cache Redis dùng chung, không tự loại khóa (maxmemory-policy
+# noeviction), vào CACHES rồi trỏ alias tới nó (xem README), vd:
+# 'tokens': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+# TOKEN_BLACKLIST_CACHE_ALIAS = 'tokens'
+# Alias trỏ tới LocMemCache/DummyCache bị bỏ qua vì mỗi process có bộ lọc riêng.
+TOKEN_BLACKLIST_CACHE_ALIAS = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -15,12 +15,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from users.avatars import AVATAR_VARIANT_DIR
+from users.views import avatar_variant
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}{AVATAR_VARIANT_DIR}/(?P<digest>[0-9a-f]{{16}})/(?P<size>[0-9]+)(?:\.(?P<ext>webp|jpg))?$",
+        avatar_variant,
+        name='avatar_variant',
+    ),
     path('api/auth/', include('users.urls')),
     path('api/users/', include('users.user_urls')),
     path('api/', include('matches.urls')),
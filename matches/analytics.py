@@ -0,0 +1,134 @@
+"""
+Global analytics: thống kê chung được cộng dồn khi chốt trận, không quét bảng Match lúc đọc
+
+Mỗi trận chỉ được cộng đúng một lần, đánh dấu bằng Match.stats_recorded: settle_match
+cộng ngay trong transaction chốt trận, còn job rollup_game_stats cộng các trận cũ
+hoặc bị sót theo từng lô.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import DailyActivity, DailyGameStats, FirstMoveStats
+
+STATS_CACHE_KEY = "stats:global:{days}"
+STATS_CACHE_TIMEOUT = 60
+TOP_FIRST_MOVES = 10
+
+_peak_lock = threading.Lock()
+_peak = {"date": None, "value": 0}  # Đỉnh đã ghi của ngày hiện tại trong process này
+
+
+def record_matches(matches):
+    """
+    Cộng các trận đã kết thúc vào bảng thống kê; phải gọi trong transaction cùng với
+    việc đánh dấu stats_recorded.
+    """
+    daily = defaultdict(Counter)
+    first_moves = Counter()
+    for match in matches:
+        counter = daily[(timezone.localdate(match.end_time), match.board_size)]
+        counter["games"] += 1
+        counter["total_moves"] += match.move_count()
+        if match.winner_id is None:
+            counter["draws"] += 1
+        elif match.winner_id == match.player_x_id:
+            counter["x_wins"] += 1
+        else:
+            counter["o_wins"] += 1
+        history = match.move_history()
+        if history:
+            first_moves[(match.board_size, *history[0])] += 1
+
+    for (date, board_size), counter in daily.items():
+        DailyGameStats.objects.get_or_create(date=date, board_size=board_size)
+        DailyGameStats.objects.filter(date=date, board_size=board_size).update(
+            **{field: F(field) + value for field, value in counter.items()}
+        )
+    for (board_size, row, col), count in first_moves.items():
+        FirstMoveStats.objects.get_or_create(board_size=board_size, row=row, col=col)
+        FirstMoveStats.objects.filter(board_size=board_size, row=row, col=col).update(count=F("count") + count)
+
+
+def record_concurrency(active_games: int):
+    """Ghi nhận số ván đang diễn ra; chỉ ghi DB khi vượt đỉnh đã biết của ngày hôm nay."""
+    today = timezone.localdate()
+    with _peak_lock:
+        if _peak["date"] != today:
+            _peak["date"], _peak["value"] = today, 0
+        if active_games <= _peak["value"]:
+            return
+        _peak["value"] = active_games
+    DailyActivity.objects.get_or_create(date=today)
+    DailyActivity.objects.filter(date=today, peak_concurrent__lt=active_games).update(peak_concurrent=active_games)
+
+
+def _rate(part: int, total: int) -> float:
+    return round(part / total, 4) if total else 0.0
+
+
+def build_global_stats(days: int) -> dict:
+    """Thống kê chung từ các bảng tổng hợp (vài trăm dòng), không đụng tới bảng Match."""
+    since = timezone.localdate() - timezone.timedelta(days=days - 1)
+
+    per_day = (
+        DailyGameStats.objects.filter(date__gte=since)
+        .values("date")
+        .annotate(games=Sum("games"))
+        .order_by("date")
+    )
+    by_size = (
+        DailyGameStats.objects.values("board_size")
+        .annotate(
+            games=Sum("games"), moves=Sum("total_moves"),
+            x_wins=Sum("x_wins"), o_wins=Sum("o_wins"), draws=Sum("draws"),
+        )
+        .order_by("board_size")
+    )
+    totals = Counter()
+    board_sizes = []
+    for row in by_size:
+        totals.update({key: row[key] for key in ("games", "x_wins", "o_wins", "draws")})
+        board_sizes.append({
+            "board_size": row["board_size"],
+            "games": row["games"],
+            "avg_moves": round(row["moves"] / row["games"], 1) if row["games"] else 0.0,
+        })
+
+    first_moves = {}
+    for board_size in (row["board_size"] for row in board_sizes):
+        top = FirstMoveStats.objects.filter(board_size=board_size).order_by("-count")[:TOP_FIRST_MOVES]
+        first_moves[str(board_size)] = [{"row": m.row, "col": m.col, "count": m.count} for m in top]
+
+    peaks = DailyActivity.objects.filter(date__gte=since).order_by("date")
+    return {
+        "days": days,
+        "games_per_day": [{"date": row["date"], "games": row["games"]} for row in per_day],
+        "board_sizes": board_sizes,
+        "results": {
+            "games": totals["games"],
+            "x_win_rate": _rate(totals["x_wins"], totals["games"]),
+            "o_win_rate": _rate(totals["o_wins"], totals["games"]),
+            "draw_rate": _rate(totals["draws"], totals["games"]),
+        },
+        "first_moves": first_moves,
+        "peak_concurrent": {
+            "per_day": [{"date": peak.date, "games": peak.peak_concurrent} for peak in peaks],
+            "all_time": DailyActivity.objects.aggregate(peak=Max("peak_concurrent"))["peak"] or 0,
+        },
+    }
+
+
+def get_global_stats(days: int) -> dict:
+    """build_global_stats kèm cache ngắn hạn."""
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    key = STATS_CACHE_KEY.format(days=days)
+    data = cache.get(key)
+    if data is None:
+        data = build_global_stats(days)
+        cache.set(key, data, timeout=STATS_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,84 @@
+"""
+Move encoding: lưu nước đi của trận đã kết thúc dạng bit-packed thay cho lưới JSON
+
+Định dạng: 1 byte loại + dãy chỉ số ô (row * board_size + col), mỗi chỉ số dùng
+cell_bits(board_size) bit (8 bit cho 15x15, 9 bit cho 19x19...), ghép liền nhau theo
+big-endian và đệm 0 ở cuối cho đủ byte. Số nước được suy ra từ độ dài vì phần đệm
+luôn ngắn hơn một chỉ số.
+"""
+ORDERED = 1   # Các nước theo đúng thứ tự đã đi, X đi trước
+POSITION = 2  # Trận cũ chỉ còn thế cờ cuối: quân X và O xếp xen kẽ, không phải thứ tự thật
+
+
+def cell_bits(board_size: int) -> int:
+    return (board_size * board_size - 1).bit_length()
+
+
+def encode_moves(moves: list, board_size: int, kind: int = ORDERED) -> bytes:
+    """Mã hóa danh sách [[row, col], ...] thành bytes."""
+    width = cell_bits(board_size)
+    value = 0
+    for row, col in moves:
+        value = (value << width) | (row * board_size + col)
+    bits = width * len(moves)
+    padding = -bits % 8
+    return bytes([kind]) + (value << padding).to_bytes((bits + padding) // 8, "big")
+
+
+def decode_moves(data: bytes, board_size: int) -> tuple:
+    """
+    Giải mã bytes từ encode_moves.
+
+    Returns:
+        (kind, [[row, col], ...])
+    """
+    data = bytes(data)
+    kind, payload = data[0], data[1:]
+    width = cell_bits(board_size)
+    total_bits = len(payload) * 8
+    count = total_bits // width
+    value = int.from_bytes(payload, "big") >> (total_bits - count * width)
+    mask = (1 << width) - 1
+    cells = [(value >> (width * (count - 1 - i))) & mask for i in range(count)]
+    return kind, [list(divmod(cell, board_size)) for cell in cells]
+
+
+def moves_to_grid(moves: list, board_size: int) -> list:
+    """Lưới 2D (như board_state cũ) sau khi đi lần lượt các nước, X đi trước."""
+    grid = [[None] * board_size for _ in range(board_size)]
+    for number, (row, col) in enumerate(moves):
+        grid[row][col] = "X" if number % 2 == 0 else "O"
+    return grid
+
+
+def grid_to_position(grid: list):
+    """
+    Xếp quân của lưới thành dãy X, O xen kẽ để mã hóa dạng POSITION.
+
+    Returns:
+        Danh sách [[row, col], ...], None nếu số quân X và O không hợp lệ
+    """
+    stones = {"X": [], "O": []}
+    for row, line in enumerate(grid):
+        for col, cell in enumerate(line):
+            if cell in stones:
+                stones[cell].append([row, col])
+    x_stones, o_stones = stones["X"], stones["O"]
+    if len(x_stones) - len(o_stones) not in (0, 1):
+        return None
+    position = []
+    for i, stone in enumerate(x_stones):
+        position.append(stone)
+        if i < len(o_stones):
+            position.append(o_stones[i])
+    return position
+
+
+def encode_times(times_ms: list) -> bytes:
+    """Thời gian suy nghĩ (ms) của từng nước, mỗi giá trị 4 byte big-endian, chặn ở 2^32 - 1."""
+    return b"".join(min(max(ms, 0), 0xFFFFFFFF).to_bytes(4, "big") for ms in times_ms)
+
+
+def decode_times(data: bytes) -> list:
+    data = bytes(data)
+    return [int.from_bytes(data[i:i + 4], "big") for i in range(0, len(data), 4)]
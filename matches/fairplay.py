@@ -0,0 +1,191 @@
+"""
+Fair-play: so nước đi của người chơi với các ứng viên hàng đầu của engine và xét nhịp thời gian đi
+
+Engine ở đây là bộ xếp hạng nước đi dựa trên ThreatTracker và điểm các cửa sổ 5 ô đi qua
+từng ô trống, đủ nhanh để chạy lại mọi ván đã kết thúc. Với mỗi nước của người chơi:
+
+- Bỏ qua khai cuộc (OPENING_PLIES nước đầu) và nước bắt buộc (thắng ngay / chặn nước bốn)
+  vì ai cũng đi giống engine ở các thế đó.
+- Nước còn lại được chấm là trùng engine nếu nằm trong top_candidates ứng viên.
+
+Thời gian suy nghĩ đều đặn bất thường (hệ số biến thiên thấp) trên đủ nhiều nước được
+gắn cờ UNIFORM_TIMING. Module này không đụng tới ORM để chạy được trong process pool;
+việc ghi kết quả và cộng dồn điểm nằm ở lệnh analyze_fair_play.
+"""
+import math
+from statistics import fmean, pstdev
+
+from .rules import CENTER, RENJU, forbidden_reason, line_table
+from .threats import ThreatTracker
+
+OPENING_PLIES = 8
+NEIGHBOURHOOD = 2           # Ứng viên là ô trống cách quân gần nhất tối đa chừng này ô
+WINDOW_WEIGHTS = (0, 1, 8, 64, 512)  # Điểm cửa sổ 5 ô theo số quân cùng màu đã có
+DEFENCE_FACTOR = 0.9
+OPEN_FOUR_BONUS = 4096
+
+MIN_TIMED_MOVES = 12
+UNIFORM_TIMING_CV = 0.2
+UNIFORM_TIMING = "uniform_timing"
+HIGH_ENGINE_MATCH = "high_engine_match"
+HIGH_MATCH_MIN_MOVES = 10
+HIGH_MATCH_RATE = 0.9
+
+
+def _opponent(player: str) -> str:
+    return "O" if player == "X" else "X"
+
+
+def _window_score(board: list, size: int, row: int, col: int, player: str) -> float:
+    """Điểm tấn công + phòng thủ của ô trống (row, col) cho player, theo các cửa sổ 5 ô chứa ô đó."""
+    opponent = _opponent(player)
+    attack = defence = 0
+    for line in line_table(size)[row * size + col]:
+        for first in range(CENTER - 4, CENTER + 1):
+            window = line[first:first + 5]
+            if None in window:
+                continue
+            own = theirs = 0
+            for r, c in window:
+                cell = board[r][c]
+                if cell == player:
+                    own += 1
+                elif cell == opponent:
+                    theirs += 1
+            if not theirs:
+                attack += WINDOW_WEIGHTS[own]
+            if not own:
+                defence += WINDOW_WEIGHTS[theirs]
+    return attack + DEFENCE_FACTOR * defence
+
+
+def _candidate_cells(board: list, size: int, stones: list) -> set:
+    cells = set()
+    for row, col in stones:
+        for r in range(max(row - NEIGHBOURHOOD, 0), min(row + NEIGHBOURHOOD + 1, size)):
+            for c in range(max(col - NEIGHBOURHOOD, 0), min(col + NEIGHBOURHOOD + 1, size)):
+                if board[r][c] is None:
+                    cells.add((r, c))
+    return cells
+
+
+def _is_forbidden(board: list, row: int, col: int, player: str, variant: str) -> bool:
+    if variant != RENJU or player != "X":
+        return False
+    board[row][col] = player
+    forbidden = forbidden_reason(board, row, col, player, variant) is not None
+    board[row][col] = None
+    return forbidden
+
+
+def top_candidates(tracker: ThreatTracker, stones: list, player: str, count: int) -> list:
+    """
+    count nước tốt nhất cho player theo engine, tốt nhất trước.
+
+    Returns:
+        [(row, col), ...]; rỗng nếu thế cờ là bắt buộc (player thắng ngay hoặc phải chặn nước bốn)
+    """
+    if tracker.win_points(player) or tracker.win_points(_opponent(player)):
+        return []
+    board, size = tracker.board, tracker.size
+    open_fours = tracker.four_points(player)
+    scored = []
+    for row, col in _candidate_cells(board, size, stones):
+        score = _window_score(board, size, row, col, player)
+        if open_fours.get((row, col), 0) >= 2:
+            score += OPEN_FOUR_BONUS
+        scored.append((-score, row, col))
+    scored.sort()
+
+    ranked = []
+    for _, row, col in scored:
+        if not _is_forbidden(board, row, col, player, tracker.variant):
+            ranked.append((row, col))
+            if len(ranked) == count:
+                break
+    return ranked
+
+
+def _timing(times: list) -> tuple:
+    """(thời gian trung bình ms, hệ số biến thiên hoặc None nếu chưa đủ nước)."""
+    if not times:
+        return None, None
+    mean = fmean(times)
+    if len(times) < MIN_TIMED_MOVES or mean <= 0:
+        return round(mean), None
+    return round(mean), round(pstdev(times) / mean, 4)
+
+
+def analyze_match(job: dict) -> dict:
+    """
+    Phân tích một trận; hàm thuần, nhận/trả dữ liệu picklable để chạy trong process pool.
+
+    Args:
+        job: {match_id, board_size, rule_variant, moves: [[row, col]], move_times: [ms] (có thể rỗng),
+             players: {'X': user_id | None, 'O': user_id | None}, top_candidates}; người chơi None thì không được chấm
+
+    Returns:
+        {match_id, results: [{user_id, moves, engine_matches, mean_move_ms, timing_cv, flags}, ...]}
+    """
+    size = job["board_size"]
+    moves = job["moves"]
+    times = job["move_times"]
+    if len(times) != len(moves):
+        times = []
+    players = job["players"]
+    count = job["top_candidates"]
+
+    tracker = ThreatTracker(size, job["rule_variant"])
+    stones = []
+    scored = {"X": 0, "O": 0}
+    matched = {"X": 0, "O": 0}
+    think = {"X": [], "O": []}
+    for number, (row, col) in enumerate(moves):
+        player = "X" if number % 2 == 0 else "O"
+        if players[player] is not None:
+            if times:
+                think[player].append(times[number])
+            if number >= OPENING_PLIES:
+                candidates = top_candidates(tracker, stones, player, count)
+                if candidates:
+                    scored[player] += 1
+                    matched[player] += (row, col) in candidates
+        tracker.place(row, col, player)
+        stones.append((row, col))
+
+    results = []
+    for player, user_id in players.items():
+        if user_id is None:
+            continue
+        mean_ms, cv = _timing(think[player])
+        flags = []
+        if cv is not None and cv < UNIFORM_TIMING_CV:
+            flags.append(UNIFORM_TIMING)
+        if scored[player] >= HIGH_MATCH_MIN_MOVES and matched[player] / scored[player] >= HIGH_MATCH_RATE:
+            flags.append(HIGH_ENGINE_MATCH)
+        results.append({
+            "user_id": user_id,
+            "moves": scored[player],
+            "engine_matches": matched[player],
+            "mean_move_ms": mean_ms,
+            "timing_cv": cv,
+            "flags": flags,
+        })
+    return {"match_id": job["match_id"], "results": results}
+
+
+def suspicion_score(moves: int, engine_matches: int, timed_games: int, uniform_timing_games: int,
+                    baseline: float, timing_weight: float) -> float:
+    """
+    Điểm nghi vấn cộng dồn của một người chơi.
+
+    Phần engine là độ lệch chuẩn (z-score) của số nước trùng engine so với tỉ lệ baseline
+    của người chơi bình thường, nên tăng dần theo số nước chứ không nhảy vọt sau một ván.
+    Phần thời gian là tỉ lệ ván có nhịp đi đều bất thường nhân timing_weight.
+    """
+    engine = 0.0
+    if moves:
+        expected = baseline * moves
+        engine = max((engine_matches - expected) / math.sqrt(moves * baseline * (1 - baseline)), 0.0)
+    timing = timing_weight * uniform_timing_games / timed_games if timed_games else 0.0
+    return round(engine + timing, 3)
@@ -0,0 +1,109 @@
+"""
+Flood control cho sự kiện Socket.IO: token bucket theo sid/sự kiện và theo người dùng, giới hạn hàng đợi gửi
+
+- Mỗi sự kiện có ngân sách riêng cho từng sid (SOCKET_EVENT_BUDGETS), thêm một ngân sách
+  chung cho mọi sự kiện của một người dùng trên tất cả các tab (SOCKET_USER_BUDGET).
+- Sự kiện vượt ngân sách bị bỏ và client nhận 'error'; vượt quá SOCKET_FLOOD_STRIKES lần
+  thì bị ngắt kết nối.
+- Client nhận chậm có hàng đợi gửi vượt SOCKET_OUTBOUND_QUEUE_MAX gói bị ngắt kết nối
+  thay vì để hàng đợi tăng không giới hạn.
+"""
+import asyncio
+import functools
+import logging
+
+from django.conf import settings
+
+from users import presence
+from users.throttling import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+_server = None
+_event_buckets = {}  # {event: TokenBucket theo sid}
+_user_bucket = None
+_strike_bucket = None
+_overflowed = set()  # eio sid đang bị ngắt vì hàng đợi gửi đầy
+
+
+def _bucket_for(event: str) -> TokenBucket:
+    bucket = _event_buckets.get(event)
+    if bucket is None:
+        budgets = settings.SOCKET_EVENT_BUDGETS
+        bucket = _event_buckets[event] = TokenBucket(*budgets.get(event, budgets["default"]))
+    return bucket
+
+
+def allow(sid: str, event: str) -> bool:
+    """Trừ ngân sách của sid cho sự kiện event và của người dùng sở hữu sid."""
+    global _user_bucket
+    if not _bucket_for(event).take(sid):
+        return False
+    user_id = presence.user_for(sid)
+    if user_id is None:
+        return True
+    if _user_bucket is None:
+        _user_bucket = TokenBucket(*settings.SOCKET_USER_BUDGET)
+    return _user_bucket.take(user_id)
+
+
+def strike(sid: str) -> bool:
+    """Ghi nhận một lần vượt ngân sách; True nếu sid đã vượt quá số lần cho phép."""
+    global _strike_bucket
+    if _strike_bucket is None:
+        _strike_bucket = TokenBucket(*settings.SOCKET_FLOOD_STRIKES)
+    return not _strike_bucket.take(sid)
+
+
+def forget(sid: str):
+    """Bỏ trạng thái của sid khi ngắt kết nối."""
+    for bucket in _event_buckets.values():
+        bucket.forget(sid)
+    if _strike_bucket is not None:
+        _strike_bucket.forget(sid)
+
+
+def flood_controlled(func):
+    """Áp ngân sách sự kiện cho một handler Socket.IO; đặt ngay dưới @sio.event."""
+    event = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(sid, *args, **kwargs):
+        if allow(sid, event):
+            return await func(sid, *args, **kwargs)
+        if strike(sid):
+            logger.warning("Disconnecting %s: flooding %s", sid, event)
+            await _server.emit('error', {'message': 'Gửi quá nhiều yêu cầu, kết nối bị ngắt', 'event': event}, room=sid)
+            await _server.disconnect(sid)
+        else:
+            await _server.emit('error', {'message': 'Bạn thao tác quá nhanh, vui lòng chậm lại', 'event': event}, room=sid)
+
+    return wrapper
+
+
+async def _drop_slow_consumer(eio, eio_sid: str):
+    logger.warning("Disconnecting %s: outbound queue over %s packets", eio_sid, settings.SOCKET_OUTBOUND_QUEUE_MAX)
+    try:
+        await eio.disconnect(eio_sid)
+    finally:
+        _overflowed.discard(eio_sid)
+
+
+def install(sio):
+    """Gắn flood control vào server: lưu server cho flood_controlled và giới hạn hàng đợi gửi."""
+    global _server
+    _server = sio
+    eio = sio.eio
+    send_packet = eio.send_packet
+
+    @functools.wraps(send_packet)
+    async def capped_send_packet(eio_sid, pkt):
+        socket = eio.sockets.get(eio_sid)
+        if socket is not None and socket.queue.qsize() >= settings.SOCKET_OUTBOUND_QUEUE_MAX:
+            if eio_sid not in _overflowed:
+                _overflowed.add(eio_sid)
+                asyncio.create_task(_drop_slow_consumer(eio, eio_sid))
+            return
+        await send_packet(eio_sid, pkt)
+
+    eio.send_packet = capped_send_packet
@@ -1,43 +1,17 @@
 """
 Game logic for Gomoku (5 in a row)
 """
+from .rules import STANDARD, is_winning_move
 
 
-def check_winner(board: list, row: int, col: int, player: str) -> bool:
+def check_winner(board: list, row: int, col: int, player: str, variant: str = STANDARD) -> bool:
     """
     Kiểm tra xem người chơi đã thắng hay chưa sau nước đi tại (row, col).
     board: list 2D, board[row][col] = 'X', 'O', hoặc None
     player: 'X' hoặc 'O'
+    variant: luật chơi (xem rules), mặc định 5 quân trở lên là thắng
     """
-    size = len(board)
-    directions = [
-        (0, 1),   # Ngang
-        (1, 0),   # Dọc
-        (1, 1),   # Chéo chính
-        (1, -1),  # Chéo phụ
-    ]
-    
-    for dr, dc in directions:
-        count = 1  # Đếm ô hiện tại
-        
-        # Đếm về phía trước
-        r, c = row + dr, col + dc
-        while 0 <= r < size and 0 <= c < size and board[r][c] == player:
-            count += 1
-            r += dr
-            c += dc
-        
-        # Đếm về phía sau
-        r, c = row - dr, col - dc
-        while 0 <= r < size and 0 <= c < size and board[r][c] == player:
-            count += 1
-            r -= dr
-            c -= dc
-        
-        if count >= 5:
-            return True
-    
-    return False
+    return is_winning_move(board, row, col, player, variant)
 
 
 def is_board_full(board: list) -> bool:
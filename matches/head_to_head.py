@@ -0,0 +1,84 @@
+"""
+Head-to-head: thành tích đối đầu theo cặp người chơi không thứ tự
+
+Mỗi cặp có đúng một dòng HeadToHead (user_low < user_high) được cập nhật khi chốt trận,
+nên tra thành tích của hai người chỉ cần một lần đọc theo unique index của cặp.
+"""
+from .models import HeadToHead
+
+RECENT_GAMES = 10
+
+
+def pair_of(user_a: int, user_b: int) -> tuple:
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+def add_match(record: HeadToHead, match):
+    """Cộng một trận đã kết thúc vào record của cặp (chưa lưu)."""
+    if match.winner_id is None:
+        record.draws += 1
+    elif match.winner_id == record.user_low_id:
+        record.low_wins += 1
+    else:
+        record.high_wins += 1
+    game = {
+        "match_id": match.id,
+        "winner_id": match.winner_id,
+        "board_size": match.board_size,
+        "end_time": match.end_time.isoformat(),
+    }
+    record.recent = [game, *record.recent][:RECENT_GAMES]
+    record.last_played = match.end_time
+
+
+def record_match(match):
+    """Cập nhật thành tích đối đầu sau một trận; gọi trong transaction chốt trận."""
+    user_low, user_high = pair_of(match.player_x_id, match.player_o_id)
+    record, _ = HeadToHead.objects.select_for_update().get_or_create(user_low_id=user_low, user_high_id=user_high)
+    add_match(record, match)
+    record.save()
+
+
+def summary(record, user_id: int, opponent_id: int, limit: int = RECENT_GAMES) -> dict:
+    """
+    Thành tích nhìn từ phía user_id.
+
+    Args:
+        record: HeadToHead của cặp, None nếu hai người chưa từng gặp nhau
+    """
+    if record is None:
+        wins = losses = draws = 0
+        recent, last_played = [], None
+    else:
+        low = user_id == record.user_low_id
+        wins = record.low_wins if low else record.high_wins
+        losses = record.high_wins if low else record.low_wins
+        draws, recent, last_played = record.draws, record.recent, record.last_played
+    return {
+        "user_id": user_id,
+        "opponent_id": opponent_id,
+        "games": wins + losses + draws,
+        "wins": wins,
+        "losses": losses,
+        "draws": draws,
+        "last_played": last_played,
+        "recent": [
+            {
+                "match_id": game["match_id"],
+                "result": "draw" if game["winner_id"] is None else ("win" if game["winner_id"] == user_id else "loss"),
+                "board_size": game["board_size"],
+                "end_time": game["end_time"],
+            }
+            for game in recent[:limit]
+        ],
+    }
+
+
+def get_record(user_a: int, user_b: int):
+    user_low, user_high = pair_of(user_a, user_b)
+    return HeadToHead.objects.filter(user_low_id=user_low, user_high_id=user_high).first()
+
+
+async def aget_record(user_a: int, user_b: int):
+    user_low, user_high = pair_of(user_a, user_b)
+    return await HeadToHead.objects.filter(user_low_id=user_low, user_high_id=user_high).afirst()
@@ -0,0 +1,215 @@
+"""
+Lobby search: tìm phòng theo kích thước bàn cờ, mật khẩu, tiền tố tên và ELO chủ phòng, phân trang bằng cursor
+
+Phòng đang chờ (tập được đọc nhiều nhất) được giữ trong một chỉ mục trong bộ nhớ: danh
+sách sắp theo (created_at, id) giảm dần cho toàn sảnh và cho từng kích thước bàn cờ, cộng
+danh sách tên đã sắp xếp để tìm tiền tố bằng bisect. Chỉ mục được dựng lại từ DB khi
+version LOBBY_VERSION đổi (tạo/vào/rời/dọn phòng), tối đa một lần mỗi LOBBY_INDEX_REFRESH
+giây. Các trạng thái khác (vd phòng đang chơi cho người xem) truy vấn thẳng DB qua các
+index (status, board_size, created_at, id).
+"""
+import base64
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+
+from users.cache import LOBBY_VERSION, bump, current_version
+
+from .models import Room
+
+ROOM_FIELDS = (
+    "id", "room_name", "host__username", "host__elo", "player_2__username",
+    "status", "board_size", "rule_variant", "rated", "password", "created_at",
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+MAX_INDEX_AGE = 60
+
+_lock = threading.Lock()
+_index = None
+
+
+def invalidate():
+    """Báo sảnh chờ đã thay đổi; gọi sau khi phòng được tạo, có người vào/rời hoặc bị xóa."""
+    bump(LOBBY_VERSION)
+
+
+def encode_cursor(created_us: int, room_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_us}.{room_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(created_us, room_id) của phòng cuối trang trước; ValueError nếu cursor không hợp lệ."""
+    try:
+        created_us, room_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(".")
+        return int(created_us), int(room_id)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("cursor không hợp lệ") from exc
+
+
+def _micros(value) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _entry(row: dict) -> dict:
+    return {
+        "room_id": row["id"],
+        "room_name": row["room_name"],
+        "host_name": row["host__username"],
+        "host_elo": row["host__elo"],
+        "player_2_name": row["player_2__username"],
+        "status": row["status"],
+        "board_size": row["board_size"],
+        "rule_variant": row["rule_variant"],
+        "rated": row["rated"],
+        "current_players": 2 if row["player_2__username"] else 1,
+        "has_password": bool(row["password"]),
+    }
+
+
+class WaitingRoomIndex:
+    """Ảnh chụp các phòng đang chờ; không đổi sau khi dựng, được thay nguyên khối khi sảnh thay đổi."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.rooms = {}   # {room_id: entry}
+        self.order = []   # [(-created_us, -room_id)] tăng dần = mới nhất trước
+        self.by_size = {}
+        names = []
+        for row in rows:
+            key = (-_micros(row["created_at"]), -row["id"])
+            self.rooms[row["id"]] = _entry(row)
+            self.order.append(key)
+            self.by_size.setdefault(row["board_size"], []).append(key)
+            names.append((row["room_name"].lower(), row["id"]))
+        self.order.sort()
+        for keys in self.by_size.values():
+            keys.sort()
+        names.sort()
+        self.names = [name for name, _ in names]
+        self.name_ids = [room_id for _, room_id in names]
+
+    def _with_prefix(self, prefix: str) -> set:
+        start = bisect_left(self.names, prefix)
+        end = bisect_left(self.names, prefix + "\U0010ffff", start)
+        return set(self.name_ids[start:end])
+
+    def search(self, board_size=None, has_password=None, prefix="", elo_min=None, elo_max=None, cursor=None, limit=20):
+        keys = self.order if board_size is None else self.by_size.get(board_size, [])
+        allowed = self._with_prefix(prefix.lower()) if prefix else None
+        start = 0
+        if cursor is not None:
+            start = bisect_right(keys, (-cursor[0], -cursor[1]))
+
+        results = []
+        for position in range(start, len(keys)):
+            room_id = -keys[position][1]
+            if allowed is not None and room_id not in allowed:
+                continue
+            entry = self.rooms[room_id]
+            if has_password is not None and entry["has_password"] != has_password:
+                continue
+            if elo_min is not None and entry["host_elo"] < elo_min:
+                continue
+            if elo_max is not None and entry["host_elo"] > elo_max:
+                continue
+            results.append((keys[position], entry))
+            if len(results) > limit:
+                break
+
+        next_cursor = None
+        if len(results) > limit:
+            last_key = results[limit - 1][0]
+            next_cursor = encode_cursor(-last_key[0], -last_key[1])
+        return [entry for _, entry in results[:limit]], next_cursor
+
+
+def _fresh(index) -> bool:
+    if index is None:
+        return False
+    age = time.monotonic() - index.built_at
+    return age < MAX_INDEX_AGE and (age < settings.LOBBY_INDEX_REFRESH or index.version == current_version(LOBBY_VERSION))
+
+
+def waiting_index() -> WaitingRoomIndex:
+    """
+    Chỉ mục phòng chờ hiện tại, dựng lại nếu sảnh đã đổi và bản cũ quá LOBBY_INDEX_REFRESH giây.
+
+    Phòng chờ quá hạn được dọn lúc dựng lại (ít nhất mỗi MAX_INDEX_AGE giây) thay vì ở mỗi request.
+    """
+    global _index
+    index = _index
+    if _fresh(index):
+        return index
+    with _lock:
+        if _index is index:
+            if Room.prune_stale():
+                invalidate()
+            version = current_version(LOBBY_VERSION)
+            rows = Room.objects.filter(status=Room.Status.WAITING).values(*ROOM_FIELDS)
+            _index = WaitingRoomIndex(rows, version)
+        return _index
+
+
+def _db_query(status, board_size=None, has_password=None, prefix="", elo_min=None, elo_max=None, cursor=None, limit=20):
+    rooms = Room.objects.filter(status=status)
+    if board_size is not None:
+        rooms = rooms.filter(board_size=board_size)
+    if has_password is not None:
+        no_password = Q(password__isnull=True) | Q(password="")
+        rooms = rooms.exclude(no_password) if has_password else rooms.filter(no_password)
+    if prefix:
+        rooms = rooms.filter(room_name__istartswith=prefix)
+    if elo_min is not None:
+        rooms = rooms.filter(host__elo__gte=elo_min)
+    if elo_max is not None:
+        rooms = rooms.filter(host__elo__lte=elo_max)
+    if cursor is not None:
+        created_at = _EPOCH + cursor[0] * _MICROSECOND
+        rooms = rooms.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=cursor[1]))
+
+    return rooms.order_by("-created_at", "-id").values(*ROOM_FIELDS)[:limit + 1]
+
+
+def _db_page(rows, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(_micros(last["created_at"]), last["id"])
+    return [_entry(row) for row in rows[:limit]], next_cursor
+
+
+def search_db(status, **filters):
+    """Tìm phòng ở trạng thái không nằm trong chỉ mục bộ nhớ, dùng index (status, board_size, created_at, id)."""
+    return _db_page(list(_db_query(status, **filters)), filters.get("limit", 20))
+
+
+def search(status=Room.Status.WAITING, **filters):
+    """
+    Tìm phòng, mới tạo trước.
+
+    Returns:
+        (danh sách phòng, cursor của trang sau hoặc None)
+    """
+    if status == Room.Status.WAITING:
+        return waiting_index().search(**filters)
+    return search_db(status, **filters)
+
+
+async def asearch(status=Room.Status.WAITING, **filters):
+    """Như search cho view async: chỉ mục còn mới thì tìm ngay trong event loop, không qua thread."""
+    if status == Room.Status.WAITING:
+        index = _index
+        if not _fresh(index):
+            index = await sync_to_async(waiting_index)()
+        return index.search(**filters)
+    rows = [row async for row in _db_query(status, **filters)]
+    return _db_page(rows, filters.get("limit", 20))
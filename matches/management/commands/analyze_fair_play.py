@@ -0,0 +1,140 @@
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from matches.fairplay import UNIFORM_TIMING, analyze_match, suspicion_score
+from matches.models import FairPlayAnalysis, FairPlayCheckpoint, FairPlayProfile, Match
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Chấm fair-play các trận đã kết thúc của người chơi đã có hạng: so nước đi với engine và xét "
+        "nhịp thời gian, chạy song song trong process pool theo từng lô id. Tiến độ được lưu sau mỗi lô "
+        "nên dừng giữa chừng rồi chạy lại sẽ tiếp tục từ trận kế tiếp, không cộng trùng."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Số process chấm song song")
+        parser.add_argument("--pause", type=float, default=0, help="Số giây nghỉ giữa các lô")
+        parser.add_argument("--checkpoint", default="default", help="Tên checkpoint, mỗi tên có tiến độ riêng")
+        parser.add_argument("--restart", action="store_true", help="Chạy lại từ trận đầu tiên (trận đã chấm được bỏ qua)")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        workers = max(options["workers"], 1)
+        checkpoint, _ = FairPlayCheckpoint.objects.get_or_create(name=options["checkpoint"])
+        last_id = 0 if options["restart"] else checkpoint.last_match_id
+        if last_id:
+            self.stdout.write(f"Tiếp tục từ sau trận {last_id}...")
+        analyzed = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batch = self._load(last_id, batch_size)
+            while batch:
+                jobs = self._jobs(batch)
+                # map gửi cả lô vào pool ngay; lô sau được đọc từ DB trong lúc các worker đang chấm
+                pending = pool.map(analyze_match, jobs, chunksize=max(len(jobs) // (workers * 4), 1))
+                last_id = batch[-1].id
+                next_batch = self._load(last_id, batch_size)
+                analyzed += self._save(list(pending), checkpoint, last_id)
+                self.stdout.write(f"Đã chấm {analyzed} lượt người chơi (tới trận {last_id})...")
+                batch = next_batch
+                if batch and options["pause"]:
+                    time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Đã chấm fair-play {analyzed} lượt người chơi, checkpoint ở trận {last_id}."))
+
+    def _load(self, last_id: int, batch_size: int) -> list:
+        return list(
+            # Trận không tính điểm không ảnh hưởng bảng xếp hạng nên không chấm
+            Match.objects.filter(id__gt=last_id, end_time__isnull=False, rated=True)
+            .order_by("id")
+            .only(
+                "id", "player_x", "player_o", "board_size", "rule_variant",
+                "moves", "board_state", "move_data", "move_times",
+            )[:batch_size]
+        )
+
+    def _jobs(self, batch: list) -> list:
+        """Dữ liệu thuần cho analyze_match; chỉ chấm người đã chơi đủ FAIRPLAY_MIN_RATED_GAMES trận."""
+        user_ids = {match.player_x_id for match in batch} | {match.player_o_id for match in batch}
+        rated = set(
+            User.objects.filter(id__in=user_ids)
+            .alias(games=F("wins") + F("losses") + F("draws"))
+            .filter(games__gte=settings.FAIRPLAY_MIN_RATED_GAMES)
+            .values_list("id", flat=True)
+        )
+        jobs = []
+        for match in batch:
+            players = {
+                "X": match.player_x_id if match.player_x_id in rated else None,
+                "O": match.player_o_id if match.player_o_id in rated else None,
+            }
+            moves = match.move_history()
+            if not moves or players == {"X": None, "O": None}:
+                continue
+            jobs.append({
+                "match_id": match.id,
+                "board_size": match.board_size,
+                "rule_variant": match.rule_variant,
+                "moves": moves,
+                "move_times": match.move_durations(),
+                "players": players,
+                "top_candidates": settings.FAIRPLAY_TOP_CANDIDATES,
+            })
+        return jobs
+
+    def _save(self, outputs: list, checkpoint, last_id: int) -> int:
+        """Ghi kết quả của một lô, cộng dồn vào hồ sơ và dời checkpoint trong cùng một transaction."""
+        rows = [
+            FairPlayAnalysis(match_id=output["match_id"], **result)
+            for output in outputs
+            for result in output["results"]
+        ]
+        with transaction.atomic():
+            done = set(
+                FairPlayAnalysis.objects.filter(match_id__in=[output["match_id"] for output in outputs])
+                .values_list("match_id", "user_id")
+            )
+            rows = [row for row in rows if (row.match_id, row.user_id) not in done]
+            FairPlayAnalysis.objects.bulk_create(rows)
+
+            totals = defaultdict(Counter)
+            for row in rows:
+                total = totals[row.user_id]
+                total["games"] += 1
+                total["moves"] += row.moves
+                total["engine_matches"] += row.engine_matches
+                if row.timing_cv is not None:
+                    total["timed_games"] += 1
+                    total["uniform_timing_games"] += UNIFORM_TIMING in row.flags
+
+            FairPlayProfile.objects.bulk_create(
+                [FairPlayProfile(user_id=user_id) for user_id in totals], ignore_conflicts=True
+            )
+            profiles = list(FairPlayProfile.objects.select_for_update().filter(user_id__in=totals))
+            for profile in profiles:
+                for field, value in totals[profile.user_id].items():
+                    setattr(profile, field, getattr(profile, field) + value)
+                profile.suspicion = suspicion_score(
+                    profile.moves, profile.engine_matches, profile.timed_games, profile.uniform_timing_games,
+                    settings.FAIRPLAY_BASELINE_MATCH_RATE, settings.FAIRPLAY_TIMING_WEIGHT,
+                )
+            FairPlayProfile.objects.bulk_update(
+                profiles,
+                ["games", "moves", "engine_matches", "timed_games", "uniform_timing_games", "suspicion"],
+            )
+
+            checkpoint.last_match_id = last_id
+            checkpoint.save(update_fields=["last_match_id", "updated_at"])
+        return len(rows)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from matches.head_to_head import add_match, pair_of
+from matches.models import HeadToHead, Match
+
+MATCH_FIELDS = ("player_x", "player_o", "winner", "board_size", "end_time")
+
+
+class Command(BaseCommand):
+    help = (
+        "Dựng lại bảng HeadToHead từ lịch sử Match, đọc theo từng lô. Chỉ thay dòng của các cặp có trận "
+        "kết thúc trước khi lệnh bắt đầu; trận chốt trong lúc lệnh chạy được cộng lại khi ghi nên không bị mất."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = timezone.now()
+        records = {}
+        processed = 0
+
+        # Duyệt theo thời gian kết thúc để danh sách trận gần nhất đúng thứ tự
+        matches = (
+            Match.objects.filter(end_time__isnull=False, end_time__lt=started)
+            .only(*MATCH_FIELDS)
+            .order_by("end_time", "id")
+            .iterator(chunk_size=batch_size)
+        )
+        for match in matches:
+            key = pair_of(match.player_x_id, match.player_o_id)
+            if key not in records:
+                records[key] = HeadToHead(user_low_id=key[0], user_high_id=key[1])
+            add_match(records[key], match)
+            processed += 1
+            if processed % batch_size == 0:
+                self.stdout.write(f"Đã xử lý {processed} trận...")
+
+        pairs = sorted(records)
+        late = 0
+        for start in range(0, len(pairs), batch_size):
+            late += self.replace(started, {key: records[key] for key in pairs[start:start + batch_size]})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã dựng thành tích đối đầu cho {len(records)} cặp từ {processed} trận "
+            f"(cộng thêm {late} trận chốt trong lúc chạy)."
+        ))
+
+    def replace(self, started, records: dict) -> int:
+        """Ghi đè dòng HeadToHead của một lô cặp; trả về số trận chốt sau started đã cộng thêm."""
+        user_ids = {user_id for key in records for user_id in key}
+        with transaction.atomic():
+            # Khóa người chơi như settle_match: trận chốt sau thời điểm này phải chờ lô được ghi xong
+            list(get_user_model().objects.select_for_update().filter(id__in=user_ids).order_by("id").values_list("id", flat=True))
+            late = (
+                Match.objects.filter(end_time__gte=started, stats_recorded=True)
+                .filter(player_x_id__in=user_ids, player_o_id__in=user_ids)
+                .only(*MATCH_FIELDS)
+                .order_by("end_time", "id")
+            )
+            count = 0
+            for match in late:
+                key = pair_of(match.player_x_id, match.player_o_id)
+                if key in records:
+                    add_match(records[key], match)
+                    count += 1
+            owned = Q()
+            for user_low, user_high in records:
+                owned |= Q(user_low_id=user_low, user_high_id=user_high)
+            HeadToHead.objects.filter(owned).delete()
+            HeadToHead.objects.bulk_create(records.values())
+        return count
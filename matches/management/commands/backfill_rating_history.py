@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from matches.elo_calculator import calculate_elo_change, calculate_elo_draw
+from matches.models import Match
+from users.models import RatingPoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Dựng lại lịch sử ELO từ lịch sử Match bằng cách tính lại ELO từng trận theo thời gian kết thúc, "
+        "rồi gộp điểm cũ theo ngày/tuần. Trận giải đấu được tính lần lượt như trận thường nên có thể lệch "
+        "chút ít so với ELO chốt theo vòng. Điểm ghi sau khi lệnh bắt đầu chạy được giữ nguyên."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = timezone.now()
+        initial = get_user_model()._meta.get_field("elo").default
+        elo = {}
+        points = []
+        processed = 0
+
+        with transaction.atomic():
+            deleted, _ = RatingPoint.objects.filter(time__lt=started).delete()
+        self.stdout.write(f"Đã xóa {deleted} điểm cũ.")
+
+        matches = (
+            Match.objects.filter(end_time__isnull=False, end_time__lt=started)
+            .only("player_x", "player_o", "winner", "end_time")
+            .order_by("end_time", "id")
+            .iterator(chunk_size=batch_size)
+        )
+        for match in matches:
+            x_id, o_id = match.player_x_id, match.player_o_id
+            x_elo, o_elo = elo.get(x_id, initial), elo.get(o_id, initial)
+            if match.winner_id is None:
+                x_change, o_change = calculate_elo_draw(x_elo, o_elo)
+                elo[x_id], elo[o_id] = x_elo + x_change, o_elo + o_change
+            else:
+                winner_id, loser_id = (x_id, o_id) if match.winner_id == x_id else (o_id, x_id)
+                winner_change, loser_change = calculate_elo_change(elo.get(winner_id, initial), elo.get(loser_id, initial))
+                elo[winner_id] = elo.get(winner_id, initial) + winner_change
+                elo[loser_id] = max(0, elo.get(loser_id, initial) + loser_change)
+            for user_id in (x_id, o_id):
+                points.append(RatingPoint(
+                    user_id=user_id, time=match.end_time, elo=elo[user_id],
+                    elo_min=elo[user_id], elo_max=elo[user_id],
+                ))
+
+            processed += 1
+            if len(points) >= batch_size:
+                RatingPoint.objects.bulk_create(points)
+                points = []
+                self.stdout.write(f"Đã xử lý {processed} trận...")
+        RatingPoint.objects.bulk_create(points)
+
+        self.stdout.write(f"Đã ghi lịch sử của {len(elo)} người chơi từ {processed} trận, đang gộp điểm cũ...")
+        call_command("compact_rating_history", pause=0, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lịch sử ELO cho {len(elo)} người chơi từ {processed} trận."))
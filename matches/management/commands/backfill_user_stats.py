@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from matches.models import Match
+from matches.settlement import count_moves, result_for
+from users.models import UserStats
+
+MATCH_FIELDS = ("player_x", "player_o", "winner", "board_size", "board_state", "moves", "move_data", "end_time")
+
+
+def add_match(stats: dict, match):
+    """Cộng một trận vào thống kê của những người chơi có trong stats."""
+    moves = count_moves(match)
+    for user_id, symbol in ((match.player_x_id, "X"), (match.player_o_id, "O")):
+        if user_id in stats:
+            stats[user_id].record(symbol, result_for(match, user_id), match.board_size, moves)
+
+
+class Command(BaseCommand):
+    help = (
+        "Dựng lại bảng UserStats từ lịch sử Match, đọc theo từng lô. Chỉ thay dòng của người chơi có trận "
+        "kết thúc trước khi lệnh bắt đầu; trận chốt trong lúc lệnh chạy được cộng lại khi ghi nên không bị mất."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = timezone.now()
+        stats = {}
+        processed = 0
+
+        # Duyệt theo thời gian kết thúc để chuỗi thắng/thua được tính đúng thứ tự
+        matches = (
+            Match.objects.filter(end_time__isnull=False, end_time__lt=started)
+            .only(*MATCH_FIELDS)
+            .order_by("end_time", "id")
+            .iterator(chunk_size=batch_size)
+        )
+        for match in matches:
+            for user_id in (match.player_x_id, match.player_o_id):
+                if user_id not in stats:
+                    stats[user_id] = UserStats(user_id=user_id)
+            add_match(stats, match)
+            processed += 1
+            if processed % batch_size == 0:
+                self.stdout.write(f"Đã xử lý {processed} trận...")
+
+        user_ids = sorted(stats)
+        late = 0
+        for start in range(0, len(user_ids), batch_size):
+            late += self.replace(started, {user_id: stats[user_id] for user_id in user_ids[start:start + batch_size]})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã dựng thống kê cho {len(stats)} người chơi từ {processed} trận (cộng thêm {late} trận chốt trong lúc chạy)."
+        ))
+
+    def replace(self, started, stats: dict) -> int:
+        """Ghi đè dòng UserStats của một lô người chơi; trả về số trận chốt sau started đã cộng thêm."""
+        with transaction.atomic():
+            # Khóa người chơi như settle_match: trận chốt sau thời điểm này phải chờ lô được ghi xong
+            list(get_user_model().objects.select_for_update().filter(id__in=stats).order_by("id").values_list("id", flat=True))
+            late = (
+                Match.objects.filter(end_time__gte=started, stats_recorded=True)
+                .filter(Q(player_x_id__in=stats) | Q(player_o_id__in=stats))
+                .only(*MATCH_FIELDS)
+                .order_by("end_time", "id")
+            )
+            count = 0
+            for match in late:
+                add_match(stats, match)
+                count += 1
+            UserStats.objects.filter(user_id__in=stats).delete()
+            UserStats.objects.bulk_create(stats.values())
+        return count
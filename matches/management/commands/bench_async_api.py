@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from matches.models import Match, Room
+from users.management.commands.bench_login_storm import _request, _summary
+
+READ_PATHS = ("/api/rooms/", "/api/matches/history/", "/api/users/leaderboard/", "/api/users/{user_id}/")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: số request/s và p50/p99 của các endpoint REST async (AsyncAPIView) chạy qua ASGI trong "
+        "process, cùng lúc với các vòng ORM async kiểu handler Socket.IO trên cùng event loop. "
+        "Tạo tạm người chơi bench_* (kèm phòng và trận) rồi xóa khi xong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=32, help="Số client gọi lần lượt các endpoint GET")
+        parser.add_argument("--writers", type=int, default=4, help="Số client vào/rời phòng liên tục (POST)")
+        parser.add_argument("--socket-loops", type=int, default=16, help="Số vòng ORM async kiểu handler socket")
+        parser.add_argument("--duration", type=float, default=10.0, help="Số giây chạy")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = f"bench_{uuid4().hex[:6]}"
+        clients = max(options["readers"], options["writers"], 1)
+        users = User.objects.bulk_create([
+            User(email=f"{prefix}_{i}@bench.invalid", username=f"{prefix}_{i}", full_name=prefix)
+            for i in range(clients * 2)
+        ])
+        players, hosts = users[:clients], users[clients:]
+        # Lịch sử trận và phòng chờ để các endpoint đọc có dữ liệu thật
+        now = timezone.now()
+        Match.objects.bulk_create([
+            Match(player_x=player, player_o=hosts[i], end_time=now) for i, player in enumerate(players) for _ in range(10)
+        ])
+        rooms = Room.objects.bulk_create([Room(room_name=f"{prefix} {i}", host=host) for i, host in enumerate(hosts)])
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        try:
+            asyncio.run(self.run(players, rooms, options))
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    async def run(self, players, rooms, options):
+        handler = ASGIHandler()
+        tokens = [str(AccessToken.for_user(player)) for player in players]
+        result = {"reads": [], "writes": [], "errors": 0, "socket_ops": 0}
+        deadline = time.monotonic() + options["duration"]
+
+        async def read(index: int):
+            token = tokens[index % len(tokens)]
+            paths = [path.format(user_id=players[index % len(players)].id) for path in READ_PATHS]
+            sent = 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                code = await _request(handler, "GET", paths[sent % len(paths)], token=token)
+                result["reads"].append((time.perf_counter() - started) * 1000)
+                result["errors"] += code != 200
+                sent += 1
+
+        async def write(index: int):
+            # Mỗi client một phòng riêng: vào rồi rời, hai POST đều qua kiểm tra tài khoản còn hoạt động
+            token, body = tokens[index], {"room_id": rooms[index].id}
+            while time.monotonic() < deadline:
+                for path in ("/api/rooms/join/", "/api/rooms/leave/"):
+                    started = time.perf_counter()
+                    code = await _request(handler, "POST", path, body=body, token=token)
+                    result["writes"].append((time.perf_counter() - started) * 1000)
+                    result["errors"] += code != 200
+
+        async def socket_loop(index: int):
+            # Giống handler socket: truy vấn ORM async ngắn, liên tục trên cùng event loop
+            room_id = rooms[index % len(rooms)].id
+            while time.monotonic() < deadline:
+                await Room.objects.filter(id=room_id).values_list("status", flat=True).afirst()
+                result["socket_ops"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(read(i) for i in range(options["readers"])),
+            *(write(i) for i in range(options["writers"])),
+            *(socket_loop(i) for i in range(options["socket_loops"])),
+        )
+        elapsed = time.perf_counter() - started
+        requests = len(result["reads"]) + len(result["writes"])
+        self.stdout.write(f"GET:  {_summary(result['reads'])}")
+        self.stdout.write(f"POST: {_summary(result['writes'])}")
+        self.stdout.write(
+            f"Thông lượng: {requests / elapsed:,.0f} request/s ({result['errors']} lỗi), "
+            f"{result['socket_ops'] / elapsed:,.0f} thao tác socket/s"
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from matches.messages import JoinRoom, MakeMove, SendMessage, ValidationError, WatchReplay
+
+# (tên, schema, payload): payload giống client JS gửi lên, kể cả id dạng chuỗi và payload sai
+CASES = (
+    ("JoinRoom", JoinRoom, {"room_id": 42}),
+    ("JoinRoom, room_id chuỗi", JoinRoom, {"room_id": "42"}),
+    ("MakeMove", MakeMove, {"room_id": 42, "row": 7, "col": 8, "match_id": 1001}),
+    ("SendMessage", SendMessage, {"room_id": 42, "message": "gg"}),
+    ("WatchReplay, dùng mặc định", WatchReplay, {"match_id": 1001}),
+    ("MakeMove sai (row ngoài bàn)", MakeMove, {"room_id": 42, "row": 99, "col": 8}),
+)
+
+
+def _bare_get(data):
+    """Cách đọc cũ trước schema: data.get() từng trường, không kiểm tra gì."""
+    return data.get("room_id"), data.get("row"), data.get("col"), data.get("match_id")
+
+
+def _per_call_ns(func, payload, rounds: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(rounds):
+        try:
+            func(payload)
+        except ValidationError:
+            pass
+    return (time.perf_counter_ns() - started) / rounds
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: chi phí giải mã một sự kiện Socket.IO bằng schema biên dịch sẵn (matches/messages.py), "
+        "so với đọc data.get() không kiểm tra. Lấy lần chạy nhanh nhất trong --repeat lần."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=200_000, help="Số lần giải mã mỗi lần chạy")
+        parser.add_argument("--repeat", type=int, default=5, help="Số lần chạy mỗi trường hợp")
+
+    def handle(self, *args, **options):
+        rounds, repeat = options["rounds"], options["repeat"]
+        baseline = min(_per_call_ns(_bare_get, CASES[2][2], rounds) for _ in range(repeat))
+        self.stdout.write(f"{'data.get() (MakeMove, không kiểm tra)':<40} {baseline:7.0f} ns")
+        for name, schema, payload in CASES:
+            cost = min(_per_call_ns(schema.decode, payload, rounds) for _ in range(repeat))
+            self.stdout.write(f"{name:<40} {cost:7.0f} ns  (+{cost - baseline:.0f} ns)")
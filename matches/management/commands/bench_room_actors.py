@@ -0,0 +1,69 @@
+import asyncio
+import time
+import tracemalloc
+from statistics import quantiles
+
+from django.core.management.base import BaseCommand
+
+from matches import room_actor
+
+
+async def _flush(room_id, events: list):
+    pass
+
+
+async def _command(room_id, number: int):
+    room_actor.broadcast(room_id, "move_made", {"room_id": room_id, "move": number})
+    await asyncio.sleep(0)
+    return number
+
+
+def _summary(latencies: list) -> str:
+    cuts = quantiles(latencies, n=100)
+    return f"{len(latencies)} lệnh, p50 {cuts[49]:.1f} µs, p99 {cuts[98]:.1f} µs, tối đa {max(latencies):.1f} µs"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: actor của phòng (matches/room_actor.py) với nhiều phòng cùng hoạt động. "
+        "Đo lệnh đầu tiên mỗi phòng (khởi động actor), độ trễ từng lệnh khi actor đã chạy và bộ nhớ mỗi phòng."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10_000, help="Số phòng hoạt động cùng lúc")
+        parser.add_argument("--commands", type=int, default=20, help="Số lệnh mỗi phòng sau lệnh đầu tiên")
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options["rooms"], options["commands"]))
+
+    async def run(self, rooms: int, commands: int):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        # Phòng lẻ gửi room_id dạng chuỗi như client JS: phải dùng chung actor với dạng int
+        await asyncio.gather(*(
+            room_actor.run_in_room(str(room_id) if room_id % 2 else room_id, _flush, _command, room_id, 0)
+            for room_id in range(1, rooms + 1)
+        ))
+        cold = time.perf_counter() - started
+        per_room = (tracemalloc.get_traced_memory()[0] - before) / rooms
+        tracemalloc.stop()
+        self.stdout.write(
+            f"Khởi động {rooms} actor (có tracemalloc): {cold:.2f} s ({cold / rooms * 1e6:.0f} µs/phòng), "
+            f"khoảng {per_room / 1024:.1f} KB/phòng, {room_actor.active_rooms()} actor đang chạy"
+        )
+
+        latencies = []
+
+        async def play(room_id: int):
+            for number in range(1, commands + 1):
+                sent = time.perf_counter()
+                await room_actor.run_in_room(room_id, _flush, _command, room_id, number)
+                latencies.append((time.perf_counter() - sent) * 1e6)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(play(room_id) for room_id in range(1, rooms + 1)))
+        elapsed = time.perf_counter() - started
+        # Mọi phòng gửi lệnh cùng lúc nên độ trễ chủ yếu là thời gian chờ tới lượt trên event loop
+        self.stdout.write(f"Actor đã chạy, {rooms} phòng gửi cùng lúc: {_summary(latencies)}")
+        self.stdout.write(f"Thông lượng: {len(latencies) / elapsed:,.0f} lệnh/s trên một event loop")
@@ -0,0 +1,62 @@
+import random
+import time
+from statistics import fmean, quantiles
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches.models import Room
+from matches.rules import MOVE_CHECK_BUDGET_US, forbidden_reason, full_lines, is_winning_move
+
+
+def _random_game(size: int, rng: random.Random, moves: int) -> list:
+    """Chuỗi nước ngẫu nhiên dồn quanh tâm bàn cờ để có nhiều chuỗi quân dài như ván thật."""
+    center = size // 2
+    spread = max(size // 4, 3)
+    cells = [
+        (r, c)
+        for r in range(max(center - spread, 0), min(center + spread + 1, size))
+        for c in range(max(center - spread, 0), min(center + spread + 1, size))
+    ]
+    rng.shuffle(cells)
+    return cells[:moves]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: thời gian kiểm tra một nước (is_winning_move + forbidden_reason) cho mọi luật và "
+        "kích thước bàn cờ, trên các ván ngẫu nhiên. Lỗi nếu p99 vượt MOVE_CHECK_BUDGET_US."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--games", type=int, default=200, help="Số ván mỗi luật / kích thước")
+        parser.add_argument("--moves", type=int, default=80, help="Số nước mỗi ván")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        over_budget = []
+        for size in Room.BoardSize.values:
+            full_lines(size)  # Bảng đường được dựng một lần mỗi process, không tính vào từng nước
+            for variant in Room.RuleVariant.values:
+                rng = random.Random(options["seed"])
+                timings = []
+                for _ in range(options["games"]):
+                    board = [[None] * size for _ in range(size)]
+                    for number, (row, col) in enumerate(_random_game(size, rng, options["moves"])):
+                        player = "X" if number % 2 == 0 else "O"
+                        board[row][col] = player
+                        started = time.perf_counter_ns()
+                        is_winning_move(board, row, col, player, variant)
+                        forbidden_reason(board, row, col, player, variant)
+                        timings.append((time.perf_counter_ns() - started) / 1000)
+
+                p99 = quantiles(timings, n=100)[98]
+                self.stdout.write(
+                    f"{variant:>10} {size}x{size}: trung bình {fmean(timings):6.1f} µs, p99 {p99:6.1f} µs, "
+                    f"tối đa {max(timings):7.1f} µs ({len(timings)} nước)"
+                )
+                if p99 > MOVE_CHECK_BUDGET_US:
+                    over_budget.append(f"{variant} {size}x{size}")
+
+        if over_budget:
+            raise CommandError(f"Vượt ngân sách {MOVE_CHECK_BUDGET_US} µs/nước (p99): {', '.join(over_budget)}")
+        self.stdout.write(self.style.SUCCESS(f"Mọi luật đều trong ngân sách {MOVE_CHECK_BUDGET_US} µs/nước (p99)."))
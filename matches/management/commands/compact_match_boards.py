@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from matches.encoding import ORDERED, POSITION, encode_moves, grid_to_position
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = (
+        "Chuyển board_state/moves JSON của các trận đã kết thúc sang dạng bit-packed (move_data), "
+        "từng lô nhỏ theo id; chạy lại được bất cứ lúc nào."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.05, help="Số giây nghỉ giữa các lô")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        converted = skipped = 0
+        bytes_before = bytes_after = 0
+
+        while True:
+            rows = list(
+                Match.objects.filter(id__gt=last_id, end_time__isnull=False, move_data__isnull=True)
+                .order_by("id")
+                .values_list("id", "board_size", "moves", "board_state")[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            encoded = {}
+            for match_id, board_size, moves, board_state in rows:
+                if moves:
+                    data = encode_moves(moves, board_size, ORDERED)
+                else:
+                    position = grid_to_position(board_state or [])
+                    if position is None:
+                        skipped += 1
+                        continue
+                    data = encode_moves(position, board_size, POSITION)
+                encoded[match_id] = data
+                bytes_before += len(str(moves)) + len(str(board_state))
+                bytes_after += len(data)
+
+            # Mỗi lô một transaction ngắn; chỉ ghi dòng chưa được chuyển
+            with transaction.atomic():
+                for match_id, data in encoded.items():
+                    Match.objects.filter(id=match_id, move_data__isnull=True).update(
+                        move_data=data, moves=[], board_state=[]
+                    )
+            converted += len(encoded)
+            self.stdout.write(f"Đã chuyển {converted} trận (tới id {last_id})...")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã chuyển {converted} trận, bỏ qua {skipped} trận có bàn cờ không hợp lệ. "
+            f"Dữ liệu nước đi: ~{bytes_before} -> {bytes_after} bytes. "
+            "Chạy VACUUM để thu hồi dung lượng bảng."
+        ))
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from matches.models import FairPlayAnalysis, FairPlayProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Báo cáo cho moderator: người chơi có điểm nghi vấn fair-play cao nhất, "
+        "hoặc chi tiết từng trận của một người chơi với --user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=float, default=None, help="Điểm tối thiểu (mặc định FAIRPLAY_REPORT_THRESHOLD)")
+        parser.add_argument("--min-moves", type=int, default=50, help="Bỏ qua người có ít nước được chấm hơn")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--user", type=int, default=None, help="Id người chơi cần xem chi tiết")
+
+    def handle(self, *args, **options):
+        if options["user"] is not None:
+            self._user_report(options["user"], options["limit"])
+            return
+
+        threshold = options["threshold"]
+        if threshold is None:
+            threshold = settings.FAIRPLAY_REPORT_THRESHOLD
+        profiles = (
+            FairPlayProfile.objects.select_related("user")
+            .filter(suspicion__gte=threshold, moves__gte=options["min_moves"])
+            .order_by("-suspicion")[:options["limit"]]
+        )
+        self.stdout.write(f"{'ID':>6}  {'Người chơi':<24} {'ELO':>5} {'Điểm':>7} {'Trận':>5} {'Nước':>6} {'Trùng':>7} {'Nhịp đều':>9}")
+        count = 0
+        for profile in profiles:
+            count += 1
+            user = profile.user
+            self.stdout.write(
+                f"{user.id:>6}  {user.username[:24]:<24} {user.elo:>5} {profile.suspicion:>7.2f} {profile.games:>5} "
+                f"{profile.moves:>6} {profile.match_rate:>7.1%} {profile.uniform_timing_games:>4}/{profile.timed_games:<4}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{count} người chơi có điểm nghi vấn từ {threshold}."))
+
+    def _user_report(self, user_id: int, limit: int):
+        profile = FairPlayProfile.objects.select_related("user").filter(user_id=user_id).first()
+        if profile is None:
+            raise CommandError(f"Người chơi {user_id} chưa được chấm fair-play")
+        self.stdout.write(
+            f"{profile.user.username} (ELO {profile.user.elo}): điểm {profile.suspicion:.2f}, "
+            f"trùng engine {profile.engine_matches}/{profile.moves} nước ({profile.match_rate:.1%}), "
+            f"nhịp đều {profile.uniform_timing_games}/{profile.timed_games} trận có ghi thời gian"
+        )
+        analyses = FairPlayAnalysis.objects.filter(user_id=user_id).order_by("-match")[:limit]
+        for analysis in analyses:
+            timing = "-" if analysis.mean_move_ms is None else f"{analysis.mean_move_ms}ms"
+            cv = "-" if analysis.timing_cv is None else f"{analysis.timing_cv:.2f}"
+            flags = ", ".join(analysis.flags)
+            self.stdout.write(
+                f"  Trận {analysis.match_id:>7}: {analysis.engine_matches:>3}/{analysis.moves:<3} "
+                f"TB {timing:>8} CV {cv:>5} {flags}"
+            )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from matches.analytics import record_matches
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = (
+        "Cộng các trận đã kết thúc nhưng chưa được tính vào bảng thống kê chung, "
+        "từng lô nhỏ theo id; dừng giữa chừng rồi chạy lại không bị cộng trùng."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.05, help="Số giây nghỉ giữa các lô")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        recorded = 0
+
+        while True:
+            batch = list(
+                Match.objects.filter(id__gt=last_id, end_time__isnull=False, stats_recorded=False)
+                .order_by("id")
+                .only(
+                    "id", "player_x", "player_o", "winner", "board_size", "end_time",
+                    "moves", "board_state", "move_data",
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # Khóa và đánh dấu trong cùng transaction với việc cộng để mỗi trận chỉ được tính một lần
+            with transaction.atomic():
+                pending = set(
+                    Match.objects.select_for_update()
+                    .filter(id__in=[match.id for match in batch], stats_recorded=False)
+                    .values_list("id", flat=True)
+                )
+                record_matches([match for match in batch if match.id in pending])
+                Match.objects.filter(id__in=pending).update(stats_recorded=True)
+            recorded += len(pending)
+            self.stdout.write(f"Đã cộng {recorded} trận (tới id {last_id})...")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Đã cộng {recorded} trận vào thống kê chung."))
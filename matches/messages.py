@@ -0,0 +1,232 @@
+"""
+Schema cho payload Socket.IO: khai báo kiểu từng sự kiện client gửi lên, giải mã bằng validator biên dịch sẵn
+
+Mỗi schema là một lớp con của Message, khai báo trường bằng annotation (int, str, bool,
+int | None) và Field(...) cho ràng buộc/giá trị mặc định. Khi lớp được tạo, một hàm decode
+riêng cho lớp đó được sinh ra và biên dịch một lần (giống cách dataclasses sinh __init__),
+nên mỗi sự kiện chỉ tốn vài phép so sánh kiểu, không duyệt schema lúc chạy.
+
+Payload sai (không phải object, thiếu trường, sai kiểu, ngoài khoảng) bị từ chối trong
+@validated trước khi handler chạm tới DB hay trạng thái phòng; client nhận 'error' kèm
+tên sự kiện và trường lỗi.
+"""
+import functools
+import logging
+import re
+
+from .rules import MAX_BOARD_SIZE
+
+logger = logging.getLogger(__name__)
+
+_server = None
+_MISSING = object()
+_TYPES = (int, str, bool)
+_UNSIGNED_INT = re.compile(r"[0-9]+")
+_SIGNED_INT = re.compile(r"[0-9]+|-[1-9][0-9]*")
+
+
+class ValidationError(ValueError):
+    """Payload không khớp schema; field là tên trường lỗi, None nếu payload không phải object."""
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.field = field
+
+
+class Field:
+    """Ràng buộc của một trường: ge/le cho int, max_length cho str, default nếu được phép thiếu."""
+
+    def __init__(self, default=_MISSING, ge=None, le=None, max_length=None):
+        self.default = default
+        self.ge = ge
+        self.le = le
+        self.max_length = max_length
+
+
+def _int(value, field, signed: bool = False):
+    """
+    int từ chuỗi chữ số thập phân (client JS hay gửi id dạng chuỗi); bool không được coi là int.
+
+    Chỉ nhận đúng chữ số, có dấu '-' ở đầu nếu signed (trường cho phép số âm); khoảng trắng,
+    '+', '_' và '-0' bị từ chối.
+    """
+    if type(value) is str and (_SIGNED_INT if signed else _UNSIGNED_INT).fullmatch(value):
+        return int(value)
+    raise ValidationError(field)
+
+
+def _field_type(annotation):
+    nullable = False
+    args = getattr(annotation, "__args__", None)
+    if args is not None:
+        # int | None / Optional[int]
+        kinds = [arg for arg in args if arg is not type(None)]
+        if len(kinds) != 1 or len(args) != 2:
+            raise TypeError(f"Kiểu không hỗ trợ: {annotation}")
+        annotation, nullable = kinds[0], True
+    if annotation not in _TYPES:
+        raise TypeError(f"Kiểu không hỗ trợ: {annotation}")
+    return annotation, nullable
+
+
+def _compile(cls, fields):
+    """Sinh và biên dịch hàm decode(data) cho lớp cls."""
+    env = {"_cls": cls, "_new": object.__new__, "_MISSING": _MISSING, "_Error": ValidationError, "_int": _int}
+    lines = ["def decode(data):"]
+    if cls.allow_empty:
+        lines += ["    if data is None:", "        data = {}"]
+    lines += [
+        "    if type(data) is not dict:",
+        "        raise _Error(None)",
+        "    self = _new(_cls)",
+    ]
+    for name, (kind, nullable, spec) in fields.items():
+        lines += [f"    v = data.get({name!r}, _MISSING)", "    if v is _MISSING:"]
+        if spec.default is _MISSING:
+            lines.append(f"        raise _Error({name!r})")
+        else:
+            env[f"_default_{name}"] = spec.default
+            lines.append(f"        v = _default_{name}")
+        if nullable:
+            lines += ["    elif v is None:", "        pass"]
+        lines.append("    else:")
+        if kind is int:
+            signed = spec.ge is None or spec.ge < 0
+            lines += ["        if type(v) is not int:", f"            v = _int(v, {name!r}, {signed})"]
+            checks = []
+            if spec.ge is not None:
+                checks.append(f"v < {spec.ge}")
+            if spec.le is not None:
+                checks.append(f"v > {spec.le}")
+            if checks:
+                lines += [f"        if {' or '.join(checks)}:", f"            raise _Error({name!r})"]
+        else:
+            lines += [f"        if type(v) is not {kind.__name__}:", f"            raise _Error({name!r})"]
+            if spec.max_length is not None:
+                lines += [f"        if len(v) > {spec.max_length}:", f"            raise _Error({name!r})"]
+        lines.append(f"    self.{name} = v")
+    lines.append("    return self")
+    exec(compile("\n".join(lines), f"<decode {cls.__name__}>", "exec"), env)
+    return env["decode"]
+
+
+class _MessageMeta(type):
+    """Đọc annotation của schema, đặt __slots__ theo các trường rồi biên dịch decode."""
+
+    def __new__(mcs, name, bases, namespace):
+        fields = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, "_fields", {}))
+        own = []
+        for field, annotation in namespace.get("__annotations__", {}).items():
+            spec = namespace.pop(field, Field())
+            if not isinstance(spec, Field):
+                spec = Field(default=spec)
+            fields[field] = (*_field_type(annotation), spec)
+            own.append(field)
+        namespace["__slots__"] = tuple(own)
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._fields = fields
+        cls.decode = staticmethod(_compile(cls, fields))
+        return cls
+
+
+class Message(metaclass=_MessageMeta):
+    """
+    Lớp gốc của các schema sự kiện.
+
+    Lớp con khai báo trường bằng annotation; Lớp.decode(data) trả về instance đã kiểm tra
+    hoặc raise ValidationError. Lớp con kế thừa các trường của lớp cha.
+    """
+
+    allow_empty = False  # Cho phép client gửi sự kiện không kèm payload
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({values})"
+
+
+# Schema của từng sự kiện client gửi lên
+
+class RoomMessage(Message):
+    room_id: int = Field(ge=1)
+
+
+class JoinRoom(RoomMessage):
+    pass
+
+
+class LeaveRoom(RoomMessage):
+    pass
+
+
+class WatchRoom(RoomMessage):
+    pass
+
+
+class MakeMove(Message):
+    room_id: int = Field(ge=1)
+    row: int = Field(ge=0, le=MAX_BOARD_SIZE - 1)
+    col: int = Field(ge=0, le=MAX_BOARD_SIZE - 1)
+    match_id: int | None = None
+
+
+class SendMessage(Message):
+    room_id: int = Field(ge=1)
+    message: str = Field(max_length=500)
+
+
+class Rematch(Message):
+    room_id: int = Field(ge=1)
+    accept: bool = True
+
+
+class ToggleHints(Message):
+    room_id: int = Field(ge=1)
+    enabled: bool = False
+
+
+class JoinTournament(Message):
+    tournament_id: int = Field(ge=1)
+
+
+class WatchReplay(Message):
+    match_id: int = Field(ge=1)
+    from_move: int = Field(default=0, ge=0)
+    interval_ms: int = Field(default=500)
+
+
+class StopReplay(Message):
+    allow_empty = True
+
+
+def validated(schema):
+    """
+    Giải mã payload bằng schema trước khi gọi handler; đặt ngay trên hàm handler.
+
+    Handler nhận (sid, msg) với msg là instance của schema. Payload sai bị bỏ, client nhận 'error'.
+    """
+    decode = schema.decode
+
+    def decorator(func):
+        event = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(sid, data=None):
+            try:
+                msg = decode(data)
+            except ValidationError as exc:
+                logger.info("Rejected %s from %s: invalid field %s", event, sid, exc.field)
+                await _server.emit('error', {'message': 'Dữ liệu không hợp lệ', 'event': event, 'field': exc.field}, room=sid)
+                return None
+            return await func(sid, msg)
+
+        return wrapper
+
+    return decorator
+
+
+def install(sio):
+    """Lưu server để @validated gửi lỗi về client."""
+    global _server
+    _server = sio
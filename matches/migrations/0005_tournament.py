@@ -0,0 +1,75 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_match_board_size_match_current_turn_match_room_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TournamentPlayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('had_bye', models.BooleanField(default=False)),
+                ('color_balance', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='tournament_round',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('format', models.CharField(choices=[('swiss', 'Hệ Thụy Sĩ'), ('round_robin', 'Vòng tròn')], default='swiss', max_length=20)),
+                ('board_size', models.IntegerField(choices=[(15, '15x15'), (19, '19x19')], default=15)),
+                ('total_rounds', models.PositiveSmallIntegerField(default=5)),
+                ('current_round', models.PositiveSmallIntegerField(default=0)),
+                ('settled_round', models.PositiveSmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('registering', 'Đang đăng ký'), ('running', 'Đang diễn ra'), ('finished', 'Đã kết thúc')], default='registering', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='organized_tournaments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='tournament',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='matches.tournament'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'tournament_round'], name='matches_mat_tournam_b2e9c4_idx'),
+        ),
+        migrations.AddField(
+            model_name='tournamentplayer',
+            name='tournament',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='matches.tournament'),
+        ),
+        migrations.AddField(
+            model_name='tournamentplayer',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tournament_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tournamentplayer',
+            index=models.Index(fields=['tournament', '-score'], name='matches_tou_tournam_943fd4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tournamentplayer',
+            constraint=models.UniqueConstraint(fields=('tournament', 'user'), name='unique_tournament_entry'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_duplicate_waiting_rooms(apps, schema_editor):
+    """Giữ lại phòng chờ mới nhất của mỗi host trước khi thêm ràng buộc."""
+    Room = apps.get_model('matches', 'Room')
+    seen = set()
+    duplicates = []
+    for room_id, host_id in Room.objects.filter(status='waiting').order_by('host_id', '-created_at').values_list('id', 'host_id'):
+        if host_id in seen:
+            duplicates.append(room_id)
+        seen.add(host_id)
+    Room.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0005_tournament'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_waiting_rooms, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='room',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('host',), name='unique_waiting_room_per_host'),
+        ),
+    ]
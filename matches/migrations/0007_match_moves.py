@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0006_room_unique_waiting_room_per_host'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='moves',
+            field=models.JSONField(default=list, verbose_name='Nước đi'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0007_match_moves'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='rule_variant',
+            field=models.CharField(choices=[('standard', 'Tự do (5 quân trở lên)'), ('exact_five', 'Đúng 5 quân'), ('caro', 'Caro (chặn hai đầu)'), ('renju', 'Renju')], default='standard', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rule_variant',
+            field=models.CharField(choices=[('standard', 'Tự do (5 quân trở lên)'), ('exact_five', 'Đúng 5 quân'), ('caro', 'Caro (chặn hai đầu)'), ('renju', 'Renju')], default='standard', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='rule_variant',
+            field=models.CharField(choices=[('standard', 'Tự do (5 quân trở lên)'), ('exact_five', 'Đúng 5 quân'), ('caro', 'Caro (chặn hai đầu)'), ('renju', 'Renju')], default='standard', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='room',
+            name='board_size',
+            field=models.IntegerField(choices=[(15, '15x15'), (19, '19x19'), (21, '21x21'), (25, '25x25')], default=15),
+        ),
+        migrations.AlterField(
+            model_name='tournament',
+            name='board_size',
+            field=models.IntegerField(choices=[(15, '15x15'), (19, '19x19'), (21, '21x21'), (25, '25x25')], default=15),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0008_match_rule_variant_room_rule_variant_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='move_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
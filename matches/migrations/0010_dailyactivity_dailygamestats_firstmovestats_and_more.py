@@ -0,0 +1,67 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0009_match_move_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('peak_concurrent', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyGameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('board_size', models.IntegerField()),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('x_wins', models.PositiveIntegerField(default=0)),
+                ('o_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('total_moves', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FirstMoveStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board_size', models.IntegerField()),
+                ('row', models.PositiveSmallIntegerField()),
+                ('col', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='stats_recorded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(condition=models.Q(('end_time__isnull', False), ('stats_recorded', False)), fields=['id'], name='match_stats_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailygamestats',
+            constraint=models.UniqueConstraint(fields=('date', 'board_size'), name='unique_daily_game_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='firstmovestats',
+            index=models.Index(fields=['board_size', '-count'], name='matches_fir_board_s_c90902_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='firstmovestats',
+            constraint=models.UniqueConstraint(fields=('board_size', 'row', 'col'), name='unique_first_move_stats'),
+        ),
+    ]
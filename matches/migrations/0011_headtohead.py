@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0010_dailyactivity_dailygamestats_firstmovestats_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('low_wins', models.PositiveIntegerField(default=0)),
+                ('high_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('recent', models.JSONField(default=list)),
+                ('last_played', models.DateTimeField(blank=True, null=True)),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user_low', 'user_high'), name='unique_head_to_head_pair'), models.CheckConstraint(condition=models.Q(('user_low__lt', models.F('user_high'))), name='head_to_head_ordered_pair')],
+            },
+        ),
+    ]
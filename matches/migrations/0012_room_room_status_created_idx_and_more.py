@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0011_headtohead'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='room_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', 'board_size', '-created_at', '-id'], name='room_status_size_created_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0012_room_room_status_created_idx_and_more'),
+        ('users', '0004_outstandingtoken_expires_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FairPlayCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_match_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FairPlayProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fair_play', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('moves', models.PositiveIntegerField(default=0)),
+                ('engine_matches', models.PositiveIntegerField(default=0)),
+                ('timed_games', models.PositiveIntegerField(default=0)),
+                ('uniform_timing_games', models.PositiveIntegerField(default=0)),
+                ('suspicion', models.FloatField(db_index=True, default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='move_times',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='FairPlayAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('moves', models.PositiveSmallIntegerField(default=0)),
+                ('engine_matches', models.PositiveSmallIntegerField(default=0)),
+                ('mean_move_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('timing_cv', models.FloatField(blank=True, null=True)),
+                ('flags', models.JSONField(default=list)),
+                ('analyzed_at', models.DateTimeField(auto_now_add=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fair_play', to='matches.match')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-match'], name='matches_fai_user_id_0d1f89_idx')],
+                'constraints': [models.UniqueConstraint(fields=('match', 'user'), name='unique_fair_play_analysis')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0013_fairplaycheckpoint_fairplayprofile_match_move_times_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='rated',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rated',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
+from . import rules
+from .encoding import ORDERED, decode_moves, decode_times, encode_moves, encode_times, moves_to_grid
+
 
 class Room(models.Model):
     class Status(models.TextChoices):
@@ -13,6 +16,14 @@ class Room(models.Model):
     class BoardSize(models.IntegerChoices):
         SMALL = 15, "15x15"
         LARGE = 19, "19x19"
+        XLARGE = 21, "21x21"
+        HUGE = rules.MAX_BOARD_SIZE, "25x25"
+
+    class RuleVariant(models.TextChoices):
+        STANDARD = rules.STANDARD, "Tự do (5 quân trở lên)"
+        EXACT_FIVE = rules.EXACT_FIVE, "Đúng 5 quân"
+        CARO = rules.CARO, "Caro (chặn hai đầu)"
+        RENJU = rules.RENJU, "Renju"
 
     room_name = models.CharField(max_length=100)
     host = models.ForeignKey(
@@ -31,9 +42,27 @@ class Room(models.Model):
 
     password = models.CharField(max_length=50, null=True, blank=True)
     board_size = models.IntegerField(choices=BoardSize.choices, default=BoardSize.SMALL)
+    rule_variant = models.CharField(max_length=20, choices=RuleVariant.choices, default=RuleVariant.STANDARD)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.WAITING)
+    # Phòng chơi thường (rated=False): trận không tính ELO/bảng xếp hạng và người chơi, khán giả được xem gợi ý
+    rated = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Mỗi host chỉ có một phòng đang chờ; tạo phòng chỉ cần một câu INSERT
+            models.UniqueConstraint(
+                fields=["host"],
+                condition=models.Q(status="waiting"),
+                name="unique_waiting_room_per_host",
+            ),
+        ]
+        indexes = [
+            # Tìm phòng theo trạng thái (và kích thước bàn cờ), mới nhất trước, phân trang theo (created_at, id)
+            models.Index(fields=["status", "-created_at", "-id"], name="room_status_created_idx"),
+            models.Index(fields=["status", "board_size", "-created_at", "-id"], name="room_status_size_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.room_name} ({self.host.username})"
 
@@ -51,7 +80,8 @@ class Room(models.Model):
     @classmethod
     def prune_stale(cls, hours: int = 24):
         cutoff = timezone.now() - timedelta(hours=hours)
-        cls.objects.filter(status=cls.Status.WAITING, player_2__isnull=True, created_at__lt=cutoff).delete()
+        deleted, _ = cls.objects.filter(status=cls.Status.WAITING, player_2__isnull=True, created_at__lt=cutoff).delete()
+        return deleted
 
 
 class Match(models.Model):
@@ -76,9 +106,29 @@ class Match(models.Model):
     )
     
     room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True, related_name='matches')
+    # Trận thuộc giải đấu: ELO được chốt theo vòng thay vì ngay khi kết thúc
+    tournament = models.ForeignKey(
+        'Tournament',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='matches'
+    )
+    tournament_round = models.PositiveSmallIntegerField(null=True, blank=True)
     board_size = models.IntegerField(default=15)
+    rule_variant = models.CharField(max_length=20, choices=Room.RuleVariant.choices, default=Room.RuleVariant.STANDARD)
     # JSONField lưu tọa độ các nước đi: [[row, col, player], ...] player: 'X' hoặc 'O'
     board_state = models.JSONField(default=list, verbose_name="Trạng thái bàn cờ")
+    # Các nước đi theo thứ tự: [[row, col], ...], X đi trước rồi luân phiên
+    moves = models.JSONField(default=list, verbose_name="Nước đi")
+    # Trận đã kết thúc: nước đi dạng bit-packed (xem encoding.py), board_state/moves để trống
+    move_data = models.BinaryField(null=True, blank=True, editable=False)
+    # Thời gian suy nghĩ (ms) của từng nước theo thứ tự, 4 byte mỗi nước; trống với trận cũ
+    move_times = models.BinaryField(null=True, blank=True, editable=False)
+    # Đã được cộng vào các bảng thống kê chung (xem analytics.py)
+    stats_recorded = models.BooleanField(default=False)
+    # Chép từ Room.rated lúc tạo trận; trận giải đấu luôn tính điểm
+    rated = models.BooleanField(default=True)
     current_turn = models.CharField(max_length=1, default='X')  # 'X' hoặc 'O'
     
     start_time = models.DateTimeField(auto_now_add=True, verbose_name="Thời gian bắt đầu")
@@ -86,6 +136,236 @@ class Match(models.Model):
 
     class Meta:
         verbose_name_plural = "Matches"
+        indexes = [
+            models.Index(fields=["tournament", "tournament_round"]),
+            # Job rollup chỉ quét các trận đã kết thúc nhưng chưa được cộng vào thống kê
+            models.Index(
+                fields=["id"],
+                condition=models.Q(stats_recorded=False, end_time__isnull=False),
+                name="match_stats_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Match {self.id}: {self.player_x} vs {self.player_o}"
+
+    def set_moves(self, moves: list, move_times: list = None):
+        """Lưu nước đi (và thời gian suy nghĩ từng nước nếu có) của trận vừa kết thúc dạng gọn."""
+        self.move_data = encode_moves(moves, self.board_size)
+        if move_times:
+            self.move_times = encode_times(move_times)
+        self.moves = []
+        self.board_state = []
+
+    def _stones(self) -> tuple:
+        """(có đúng thứ tự hay không, [[row, col], ...]) từ dạng lưu gọn hoặc JSON cũ."""
+        if self.move_data:
+            kind, stones = decode_moves(self.move_data, self.board_size)
+            return kind == ORDERED, stones
+        if self.moves:
+            return True, self.moves
+        stones = [[row, col] for row, line in enumerate(self.board_state) for col, cell in enumerate(line) if cell]
+        return False, stones
+
+    def move_history(self) -> list:
+        """Các nước đi theo thứ tự; rỗng nếu trận cũ chỉ còn thế cờ cuối."""
+        ordered, stones = self._stones()
+        return stones if ordered else []
+
+    def move_durations(self) -> list:
+        """Thời gian suy nghĩ (ms) của từng nước; rỗng nếu trận chưa ghi thời gian."""
+        return decode_times(self.move_times) if self.move_times else []
+
+    def move_count(self) -> int:
+        return len(self._stones()[1])
+
+    def board_grid(self) -> list:
+        """Bàn cờ cuối dạng lưới 2D như board_state cũ."""
+        if self.move_data:
+            return moves_to_grid(decode_moves(self.move_data, self.board_size)[1], self.board_size)
+        if self.moves:
+            return moves_to_grid(self.moves, self.board_size)
+        return self.board_state
+
+
+class Tournament(models.Model):
+    class Format(models.TextChoices):
+        SWISS = "swiss", "Hệ Thụy Sĩ"
+        ROUND_ROBIN = "round_robin", "Vòng tròn"
+
+    class Status(models.TextChoices):
+        REGISTERING = "registering", "Đang đăng ký"
+        RUNNING = "running", "Đang diễn ra"
+        FINISHED = "finished", "Đã kết thúc"
+
+    name = models.CharField(max_length=100)
+    organizer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="organized_tournaments"
+    )
+    format = models.CharField(max_length=20, choices=Format.choices, default=Format.SWISS)
+    board_size = models.IntegerField(choices=Room.BoardSize.choices, default=Room.BoardSize.SMALL)
+    rule_variant = models.CharField(max_length=20, choices=Room.RuleVariant.choices, default=Room.RuleVariant.STANDARD)
+    # Với vòng tròn, số vòng được tính lại khi bắt đầu giải
+    total_rounds = models.PositiveSmallIntegerField(default=5)
+    current_round = models.PositiveSmallIntegerField(default=0)
+    settled_round = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.REGISTERING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_format_display()})"
+
+    @property
+    def round_in_progress(self) -> bool:
+        return self.current_round > self.settled_round
+
+
+class TournamentPlayer(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="entries")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="tournament_entries"
+    )
+    # Bảng xếp hạng được cập nhật dần sau mỗi vòng, không tính lại từ đầu
+    score = models.FloatField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    had_bye = models.BooleanField(default=False)
+    # +1 mỗi lần cầm X, -1 mỗi lần cầm O, dùng để cân bằng lượt đi trước
+    color_balance = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tournament", "user"], name="unique_tournament_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["tournament", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} @ {self.tournament} ({self.score})"
+
+
+class DailyGameStats(models.Model):
+    """Số trận, kết quả và tổng số nước theo ngày kết thúc và kích thước bàn cờ."""
+    date = models.DateField()
+    board_size = models.IntegerField()
+    games = models.PositiveIntegerField(default=0)
+    x_wins = models.PositiveIntegerField(default=0)
+    o_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    total_moves = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "board_size"], name="unique_daily_game_stats"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.board_size}x{self.board_size}: {self.games}"
+
+
+class FirstMoveStats(models.Model):
+    """Số lần mỗi ô được chọn làm nước đi đầu tiên."""
+    board_size = models.IntegerField()
+    row = models.PositiveSmallIntegerField()
+    col = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["board_size", "row", "col"], name="unique_first_move_stats"),
+        ]
+        indexes = [
+            models.Index(fields=["board_size", "-count"]),
+        ]
+
+
+class DailyActivity(models.Model):
+    """Số ván diễn ra đồng thời cao nhất trong ngày."""
+    date = models.DateField(unique=True)
+    peak_concurrent = models.PositiveIntegerField(default=0)
+
+
+class HeadToHead(models.Model):
+    """Thành tích đối đầu của một cặp người chơi, user_low luôn là người có id nhỏ hơn (xem head_to_head.py)."""
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    low_wins = models.PositiveIntegerField(default=0)
+    high_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    # Các trận gần nhất, mới nhất trước: [{match_id, winner_id, board_size, end_time}, ...]
+    recent = models.JSONField(default=list)
+    last_played = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_low", "user_high"], name="unique_head_to_head_pair"),
+            models.CheckConstraint(condition=models.Q(user_low__lt=models.F("user_high")), name="head_to_head_ordered_pair"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low_id} vs {self.user_high_id}: {self.low_wins}-{self.high_wins}-{self.draws}"
+
+
+class FairPlayAnalysis(models.Model):
+    """Kết quả phân tích fair-play của một người chơi trong một trận (xem fairplay.py)."""
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="fair_play")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    # Số nước được chấm (bỏ khai cuộc, nước bắt buộc) và số nước trùng ứng viên hàng đầu của engine
+    moves = models.PositiveSmallIntegerField(default=0)
+    engine_matches = models.PositiveSmallIntegerField(default=0)
+    mean_move_ms = models.PositiveIntegerField(null=True, blank=True)
+    # Hệ số biến thiên thời gian suy nghĩ; None nếu trận không đủ nước có ghi thời gian
+    timing_cv = models.FloatField(null=True, blank=True)
+    flags = models.JSONField(default=list)
+    analyzed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["match", "user"], name="unique_fair_play_analysis"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-match"]),
+        ]
+
+    def __str__(self):
+        return f"Match {self.match_id} / user {self.user_id}: {self.engine_matches}/{self.moves}"
+
+
+class FairPlayProfile(models.Model):
+    """Điểm nghi vấn của một người chơi, cộng dồn qua các lần chạy pipeline fair-play."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="fair_play"
+    )
+    games = models.PositiveIntegerField(default=0)
+    moves = models.PositiveIntegerField(default=0)
+    engine_matches = models.PositiveIntegerField(default=0)
+    timed_games = models.PositiveIntegerField(default=0)
+    uniform_timing_games = models.PositiveIntegerField(default=0)
+    suspicion = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def match_rate(self) -> float:
+        return round(self.engine_matches / self.moves, 4) if self.moves else 0.0
+
+    def __str__(self):
+        return f"Fair play of {self.user_id}: {self.suspicion:.2f}"
+
+
+class FairPlayCheckpoint(models.Model):
+    """Vị trí đã xử lý xong của một lần chạy pipeline, để chạy tiếp sau khi bị dừng."""
+    name = models.CharField(max_length=50, unique=True)
+    last_match_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Match {self.id}: {self.player_x} vs {self.player_o}"
\ No newline at end of file
+        return f"{self.name}: {self.last_match_id}"
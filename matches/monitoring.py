@@ -0,0 +1,233 @@
+"""
+Realtime monitoring: độ trễ event loop, thời gian xử lý từng sự kiện Socket.IO và profiler lấy mẫu
+
+- timed_handler đo mọi handler @sio.event; mọi lượt gọi chậm hơn SOCKET_SLOW_HANDLER_MS đều
+  được ghi vào log "gomoku.realtime.slow" (file xoay vòng, xem LOGGING), kèm các đoạn chờ
+  (truy vấn DB, emit) nếu lượt gọi đó được lấy mẫu theo SOCKET_TRACE_SAMPLE_RATE.
+- Một task nền đo độ trễ của event loop mỗi LOOP_LAG_INTERVAL giây.
+- profiler là profiler lấy mẫu stack của thread chạy event loop, bật/tắt lúc chạy.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+slow_logger = logging.getLogger("gomoku.realtime.slow")
+
+_current_trace = contextvars.ContextVar("socket_trace", default=None)
+
+
+class _Trace:
+    __slots__ = ("spans", "open")
+
+    def __init__(self):
+        self.spans = []
+        self.open = True
+
+    def add(self, kind: str, label: str, started: float):
+        # Task tạo trong handler thừa hưởng context; chỉ ghi khi handler chưa kết thúc
+        if self.open:
+            self.spans.append({"kind": kind, "label": label, "ms": round((time.perf_counter() - started) * 1000, 2)})
+
+
+class _HandlerStats:
+    __slots__ = ("count", "total_ms", "max_ms", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+
+    def add(self, elapsed_ms: float, slow: bool):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.slow += slow
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "slow": self.slow,
+        }
+
+
+_handler_stats = defaultdict(_HandlerStats)
+_loop_lag = {"last_ms": 0.0, "max_ms": 0.0, "samples": 0}
+_loop_thread_id = None
+_lag_task = None
+
+
+@contextmanager
+def span(kind: str, label: str):
+    """Ghi thời gian của một đoạn chờ vào trace của handler hiện tại (nếu đang lấy mẫu)."""
+    trace = _current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add(kind, label, started)
+
+
+def _db_span(execute, sql, params, many, context):
+    trace = _current_trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.add("db", sql[:200], started)
+
+
+def _install_db_wrapper(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_db_span)
+
+
+connection_created.connect(_install_db_wrapper)
+
+
+def instrument_server(sio):
+    """Ghi thời gian các lần emit của server vào trace của handler đang chạy."""
+    emit = sio.emit
+
+    @functools.wraps(emit)
+    async def timed_emit(event, *args, **kwargs):
+        with span("emit", event):
+            return await emit(event, *args, **kwargs)
+
+    sio.emit = timed_emit
+
+
+async def _monitor_loop_lag():
+    interval = settings.LOOP_LAG_INTERVAL
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = (time.perf_counter() - started - interval) * 1000
+        _loop_lag["last_ms"] = round(lag_ms, 2)
+        _loop_lag["max_ms"] = max(_loop_lag["max_ms"], _loop_lag["last_ms"])
+        _loop_lag["samples"] += 1
+        if lag_ms >= settings.LOOP_LAG_WARN_MS:
+            slow_logger.warning(json.dumps({"type": "loop_lag", "lag_ms": round(lag_ms, 2)}))
+
+
+def ensure_lag_monitor():
+    """Khởi động task đo độ trễ event loop (gọi từ trong event loop)."""
+    global _lag_task, _loop_thread_id
+    if _lag_task is None or _lag_task.done():
+        _loop_thread_id = threading.get_ident()
+        _lag_task = asyncio.get_running_loop().create_task(_monitor_loop_lag())
+
+
+def timed_handler(func):
+    """Đo thời gian một handler Socket.IO; đặt ngay dưới @sio.event."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        ensure_lag_monitor()
+        trace = _Trace() if random.random() < settings.SOCKET_TRACE_SAMPLE_RATE else None
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _current_trace.reset(token)
+            slow = elapsed_ms >= settings.SOCKET_SLOW_HANDLER_MS
+            _handler_stats[name].add(elapsed_ms, slow)
+            if trace is not None:
+                trace.open = False
+            if slow:
+                entry = {"type": "slow_handler", "event": name, "ms": round(elapsed_ms, 2)}
+                if trace is not None:
+                    entry["spans"] = trace.spans
+                slow_logger.warning(json.dumps(entry))
+
+    return wrapper
+
+
+def realtime_stats() -> dict:
+    return {
+        "loop_lag": dict(_loop_lag),
+        "handlers": {name: stats.as_dict() for name, stats in sorted(_handler_stats.items())},
+    }
+
+
+class SamplingProfiler:
+    """Lấy mẫu stack của thread event loop định kỳ, kết quả dạng collapsed stack (dùng cho flamegraph)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = Counter()
+        self.started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            target = _loop_thread_id or threading.main_thread().ident
+            self.samples = Counter()
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(target, settings.PROFILER_INTERVAL_MS / 1000),
+                name="realtime-profiler", daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, thread_id: int, interval: float):
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Dừng lấy mẫu và ghi kết quả ra PROFILER_OUTPUT."""
+        with self._lock:
+            if not self.running:
+                return
+            self._stop.set()
+            self._thread.join()
+            os.makedirs(os.path.dirname(settings.PROFILER_OUTPUT), exist_ok=True)
+            with open(settings.PROFILER_OUTPUT, "w") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+
+    def status(self, top: int = 20) -> dict:
+        samples = self.samples.copy()
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "samples": sum(samples.values()),
+            "top": [{"stack": stack, "count": count} for stack, count in samples.most_common(top)],
+        }
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,92 @@
+"""
+Replay for finished matches: chuỗi nước đi dạng gọn kèm keyframe để nhảy tới nước bất kỳ
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Match
+
+# Cứ mỗi KEYFRAME_INTERVAL nước lưu một ảnh chụp bàn cờ
+KEYFRAME_INTERVAL = 20
+REPLAY_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def build_replay(match: Match) -> dict:
+    """
+    Dựng dữ liệu replay của một trận đã kết thúc.
+
+    moves là danh sách chỉ số ô (row * board_size + col), X đi nước đầu và hai bên
+    luân phiên. Mỗi keyframe là chuỗi board_size * board_size ký tự '.', 'X', 'O'
+    sau nước thứ "move".
+    """
+    size = match.board_size
+    cells = ["."] * (size * size)
+    moves = []
+    keyframes = []
+    for number, (row, col) in enumerate(match.move_history(), start=1):
+        index = row * size + col
+        moves.append(index)
+        cells[index] = "X" if number % 2 else "O"
+        if number % KEYFRAME_INTERVAL == 0:
+            keyframes.append({"move": number, "board": "".join(cells)})
+
+    if not moves:
+        # Trận cũ chỉ lưu bàn cờ cuối: trả về một keyframe duy nhất
+        for row, line in enumerate(match.board_grid()):
+            for col, cell in enumerate(line):
+                if cell:
+                    cells[row * size + col] = cell
+        keyframes.append({"move": size * size - cells.count("."), "board": "".join(cells)})
+
+    return {
+        "match_id": match.id,
+        "board_size": size,
+        "player_x": match.player_x.username,
+        "player_o": match.player_o.username,
+        "winner": None if match.winner_id is None else ("X" if match.winner_id == match.player_x_id else "O"),
+        "keyframe_interval": KEYFRAME_INTERVAL,
+        "moves": moves,
+        "keyframes": keyframes,
+    }
+
+
+def _cache_key(match_id: int) -> str:
+    return f"replay:{match_id}"
+
+
+def replay_exists(match_id: int) -> bool:
+    """Trận tồn tại và đã kết thúc; replay đã cache thì không cần truy vấn."""
+    if caches[settings.RESPONSE_CACHE_ALIAS].get(_cache_key(match_id)) is not None:
+        return True
+    return Match.objects.filter(id=match_id, end_time__isnull=False).exists()
+
+
+def get_replay(match_id: int):
+    """Replay đã dựng (cache lâu vì trận đã kết thúc không đổi), None nếu trận chưa kết thúc."""
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    key = _cache_key(match_id)
+    replay = cache.get(key)
+    if replay is None:
+        match = (
+            Match.objects.select_related("player_x", "player_o")
+            .filter(id=match_id, end_time__isnull=False)
+            .first()
+        )
+        if match is None:
+            return None
+        replay = build_replay(match)
+        cache.set(key, replay, timeout=REPLAY_CACHE_TIMEOUT)
+    return replay
+
+
+def board_at(replay: dict, move: int) -> str:
+    """Bàn cờ sau nước thứ move, bắt đầu từ keyframe gần nhất phía trước."""
+    size = replay["board_size"]
+    start, cells = 0, ["."] * (size * size)
+    for keyframe in replay["keyframes"]:
+        if keyframe["move"] > move:
+            break
+        start, cells = keyframe["move"], list(keyframe["board"])
+    for number in range(start + 1, min(move, len(replay["moves"])) + 1):
+        cells[replay["moves"][number - 1]] = "X" if number % 2 else "O"
+    return "".join(cells)
@@ -0,0 +1,115 @@
+"""
+Room actors: mỗi phòng đang hoạt động có một task xử lý lần lượt các lệnh (đánh cờ, vào/rời phòng, hết giờ, chat)
+
+Lệnh của cùng một phòng không bao giờ chạy xen kẽ nên trạng thái ván đấu không cần
+khóa. Các sự kiện phát cho cả phòng được gom lại trong lúc xử lý một lô lệnh rồi
+phát một lần khi lô kết thúc. Phòng không có lệnh trong ROOM_ACTOR_IDLE_TIMEOUT giây
+thì task kết thúc; lệnh tiếp theo sẽ khởi động lại.
+
+Actor được tra theo room_id dạng int (xem room_key): "5" và 5 là cùng một phòng.
+
+Lưu ý: lệnh đang chạy trong actor không được chờ run_in_room của chính phòng đó.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_actors = {}  # {room_id: RoomActor}
+
+
+class RoomActor:
+    __slots__ = ("room_id", "flush", "queue", "outbox", "task")
+
+    def __init__(self, room_id, flush):
+        self.room_id = room_id
+        self.flush = flush
+        self.queue = asyncio.Queue()
+        self.outbox = []
+        self.task = None
+
+    def submit(self, command, args) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((command, args, future))
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), settings.ROOM_ACTOR_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Lệnh có thể vừa tới trong lúc wait_for đang hủy get()
+                    if self.queue.empty():
+                        return
+                    continue
+                batch = [item]
+                while not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                await self._process(batch)
+        finally:
+            self.task = None
+            if self.queue.empty() and _actors.get(self.room_id) is self:
+                del _actors[self.room_id]
+
+    async def _process(self, batch):
+        outcomes = []
+        for command, args, future in batch:
+            try:
+                outcomes.append((future, await command(*args), None))
+            except Exception as exc:
+                outcomes.append((future, None, exc))
+
+        outbox, self.outbox = self.outbox, []
+        if outbox:
+            try:
+                await self.flush(self.room_id, outbox)
+            except Exception:
+                logger.exception("Room %s: failed to flush %d events", self.room_id, len(outbox))
+
+        # Trả kết quả sau khi đã phát sự kiện để người gọi thấy lệnh đã hoàn tất
+        for future, result, exc in outcomes:
+            if future.cancelled():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+def room_key(room_id) -> int:
+    """room_id dạng int dùng làm khóa actor; chuỗi số được đổi sang int, kiểu khác bị từ chối."""
+    if type(room_id) is int:
+        return room_id
+    if type(room_id) is str and room_id.isascii() and room_id.isdigit():
+        return int(room_id)
+    raise ValueError(f"room_id không hợp lệ: {room_id!r}")
+
+
+async def run_in_room(room_id, flush, command, *args):
+    """
+    Chạy command(*args) trong actor của phòng và chờ kết quả.
+
+    Args:
+        room_id: Phòng
+        flush: Coroutine flush(room_id, [(event, data), ...]) phát các sự kiện đã gom của một lô
+        command: Coroutine xử lý lệnh
+    """
+    room_id = room_key(room_id)
+    actor = _actors.get(room_id)
+    if actor is None:
+        actor = _actors[room_id] = RoomActor(room_id, flush)
+    return await actor.submit(command, args)
+
+
+def broadcast(room_id, event: str, data: dict):
+    """Gom một sự kiện phát cho cả phòng; chỉ gọi từ lệnh đang chạy trong actor của phòng."""
+    _actors[room_key(room_id)].outbox.append((event, data))
+
+
+def active_rooms() -> int:
+    return len(_actors)
@@ -0,0 +1,195 @@
+"""
+Rule variants: điều kiện thắng và nước cấm theo từng luật, tra bằng bảng đường thẳng dựng sẵn
+
+Với mỗi kích thước bàn cờ, full_lines lưu mọi đường thẳng trọn vẹn (từ mép tới mép) và cho
+từng ô danh sách các đường đi qua nó. Mọi kiểm tra sau một nước đi chỉ đọc tối đa 4 đường
+này thay vì quét bàn cờ; xét cả đường chứ không chỉ một cửa sổ quanh ô vừa đi nên kết quả
+không phụ thuộc quân nào trong chuỗi được đi sau cùng.
+
+Ngân sách thời gian: kiểm tra thắng + nước cấm của một nước không vượt MOVE_CHECK_BUDGET_US
+ở mọi luật và kích thước bàn cờ (đo bằng lệnh bench_rules).
+"""
+from functools import lru_cache
+
+STANDARD = "standard"      # 5 quân trở lên liên tiếp là thắng
+EXACT_FIVE = "exact_five"  # Phải đúng 5 quân, 6 quân trở lên không tính
+CARO = "caro"              # 5 quân trở lên, nhưng bị đối thủ chặn cả hai đầu thì không thắng
+RENJU = "renju"            # X phải đúng 5 quân và không được đi nước 3-3, 4-4, quá 5
+
+MIN_BOARD_SIZE = 5
+MAX_BOARD_SIZE = 25
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+# Số ô mỗi phía của tâm trong line_table (các cửa sổ 5 ô quanh một ô, dùng để chấm điểm ô)
+REACH = 5
+CENTER = REACH
+EDGE = "#"  # Ô nằm ngoài bàn cờ
+# Ngân sách p99 (micro giây) cho kiểm tra thắng + nước cấm của một nước, xem lệnh bench_rules
+MOVE_CHECK_BUDGET_US = 100
+
+
+@lru_cache(maxsize=None)
+def full_lines(size: int) -> tuple:
+    """
+    Tất cả các đường thẳng trọn vẹn (từ mép tới mép) có ít nhất 5 ô của bàn size x size.
+
+    Returns:
+        (lines, cell_lines): lines[i] là tuple các ô (r, c) theo thứ tự; cell_lines[row * size + col]
+        là tuple các (line_id, vị trí của ô trong đường) đi qua ô đó
+    """
+    line_table(size)  # kiểm tra kích thước
+    lines = []
+    cell_lines = [[] for _ in range(size * size)]
+    for dr, dc in DIRECTIONS:
+        for row in range(size):
+            for col in range(size):
+                # Chỉ bắt đầu từ ô đầu tiên của đường (ô phía trước nằm ngoài bàn cờ)
+                if 0 <= row - dr < size and 0 <= col - dc < size:
+                    continue
+                cells = []
+                r, c = row, col
+                while 0 <= r < size and 0 <= c < size:
+                    cells.append((r, c))
+                    r, c = r + dr, c + dc
+                if len(cells) < 5:
+                    continue
+                for position, (r, c) in enumerate(cells):
+                    cell_lines[r * size + c].append((len(lines), position))
+                lines.append(tuple(cells))
+    return tuple(lines), tuple(tuple(entries) for entries in cell_lines)
+
+
+@lru_cache(maxsize=None)
+def line_table(size: int) -> tuple:
+    """
+    Bảng đường thẳng của bàn size x size.
+
+    table[row * size + col][d] là tuple 2 * REACH + 1 phần tử theo hướng DIRECTIONS[d],
+    phần tử giữa là (row, col); phần tử là (r, c) hoặc None nếu ra ngoài bàn cờ.
+    """
+    if not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+        raise ValueError(f"Kích thước bàn cờ phải từ {MIN_BOARD_SIZE} đến {MAX_BOARD_SIZE}")
+    table = []
+    for row in range(size):
+        for col in range(size):
+            lines = []
+            for dr, dc in DIRECTIONS:
+                line = []
+                for step in range(-REACH, REACH + 1):
+                    r, c = row + step * dr, col + step * dc
+                    line.append((r, c) if 0 <= r < size and 0 <= c < size else None)
+                lines.append(tuple(line))
+            table.append(tuple(lines))
+    return tuple(table)
+
+
+def lines_through(board: list, row: int, col: int) -> list:
+    """
+    Các đường trọn vẹn đi qua (row, col).
+
+    Returns:
+        list (giá trị các ô của đường: 'X', 'O' hoặc None, vị trí của (row, col) trong đường)
+    """
+    size = len(board)
+    lines, cell_lines = full_lines(size)
+    return [
+        ([board[r][c] for r, c in lines[line_id]], position)
+        for line_id, position in cell_lines[row * size + col]
+    ]
+
+
+def _run(line: list, player: str, center: int) -> tuple:
+    """Chỉ số đầu/cuối của chuỗi quân player liên tiếp chứa ô center."""
+    lo = hi = center
+    while lo > 0 and line[lo - 1] == player:
+        lo -= 1
+    while hi < len(line) - 1 and line[hi + 1] == player:
+        hi += 1
+    return lo, hi
+
+
+def is_five(line: list, player: str, variant: str, center: int) -> bool:
+    """Chuỗi quân player chứa ô center trên đường line có là đường thắng theo luật variant không."""
+    lo, hi = _run(line, player, center)
+    length = hi - lo + 1
+    if length < 5:
+        return False
+    if variant == EXACT_FIVE or (variant == RENJU and player == "X"):
+        return length == 5
+    if variant == CARO:
+        opponent = "O" if player == "X" else "X"
+        before = line[lo - 1] if lo > 0 else EDGE
+        after = line[hi + 1] if hi < len(line) - 1 else EDGE
+        return not (before == opponent and after == opponent)
+    return True
+
+
+def _count_fours(line: list, center: int) -> int:
+    """
+    Số nước bốn khác nhau của X qua ô center trên đường này (có ô trống để thành đúng 5 quân).
+
+    Nước bốn được phân biệt bằng bốn quân tạo nên nó: tứ thông .XXXX. có hai ô thắng nhưng
+    chỉ là một nước bốn, còn X.XXX.X là hai nước bốn trên cùng một đường.
+    """
+    fours = set()
+    # Năm quân chứa cả center và ô mới nên ô mới cách center tối đa 4 ô
+    for i in range(max(center - 4, 0), min(center + 5, len(line))):
+        if line[i] is not None:
+            continue
+        line[i] = "X"
+        lo, hi = _run(line, "X", center)
+        line[i] = None
+        if hi - lo + 1 == 5:
+            fours.add(tuple(j for j in range(lo, hi + 1) if j != i))
+    return len(fours)
+
+
+def _makes_open_three(line: list, center: int) -> bool:
+    """X có ô trống để thành tứ thông (.XXXX.) qua ô center, không tạo thành quá 5."""
+    last = len(line) - 1
+    for i in range(max(center - 3, 0), min(center + 4, len(line))):
+        if line[i] is not None:
+            continue
+        line[i] = "X"
+        lo, hi = _run(line, "X", center)
+        line[i] = None
+        if (
+            hi - lo + 1 == 4
+            and 0 < lo and hi < last
+            and line[lo - 1] is None and line[hi + 1] is None
+            and (lo < 2 or line[lo - 2] != "X")
+            and (hi > last - 2 or line[hi + 2] != "X")
+        ):
+            return True
+    return False
+
+
+def is_winning_move(board: list, row: int, col: int, player: str, variant: str = STANDARD) -> bool:
+    """Nước vừa đi tại (row, col) có thắng theo luật variant không (board đã có quân này)."""
+    return any(is_five(line, player, variant, center) for line, center in lines_through(board, row, col))
+
+
+def forbidden_reason(board: list, row: int, col: int, player: str, variant: str = STANDARD):
+    """
+    Lý do nước vừa đi bị cấm, None nếu hợp lệ (board đã có quân này).
+
+    Chỉ luật Renju có nước cấm và chỉ áp dụng cho X: quá 5 ('overline'),
+    hai nước bốn ('double_four', kể cả hai nước bốn trên cùng một đường),
+    hai nước ba thông ('double_three'). Nước tạo thành đúng 5 quân luôn hợp lệ.
+    Ba thông được xét trên từng đường, không đệ quy kiểm tra nước cấm ở ô hoàn
+    thành tứ thông.
+    """
+    if variant != RENJU or player != "X":
+        return None
+    lines = lines_through(board, row, col)
+    if any(is_five(line, player, variant, center) for line, center in lines):
+        return None
+    if any(hi - lo >= 5 for lo, hi in (_run(line, player, center) for line, center in lines)):
+        return "overline"
+    fours = [_count_fours(line, center) for line, center in lines]
+    if sum(fours) >= 2:
+        return "double_four"
+    threes = sum(_makes_open_three(line, center) for (line, center), four in zip(lines, fours) if not four)
+    if threes >= 2:
+        return "double_three"
+    return None
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import Match, Room
+from .models import Match, Room, Tournament, TournamentPlayer
 
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -19,6 +19,8 @@ class RoomSerializer(serializers.ModelSerializer):
             "player_2_name",
             "status",
             "board_size",
+            "rule_variant",
+            "rated",
             "current_players",
             "has_password",
             "password",
@@ -26,6 +28,8 @@ class RoomSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "password": {"write_only": True, "required": False, "allow_null": True, "allow_blank": True},
             "board_size": {"required": False},
+            "rule_variant": {"required": False},
+            "rated": {"required": False},
         }
 
     def create(self, validated_data):
@@ -40,15 +44,15 @@ class MatchHistorySerializer(serializers.Serializer):
     time = serializers.DateTimeField()
 
     @staticmethod
-    def from_match(match: Match, user) -> dict:
+    def from_match(match: Match, user_id: int) -> dict:
         # Determine opponent
-        opponent_user = match.player_o if match.player_x == user else match.player_x
+        opponent_user = match.player_o if match.player_x_id == user_id else match.player_x
         # Determine result
         if match.end_time is None:
             result = "ongoing"
-        elif match.winner is None:
+        elif match.winner_id is None:
             result = "draw"
-        elif match.winner_id == user.id:
+        elif match.winner_id == user_id:
             result = "win"
         else:
             result = "loss"
@@ -58,3 +62,45 @@ class MatchHistorySerializer(serializers.Serializer):
             "result": result,
             "time": match.end_time or match.start_time,
         }
+
+
+class TournamentSerializer(serializers.ModelSerializer):
+    tournament_id = serializers.IntegerField(source="id", read_only=True)
+    organizer_name = serializers.CharField(source="organizer.username", read_only=True)
+    player_count = serializers.IntegerField(read_only=True, default=0)
+
+    class Meta:
+        model = Tournament
+        fields = [
+            "tournament_id",
+            "name",
+            "organizer_name",
+            "format",
+            "board_size",
+            "rule_variant",
+            "total_rounds",
+            "current_round",
+            "status",
+            "player_count",
+        ]
+        read_only_fields = ["current_round", "status"]
+        extra_kwargs = {
+            "format": {"required": False},
+            "board_size": {"required": False},
+            "rule_variant": {"required": False},
+            "total_rounds": {"required": False, "min_value": 1},
+        }
+
+    def create(self, validated_data):
+        validated_data["organizer"] = self.context["request"].user
+        return super().create(validated_data)
+
+
+class TournamentStandingSerializer(serializers.ModelSerializer):
+    user_id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(source="user.username", read_only=True)
+    elo = serializers.IntegerField(source="user.elo", read_only=True)
+
+    class Meta:
+        model = TournamentPlayer
+        fields = ["user_id", "username", "elo", "score", "wins", "losses", "draws"]
@@ -0,0 +1,102 @@
+"""
+Match settlement: chốt kết quả trận, ELO và thống kê người chơi
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from users.cache import bump_users
+from users.models import UserStats
+from users.rating_history import record as record_rating
+from users.standings import record as record_standings
+
+from .analytics import record_matches
+from .elo_calculator import calculate_elo_change, calculate_elo_draw
+from .head_to_head import record_match as record_head_to_head
+
+
+def count_moves(match) -> int:
+    """Số nước đã đi của trận."""
+    return match.move_count()
+
+
+def result_for(match, user_id: int) -> str:
+    """Kết quả trận đối với một người chơi: 'win', 'loss' hoặc 'draw'."""
+    if match.winner_id is None:
+        return "draw"
+    return "win" if match.winner_id == user_id else "loss"
+
+
+def is_rated(match) -> bool:
+    """
+    Trận có tính ELO không. Trận tính điểm thường được chốt ngay khi kết thúc, trận giải đấu
+    chốt theo vòng; trận của phòng chơi thường (Room.rated=False) không bao giờ tính.
+    """
+    return match.rated or match.tournament_id is not None
+
+
+def record_stats(match, stats: dict):
+    """
+    Cộng dồn một trận vào UserStats của hai người chơi.
+
+    Args:
+        match: Match đã kết thúc
+        stats: {user_id: UserStats}, phải có đủ hai người chơi
+    """
+    moves = count_moves(match)
+    for user_id, symbol in ((match.player_x_id, "X"), (match.player_o_id, "O")):
+        stats[user_id].record(symbol, result_for(match, user_id), match.board_size, moves)
+
+
+def settle_match(match) -> dict:
+    """
+    Chốt một trận đã kết thúc (winner/end_time/nước đi đã được gán) trong một transaction.
+
+    Trận giải đấu chỉ cập nhật thống kê; ELO/thắng/thua được chốt theo vòng
+    (xem tournament.settle_round). Trận không tính điểm cũng chỉ cập nhật thống kê, ELO giữ nguyên.
+
+    Returns:
+        {user_id: (old_elo, new_elo)} của hai người chơi
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        match.stats_recorded = True
+        match.save()
+        players = User.objects.select_for_update().in_bulk([match.player_x_id, match.player_o_id])
+        player_x, player_o = players[match.player_x_id], players[match.player_o_id]
+        old_elo = {user_id: user.elo for user_id, user in players.items()}
+
+        if match.tournament_id is None and is_rated(match):
+            if match.winner_id is None:
+                x_change, o_change = calculate_elo_draw(player_x.elo, player_o.elo)
+                player_x.draws += 1
+                player_x.elo += x_change
+                player_o.draws += 1
+                player_o.elo += o_change
+            else:
+                winner = players[match.winner_id]
+                loser = player_o if winner is player_x else player_x
+                winner_change, loser_change = calculate_elo_change(winner.elo, loser.elo)
+                winner.wins += 1
+                winner.elo += winner_change
+                loser.losses += 1
+                loser.elo = max(0, loser.elo + loser_change)  # loser_change là số âm
+            for user in players.values():
+                user.save(update_fields=["wins", "losses", "draws", "elo"])
+            record_rating({user_id: user.elo for user_id, user in players.items()}, match.end_time)
+            record_standings(
+                {user_id: (result_for(match, user_id), user.elo - old_elo[user_id]) for user_id, user in players.items()},
+                match.end_time,
+            )
+
+        stats = {
+            user_id: UserStats.objects.select_for_update().get_or_create(user_id=user_id)[0]
+            for user_id in players
+        }
+        record_stats(match, stats)
+        for user_stats in stats.values():
+            user_stats.save()
+        record_matches([match])
+        record_head_to_head(match)
+        transaction.on_commit(lambda: bump_users(*players))
+
+    return {user_id: (old_elo[user_id], user.elo) for user_id, user in players.items()}
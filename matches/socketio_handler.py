@@ -1,10 +1,27 @@
 import asyncio
+import time
 import socketio
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from asgiref.sync import sync_to_async
 from rest_framework_simplejwt.tokens import AccessToken
-from .models import Match, Room
+from users import presence
+from . import flood, messages
+from .analytics import record_concurrency
+from .flood import flood_controlled
+from .head_to_head import aget_record, summary as head_to_head_summary
+from .messages import (
+    JoinRoom, JoinTournament, LeaveRoom, MakeMove, Rematch, SendMessage, StopReplay, ToggleHints,
+    WatchReplay, WatchRoom, validated,
+)
+from .models import Match, Room, TournamentPlayer
+from .monitoring import instrument_server, span, timed_handler
+from .replay import board_at, get_replay
+from .room_actor import broadcast, room_key, run_in_room
+from .settlement import is_rated, settle_match
+from .threats import ThreatTracker
+from .tournament import settle_round
 
 User = get_user_model()
 
@@ -15,12 +32,20 @@ sio = socketio.AsyncServer(
     logger=True,
     engineio_logger=True
 )
+instrument_server(sio)
+flood.install(sio)
+messages.install(sio)
 
-# Dictionary lưu mapping user_id -> sid và room_id -> [sid1, sid2]
-connected_users = {}  # {user_id: sid}
+# Dictionary lưu mapping room_id -> [sid1, sid2]; user_id <-> sid nằm ở users.presence
 room_sessions = {}    # {room_id: [sid1, sid2]}
-game_states = {}      # {room_id: {'board': [[]], 'current_turn': 'X', 'match_id': int}}
+game_states = {}      # {room_id: {'board': [[]], 'moves': [[row, col]], 'move_times': [ms], 'last_move_at': float, 'current_turn': 'X', 'match_id': int, 'player_x': user_id, 'player_o': user_id, 'rule_variant': str, 'rated': bool, 'hint_sids': set, 'threats': ThreatTracker | None, 'head_to_head': HeadToHead | None}}
+finished_rooms = {}   # {room_id: {'match_id': int, 'player_x': user_id, 'player_o': user_id, 'tournament': bool, 'accepted': set, 'finished_at': float}}
 disconnect_timers = {}  # {room_id: asyncio.Task}
+replay_tasks = {}     # {sid: asyncio.Task}
+presence_flush_task = None
+room_sweep_task = None
+
+HEAD_TO_HEAD_RECENT = 5  # Số trận đối đầu gần nhất gửi kèm khi vào phòng
 
 
 async def authenticate_user(token: str):
@@ -42,31 +67,188 @@ async def cancel_disconnect_timer(room_id: int):
     disconnect_timers.pop(room_id, None)
 
 
+async def flush_presence():
+    """Phát các thay đổi online/offline đã gom trong PRESENCE_BATCH_WINDOW giây."""
+    global presence_flush_task
+    await asyncio.sleep(settings.PRESENCE_BATCH_WINDOW)
+    presence_flush_task = None
+    changes = presence.pop_changes()
+    if changes['online'] or changes['offline']:
+        changes['online_count'] = presence.online_count()
+        await sio.emit('presence', changes)
+
+
+def schedule_presence_flush():
+    global presence_flush_task
+    if presence_flush_task is None:
+        presence_flush_task = asyncio.create_task(flush_presence())
+
+
+async def sweep_idle_rooms():
+    """Thu hồi các phòng đã xong ván mà không ai bắt đầu ván mới trong ROOM_IDLE_AFTER_GAME giây."""
+    global room_sweep_task
+    try:
+        while finished_rooms:
+            await asyncio.sleep(settings.ROOM_SWEEP_INTERVAL)
+            cutoff = time.monotonic() - settings.ROOM_IDLE_AFTER_GAME
+            for room_id, finished in list(finished_rooms.items()):
+                if finished['finished_at'] <= cutoff:
+                    await in_room(room_id, _reclaim_room, room_id)
+    finally:
+        room_sweep_task = None
+
+
+def finish_game(room_id, game: dict, tournament: bool):
+    """Ván của phòng đã kết thúc: giữ người chơi trong phòng để chờ tái đấu, phòng bỏ không sẽ bị thu hồi."""
+    global room_sweep_task
+    game_states.pop(room_id, None)
+    finished_rooms[room_id] = {
+        'match_id': game['match_id'],
+        'player_x': game['player_x'],
+        'player_o': game['player_o'],
+        'tournament': tournament,
+        'accepted': set(),
+        'finished_at': time.monotonic()
+    }
+    if room_sweep_task is None:
+        room_sweep_task = asyncio.create_task(sweep_idle_rooms())
+
+
+def same_players(finished: dict, room) -> bool:
+    """Người chơi hiện tại của phòng vẫn là hai người của ván vừa xong."""
+    return {room.host_id, room.player_2_id} == {finished['player_x'], finished['player_o']}
+
+
+async def _forget_finished_room(room_id):
+    finished_rooms.pop(room_id, None)
+
+
+async def room_membership_changed(room_id):
+    """Có người vào/rời phòng qua REST: ván vừa xong của phòng không còn tái đấu được."""
+    if room_id in finished_rooms:
+        await in_room(room_id, _forget_finished_room, room_id)
+
+
+def symbol_for(game: dict, user_id: int):
+    if game['player_x'] == user_id:
+        return 'X'
+    if game['player_o'] == user_id:
+        return 'O'
+    return None
+
+
+def new_game_state(match, head_to_head) -> dict:
+    size = match.board_size
+    return {
+        'board': [[None for _ in range(size)] for _ in range(size)],
+        'moves': [],
+        # Thời gian suy nghĩ của từng nước, tính từ nước trước (hoặc lúc bắt đầu ván)
+        'move_times': [],
+        'last_move_at': time.monotonic(),
+        'current_turn': 'X',
+        'match_id': match.id,
+        'player_x': match.player_x_id,
+        'player_o': match.player_o_id,
+        'board_size': size,
+        'rule_variant': match.rule_variant,
+        'rated': is_rated(match),
+        'hint_sids': set(),
+        'threats': None,
+        # Đọc một lần khi bắt đầu ván để các lần vào phòng sau không cần truy vấn
+        'head_to_head': head_to_head
+    }
+
+
+async def in_room(room_id, command, *args):
+    """
+    Chạy lệnh trong actor của phòng: các lệnh của cùng một phòng được xử lý lần lượt.
+
+    room_id được đổi sang int tại đây (không dựa vào việc payload đã qua schema) để
+    "5" và 5 dùng chung một actor và broadcast luôn tìm thấy actor của phòng.
+    """
+    return await run_in_room(room_key(room_id), flush_room_events, command, *args)
+
+
+async def flush_room_events(room_id, events: list):
+    """
+    Phát các sự kiện đã gom của một lô lệnh theo đúng thứ tự.
+
+    Nhiều nước đi liên tiếp trong cùng lô được gộp thành một sự kiện 'moves_made'.
+    Sau đó gửi gợi ý một lần theo trạng thái cuối của ván.
+    """
+    moves = []
+    for event, data in events + [(None, None)]:
+        if event == 'move_made':
+            moves.append(data)
+            continue
+        if len(moves) == 1:
+            await sio.emit('move_made', moves[0], room=f"room_{room_id}")
+        elif moves:
+            await sio.emit('moves_made', {'moves': moves}, room=f"room_{room_id}")
+        if event is not None:
+            await sio.emit(event, data, room=f"room_{room_id}")
+        moves = []
+
+    game = game_states.get(room_id)
+    if game and any(event == 'move_made' for event, _ in events):
+        await emit_hints(room_id, game)
+
+
+def build_hints(game: dict) -> dict:
+    if game['threats'] is None:
+        # Dựng một lần khi có người nhận đầu tiên, sau đó cập nhật theo từng nước
+        game['threats'] = ThreatTracker(game['board_size'], game['rule_variant'], game['board'])
+    return game['threats'].summary(game['current_turn'], settings.HINT_TIME_BUDGET_MS / 1000)
+
+
+async def emit_hints(room_id: int, game: dict):
+    """
+    Gửi gợi ý (nước bốn, ba thông, thắng cưỡng bức) cho người chơi bật gợi ý và khán giả.
+
+    Ván tính điểm không có gợi ý. Việc tìm thắng cưỡng bức chạy trong thread để không chặn
+    event loop; actor của phòng đang chờ lệnh này nên ván không đổi trong lúc tính.
+    """
+    if game['rated'] or not game['hint_sids']:
+        return
+    payload = await sync_to_async(build_hints, thread_sensitive=False)(game)
+    payload.update({
+        'room_id': room_id,
+        'match_id': game['match_id'],
+        'move': len(game['moves'])
+    })
+    for hint_sid in list(game['hint_sids']):
+        await sio.emit('hints', payload, room=hint_sid)
+
+
+async def settle_tournament_round(match):
+    """Chốt vòng đấu của giải khi trận cuối cùng của vòng kết thúc."""
+    settled = await sync_to_async(settle_round)(match.tournament_id, match.tournament_round)
+    if settled:
+        await sio.emit('tournament_round_settled', {
+            'tournament_id': match.tournament_id,
+            'round': match.tournament_round
+        }, room=f"tournament_{match.tournament_id}")
+
+
 async def award_forfeit(room, game, loser_symbol: str):
     """Declare forfeit for the disconnected player after grace period."""
     await cancel_disconnect_timer(room.id)
 
     winner_symbol = 'O' if loser_symbol == 'X' else 'X'
-    winner_user = room.player_2 if winner_symbol == 'O' else room.host
-    loser_user = room.host if winner_symbol == 'O' else room.player_2
+    winner_id = game['player_o'] if winner_symbol == 'O' else game['player_x']
+    winner_user = room.host if room.host_id == winner_id else room.player_2
 
     match = await Match.objects.aget(id=game['match_id'])
     match.winner = winner_user
-    match.board_state = [[game['board'][r][c] for c in range(game['board_size'])] for r in range(game['board_size'])]
+    match.set_moves(game['moves'], game['move_times'])
     match.end_time = timezone.now()
 
-    from .elo_calculator import calculate_elo_change
-    w_change, l_change = calculate_elo_change(winner_user.elo, loser_user.elo)
-
-    winner_user.wins += 1
-    winner_user.elo += w_change
-    loser_user.losses += 1
-    loser_user.elo = max(0, loser_user.elo + l_change)
-
-    await winner_user.asave(update_fields=['wins', 'elo'])
-    await loser_user.asave(update_fields=['losses', 'elo'])
-    await match.asave()
+    elo = await sync_to_async(settle_match)(match)
+    if match.tournament_id:
+        await settle_tournament_round(match)
 
+    old_x, new_x = elo[game['player_x']]
+    old_o, new_o = elo[game['player_o']]
     payload = {
         'message': 'Game Over - Opponent disconnected too long',
         'winner': {
@@ -77,25 +259,26 @@ async def award_forfeit(room, game, loser_symbol: str):
         'winner_symbol': winner_symbol,
         'elo_changes': {
             'player_x': {
-                'old_elo': room.host.elo,
-                'new_elo': winner_symbol == 'X' and winner_user.elo or room.host.elo + l_change,
-                'change': w_change if winner_symbol == 'X' else l_change
+                'old_elo': old_x,
+                'new_elo': new_x,
+                'change': new_x - old_x
             },
             'player_o': {
-                'old_elo': room.player_2.elo,
-                'new_elo': winner_symbol == 'O' and winner_user.elo or room.player_2.elo + l_change,
-                'change': w_change if winner_symbol == 'O' else l_change
+                'old_elo': old_o,
+                'new_elo': new_o,
+                'change': new_o - old_o
             }
         }
     }
 
-    await sio.emit('game_over', payload, room=f"room_{room.id}")
-    game_states.pop(room.id, None)
+    broadcast(room.id, 'game_over', payload)
+    finish_game(room.id, game, match.tournament_id is not None)
     room.status = Room.Status.FULL
     await room.asave(update_fields=['status'])
 
 
 @sio.event
+@timed_handler
 async def connect(sid, environ, auth):
     """Xử lý khi client kết nối."""
     print(f"🔌 Connection attempt - SID: {sid}")
@@ -112,20 +295,78 @@ async def connect(sid, environ, auth):
         print(f"❌ Authentication failed")
         return False
     
-    connected_users[user.id] = sid
+    if presence.add_session(user.id, sid):
+        schedule_presence_flush()
     print(f"✅ User {user.username} (ID: {user.id}) connected with SID: {sid}")
     return True
 
 
+async def _forfeit_if_absent(room_id, user_id: int, match_id: int):
+    """Xử thua người chơi nếu hết thời gian chờ mà vẫn chưa quay lại ván match_id."""
+    game = game_states.get(room_id)
+    if not game or game['match_id'] != match_id:
+        return
+    if any(presence.user_for(s) == user_id for s in room_sessions.get(room_id, [])):
+        return
+    try:
+        room = await Room.objects.select_related('host', 'player_2').aget(id=room_id)
+    except Room.DoesNotExist:
+        return
+    await award_forfeit(room, game, symbol_for(game, user_id))
+
+
+async def _player_disconnected(sid, user_id: int, room_id):
+    """Một kết nối của người chơi trong phòng bị ngắt: báo đối thủ và hẹn giờ xử thua."""
+    # Người chơi còn tab khác trong phòng thì không coi là rời phòng
+    other_tab = any(
+        s != sid and presence.user_for(s) == user_id for s in room_sessions.get(room_id, [])
+    )
+
+    try:
+        room = await Room.objects.select_related('host', 'player_2').aget(id=room_id)
+        game = game_states.get(room_id)
+
+        if (room.host_id == user_id or room.player_2_id == user_id) and not other_tab:
+            # Grace period for reconnect: 30s
+            async def schedule_forfeit():
+                await asyncio.sleep(30)
+                # If player didn't return, award forfeit
+                if game:
+                    await in_room(room_id, _forfeit_if_absent, room_id, user_id, game['match_id'])
+
+            # cancel any existing timer then start new
+            await cancel_disconnect_timer(room_id)
+            disconnect_timers[room_id] = asyncio.create_task(schedule_forfeit())
+
+            # Notify opponent that player left
+            opponent_id = room.player_2_id if room.host_id == user_id else room.host_id
+            opponent_sids = presence.sids_for(opponent_id) if opponent_id else set()
+            if opponent_sids:
+                await sio.emit('player_left', {
+                    'message': 'Đối thủ đã mất kết nối, chờ 30s để quay lại'
+                }, room=list(opponent_sids))
+
+        # Dọn session mapping
+        if room_id in room_sessions:
+            room_sessions[room_id] = [s for s in room_sessions[room_id] if s != sid]
+            if not room_sessions[room_id]:
+                del room_sessions[room_id]
+
+    except Room.DoesNotExist:
+        pass
+
+
 @sio.event
+@timed_handler
 async def disconnect(sid):
     """Xử lý khi client ngắt kết nối."""
+    stop_replay_task(sid)
+    flood.forget(sid)
+    for game in game_states.values():
+        game['hint_sids'].discard(sid)
+
     # Tìm user_id từ sid
-    user_id = None
-    for uid, s in connected_users.items():
-        if s == sid:
-            user_id = uid
-            break
+    user_id = presence.user_for(sid)
     
     if user_id:
         # Tìm room mà user đang ở
@@ -136,58 +377,57 @@ async def disconnect(sid):
                 break
         
         if room_id:
-            try:
-                room = await Room.objects.select_related('host', 'player_2').aget(id=room_id)
-                game = game_states.get(room_id)
-
-                if room.host_id == user_id or room.player_2_id == user_id:
-                    # Grace period for reconnect: 30s
-                    async def schedule_forfeit():
-                        await asyncio.sleep(30)
-                        # If player didn't return, award forfeit
-                        if room_id in game_states and game:
-                            loser_symbol = 'X' if room.host_id == user_id else 'O'
-                            await award_forfeit(room, game, loser_symbol)
-
-                    # cancel any existing timer then start new
-                    await cancel_disconnect_timer(room_id)
-                    disconnect_timers[room_id] = asyncio.create_task(schedule_forfeit())
-
-                    # Notify opponent that player left
-                    opponent_sid = None
-                    if room.host_id == user_id and room.player_2_id in connected_users:
-                        opponent_sid = connected_users[room.player_2_id]
-                    if room.player_2_id == user_id and room.host_id in connected_users:
-                        opponent_sid = connected_users[room.host_id]
-                    if opponent_sid:
-                        await sio.emit('player_left', {
-                            'message': 'Đối thủ đã mất kết nối, chờ 30s để quay lại'
-                        }, room=opponent_sid)
-
-                # Dọn session mapping
-                if room_id in room_sessions:
-                    room_sessions[room_id] = [s for s in room_sessions[room_id] if s != sid]
-                    if not room_sessions[room_id]:
-                        del room_sessions[room_id]
-                        
-            except Room.DoesNotExist:
-                pass
+            await in_room(room_id, _player_disconnected, sid, user_id, room_id)
         
-        del connected_users[user_id]
+    user_id, went_offline = presence.remove_session(sid)
+    if went_offline:
+        schedule_presence_flush()
+    if user_id:
         print(f"User ID {user_id} disconnected")
 
 
-@sio.event
-async def join_room(sid, data):
+def head_to_head_for(room_id, user_id, opponent_id):
+    """Thành tích đối đầu (đã đọc sẵn trong game state) nhìn từ phía user_id; None nếu chưa có ván."""
+    game = game_states.get(room_id)
+    if game is None or opponent_id is None:
+        return None
+    summary = head_to_head_summary(game['head_to_head'], user_id, opponent_id, limit=HEAD_TO_HEAD_RECENT)
+    if summary['last_played'] is not None:
+        summary['last_played'] = summary['last_played'].isoformat()
+    return summary
+
+
+def game_start_payload(room_id, room) -> dict:
+    game = game_states[room_id]
+    return {
+        'current_turn': game['current_turn'],
+        'board_size': game['board_size'],
+        'rule_variant': game['rule_variant'],
+        'rated': game['rated'],
+        'match_id': game['match_id'],
+        'player_x': game['player_x'],
+        'player_o': game['player_o'],
+        'head_to_head': head_to_head_for(room_id, room.host_id, room.player_2_id)
+    }
+
+
+async def emit_rematch_status(room_id, sid):
+    """Người vào lại phòng vừa xong ván nhận trạng thái mời tái đấu."""
+    finished = finished_rooms.get(room_id)
+    if finished is not None:
+        await sio.emit('rematch_status', {
+            'room_id': room_id,
+            'match_id': finished['match_id'],
+            'accepted': sorted(finished['accepted'])
+        }, room=sid)
+
+
+async def _join_room(sid, msg: JoinRoom):
     """Xử lý khi user join phòng."""
-    room_id = data.get('room_id')
+    room_id = msg.room_id
     
     # Tìm user từ sid
-    user_id = None
-    for uid, s in connected_users.items():
-        if s == sid:
-            user_id = uid
-            break
+    user_id = presence.user_for(sid)
     
     if not user_id:
         await sio.emit('error', {'message': 'Unauthorized'}, room=sid)
@@ -198,6 +438,10 @@ async def join_room(sid, data):
         
         # Hủy timer nếu reconnect vào cùng phòng
         await cancel_disconnect_timer(room_id)
+        finished = finished_rooms.get(room_id)
+        if finished is not None and not same_players(finished, room):
+            # Đổi người chơi mà không qua REST (vd admin): ván mới bắt đầu khi đủ người thay vì chờ tái đấu
+            del finished_rooms[room_id]
 
         # Nếu là host
         if room.host_id == user_id:
@@ -210,15 +454,18 @@ async def join_room(sid, data):
             await sio.emit('joined_room', {
                 'room_id': room_id,
                 'role': 'host',
-                'player_symbol': 'X',
+                'player_symbol': symbol_for(game_states[room_id], user_id) if room_id in game_states else 'X',
                 'room_name': room.room_name,
                 'board_size': room.board_size,
+                'rule_variant': room.rule_variant,
                 'status': room.status,
                 'player_count': room.current_players,
                 'board_state': game_states.get(room_id, {}).get('board'),
                 'current_turn': game_states.get(room_id, {}).get('current_turn'),
-                'match_id': game_states.get(room_id, {}).get('match_id')
+                'match_id': game_states.get(room_id, {}).get('match_id'),
+                'head_to_head': head_to_head_for(room_id, user_id, room.player_2_id)
             }, room=sid)
+            await emit_rematch_status(room_id, sid)
         
         # Nếu là player_2
         elif room.player_2_id == user_id:
@@ -228,44 +475,46 @@ async def join_room(sid, data):
             if sid not in room_sessions[room_id]:
                 room_sessions[room_id].append(sid)
             
-            # Khởi tạo game state khi đủ 2 người
-            if room_id not in game_states:
-                # Tạo Match trong DB
-                match = await Match.objects.acreate(
-                    player_x=room.host,
-                    player_o=room.player_2,
-                    room=room,
-                    board_size=room.board_size,
-                    current_turn='X'
-                )
+            # Khởi tạo game state khi đủ 2 người; phòng vừa xong ván chỉ bắt đầu ván mới qua tái đấu
+            if room_id not in game_states and room_id not in finished_rooms:
+                # Phòng giải đấu đã có sẵn Match được tạo lúc ghép cặp
+                match = await Match.objects.filter(
+                    room=room, tournament__isnull=False, end_time__isnull=True
+                ).afirst()
+                if match is None:
+                    # Tạo Match trong DB
+                    match = await Match.objects.acreate(
+                        player_x=room.host,
+                        player_o=room.player_2,
+                        room=room,
+                        board_size=room.board_size,
+                        rule_variant=room.rule_variant,
+                        rated=room.rated,
+                        current_turn='X'
+                    )
                 
-                # Tạo bàn cờ trống
-                size = room.board_size
-                board = [[None for _ in range(size)] for _ in range(size)]
-                game_states[room_id] = {
-                    'board': board,
-                    'current_turn': 'X',
-                    'match_id': match.id,
-                    'board_size': size
-                }
+                game_states[room_id] = new_game_state(match, await aget_record(room.host_id, room.player_2_id))
+                await sync_to_async(record_concurrency)(len(game_states))
             
             # Thông báo cho cả phòng
-            await sio.emit('player_joined', {
+            broadcast(room_id, 'player_joined', {
                 'username': room.player_2.username,
                 'player_count': 2
-            }, room=f"room_{room_id}")
+            })
             
             await sio.emit('joined_room', {
                 'room_id': room_id,
                 'role': 'player_2',
-                'player_symbol': 'O',
+                'player_symbol': symbol_for(game_states[room_id], user_id) if room_id in game_states else 'O',
                 'room_name': room.room_name,
                 'board_size': room.board_size,
+                'rule_variant': room.rule_variant,
                 'opponent': room.host.username,
                 'status': room.status,
                 'board_state': game_states.get(room_id, {}).get('board'),
                 'current_turn': game_states.get(room_id, {}).get('current_turn'),
-                'match_id': game_states.get(room_id, {}).get('match_id')
+                'match_id': game_states.get(room_id, {}).get('match_id'),
+                'head_to_head': head_to_head_for(room_id, user_id, room.host_id)
             }, room=sid)
 
             # Gửi sync_state cho người vừa vào nếu game đang chơi
@@ -275,15 +524,14 @@ async def join_room(sid, data):
                     'board_state': gs.get('board'),
                     'current_turn': gs.get('current_turn'),
                     'match_id': gs.get('match_id'),
-                    'board_size': gs.get('board_size')
+                    'board_size': gs.get('board_size'),
+                    'rule_variant': gs.get('rule_variant')
                 }, room=sid)
             
-            # Thông báo game bắt đầu
-            await sio.emit('game_start', {
-                'current_turn': game_states[room_id]['current_turn'],
-                'board_size': room.board_size,
-                'match_id': game_states[room_id]['match_id']
-            }, room=f"room_{room_id}")
+                # Thông báo game bắt đầu
+                broadcast(room_id, 'game_start', game_start_payload(room_id, room))
+            else:
+                await emit_rematch_status(room_id, sid)
         else:
             await sio.emit('error', {'message': 'Bạn không ở trong phòng này'}, room=sid)
             
@@ -292,21 +540,26 @@ async def join_room(sid, data):
 
 
 @sio.event
-async def leave_room(sid, data):
+@flood_controlled
+@timed_handler
+@validated(JoinRoom)
+async def join_room(sid, msg: JoinRoom):
+    await in_room(msg.room_id, _join_room, sid, msg)
+
+
+async def _leave_room(sid, msg: LeaveRoom):
     """Xử lý khi user rời phòng."""
-    room_id = data.get('room_id')
+    room_id = msg.room_id
     
     # Tìm user từ sid
-    user_id = None
-    for uid, s in connected_users.items():
-        if s == sid:
-            user_id = uid
-            break
+    user_id = presence.user_for(sid)
     
     if not user_id:
         return
     
     await sio.leave_room(sid, f"room_{room_id}")
+    if room_id in game_states:
+        game_states[room_id]['hint_sids'].discard(sid)
     
     # Xử lý logic tương tự disconnect
     try:
@@ -314,13 +567,14 @@ async def leave_room(sid, data):
         game = game_states.get(room_id)
 
         if room.host_id == user_id or room.player_2_id == user_id:
-            loser_symbol = 'X' if room.host_id == user_id else 'O'
             if game:
-                await award_forfeit(room, game, loser_symbol)
+                await award_forfeit(room, game, symbol_for(game, user_id))
             else:
-                await sio.emit('player_left', {
+                if room_id in finished_rooms:
+                    finished_rooms[room_id]['accepted'].discard(user_id)
+                broadcast(room_id, 'player_left', {
                     'message': 'Đối thủ đã thoát'
-                }, room=f"room_{room_id}")
+                })
         
         if room_id in room_sessions:
             room_sessions[room_id] = [s for s in room_sessions[room_id] if s != sid]
@@ -332,25 +586,29 @@ async def leave_room(sid, data):
 
 
 @sio.event
-async def make_move(sid, data):
+@flood_controlled
+@timed_handler
+@validated(LeaveRoom)
+async def leave_room(sid, msg: LeaveRoom):
+    await in_room(msg.room_id, _leave_room, sid, msg)
+
+
+async def _make_move(sid, msg: MakeMove):
     """Xử lý khi người chơi đánh cờ."""
-    from .game_logic import check_winner, is_board_full, validate_move
+    from .game_logic import check_winner, validate_move
+    from .rules import forbidden_reason
     
-    room_id = data.get('room_id')
-    row = data.get('row')
-    col = data.get('col')
-    incoming_match_id = data.get('match_id')
+    room_id = msg.room_id
+    row = msg.row
+    col = msg.col
+    incoming_match_id = msg.match_id
     
     if room_id not in game_states:
         await sio.emit('error', {'message': 'Game chưa bắt đầu'}, room=sid)
         return
     
     # Tìm user
-    user_id = None
-    for uid, s in connected_users.items():
-        if s == sid:
-            user_id = uid
-            break
+    user_id = presence.user_for(sid)
     
     if not user_id:
         await sio.emit('error', {'message': 'Unauthorized'}, room=sid)
@@ -365,12 +623,9 @@ async def make_move(sid, data):
             await sio.emit('error', {'message': 'Ván đấu đã thay đổi, hãy tải lại'}, room=sid)
             return
         
-        # Xác định player symbol
-        if room.host_id == user_id:
-            player_symbol = 'X'
-        elif room.player_2_id == user_id:
-            player_symbol = 'O'
-        else:
+        # Xác định player symbol (màu quân đổi sau mỗi lần tái đấu)
+        player_symbol = symbol_for(game, user_id)
+        if player_symbol is None:
             await sio.emit('error', {'message': 'Bạn không ở trong phòng này'}, room=sid)
             return
         
@@ -385,79 +640,64 @@ async def make_move(sid, data):
             return
         
         # Thực hiện nước đi
+        variant = game['rule_variant']
         game['board'][row][col] = player_symbol
+        forbidden = forbidden_reason(game['board'], row, col, player_symbol, variant)
+        if forbidden:
+            game['board'][row][col] = None
+            await sio.emit('error', {'message': 'Nước đi bị cấm theo luật Renju', 'reason': forbidden}, room=sid)
+            return
+        game['moves'].append([row, col])
+        now = time.monotonic()
+        game['move_times'].append(round((now - game['last_move_at']) * 1000))
+        game['last_move_at'] = now
+        if game['threats'] is not None:
+            game['threats'].place(row, col, player_symbol)
         
         # Kiểm tra thắng
         winner = None
         game_over = False
         
-        if check_winner(game['board'], row, col, player_symbol):
+        if check_winner(game['board'], row, col, player_symbol, variant):
             winner = player_symbol
             game_over = True
-        elif is_board_full(game['board']):
+        elif len(game['moves']) == game['board_size'] ** 2:
             game_over = True  # Hòa
         
         # Chuyển lượt
         game['current_turn'] = 'O' if player_symbol == 'X' else 'X'
         
         # Broadcast nước đi
-        await sio.emit('move_made', {
+        broadcast(room_id, 'move_made', {
             'row': row,
             'col': col,
             'player': player_symbol,
             'current_turn': game['current_turn']
-        }, room=f"room_{room_id}")
+        })
         
         # Xử lý kết thúc game
         if game_over:
-            from .elo_calculator import calculate_elo_change, calculate_elo_draw
-            
             match = await Match.objects.aget(id=game['match_id'])
-            match.board_state = [[game['board'][r][c] for c in range(game['board_size'])] for r in range(game['board_size'])]
+            match.set_moves(game['moves'], game['move_times'])
             match.end_time = timezone.now()
             
             if winner:
-                match.winner = room.host if winner == 'X' else room.player_2
-                # Cập nhật ELO/stats
-                winner_user = await User.objects.aget(id=match.winner_id)
-                loser_user = await User.objects.aget(id=(room.player_2_id if winner == 'X' else room.host_id))
-                
-                # Tính toán ELO change dựa trên công thức chuẩn
-                winner_change, loser_change = calculate_elo_change(winner_user.elo, loser_user.elo)
-                
-                winner_user.wins += 1
-                winner_user.elo += winner_change
-                loser_user.losses += 1
-                loser_user.elo = max(0, loser_user.elo + loser_change)  # loser_change là số âm
-                
-                await winner_user.asave(update_fields=['wins', 'elo'])
-                await loser_user.asave(update_fields=['losses', 'elo'])
-            else:
-                # Hòa
-                host_user = await User.objects.aget(id=room.host_id)
-                player2_user = await User.objects.aget(id=room.player_2_id)
-                
-                # Tính toán ELO change cho trường hợp hòa
-                host_change, player2_change = calculate_elo_draw(host_user.elo, player2_user.elo)
-                
-                host_user.draws += 1
-                host_user.elo += host_change
-                player2_user.draws += 1
-                player2_user.elo += player2_change
-                
-                await host_user.asave(update_fields=['draws', 'elo'])
-                await player2_user.asave(update_fields=['draws', 'elo'])
+                match.winner_id = game['player_x'] if winner == 'X' else game['player_o']
             
-            await match.asave()
+            # Cập nhật ELO/stats
+            with span("settle", "settle_match"):
+                await sync_to_async(settle_match)(match)
+            if match.tournament_id:
+                await settle_tournament_round(match)
             
-            await sio.emit('game_over', {
+            broadcast(room_id, 'game_over', {
                 'winner': winner,
                 'result': 'win' if winner else 'draw',
                 'match_id': match.id
-            }, room=f"room_{room_id}")
+            })
             
             # Dọn dẹp
-            del game_states[room_id]
+            finish_game(room_id, game, match.tournament_id is not None)
             room.status = Room.Status.FULL
             await room.asave(update_fields=['status'])
             
@@ -466,24 +706,268 @@ async def make_move(sid, data):
 
 
 @sio.event
-async def send_message(sid, data):
+@flood_controlled
+@timed_handler
+@validated(MakeMove)
+async def make_move(sid, msg: MakeMove):
+    await in_room(msg.room_id, _make_move, sid, msg)
+
+
+async def _send_message(sid, msg: SendMessage):
     """Xử lý chat trong phòng."""
-    room_id = data.get('room_id')
-    message = data.get('message')
+    room_id = msg.room_id
+    message = msg.message
     
     # Tìm username
-    user_id = None
-    for uid, s in connected_users.items():
-        if s == sid:
-            user_id = uid
-            break
+    user_id = presence.user_for(sid)
     
     if user_id:
         try:
             user = await User.objects.aget(id=user_id)
-            await sio.emit('new_message', {
+            broadcast(room_id, 'new_message', {
                 'username': user.username,
                 'message': message
-            }, room=f"room_{room_id}")
+            })
         except User.DoesNotExist:
             pass
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(SendMessage)
+async def send_message(sid, msg: SendMessage):
+    await in_room(msg.room_id, _send_message, sid, msg)
+
+
+async def _rematch(sid, msg: Rematch):
+    """
+    Mời/nhận/từ chối tái đấu sau khi ván kết thúc (accept mặc định True).
+
+    Khi cả hai đồng ý, ván mới được tạo ngay trong phòng hiện tại với màu quân đổi cho
+    nhau; 'game_start' mang đủ thông tin để người cầm X đánh luôn.
+    """
+    room_id = msg.room_id
+    user_id = presence.user_for(sid)
+    finished = finished_rooms.get(room_id)
+    if not finished or user_id not in (finished['player_x'], finished['player_o']):
+        await sio.emit('error', {'message': 'Không có ván nào để tái đấu'}, room=sid)
+        return
+    if finished['tournament']:
+        await sio.emit('error', {'message': 'Trận giải đấu không thể tái đấu'}, room=sid)
+        return
+
+    if not msg.accept:
+        finished['accepted'].clear()
+        broadcast(room_id, 'rematch_declined', {'room_id': room_id, 'user_id': user_id})
+        return
+
+    opponent_id = finished['player_o'] if user_id == finished['player_x'] else finished['player_x']
+    if not any(presence.user_for(s) == opponent_id for s in room_sessions.get(room_id, [])):
+        await sio.emit('error', {'message': 'Đối thủ đã rời phòng'}, room=sid)
+        return
+
+    finished['accepted'].add(user_id)
+    if len(finished['accepted']) < 2:
+        broadcast(room_id, 'rematch_requested', {'room_id': room_id, 'user_id': user_id})
+        return
+
+    try:
+        room = await Room.objects.select_related('host', 'player_2').aget(id=room_id)
+    except Room.DoesNotExist:
+        finished_rooms.pop(room_id, None)
+        await sio.emit('error', {'message': 'Phòng không tồn tại'}, room=sid)
+        return
+    if not same_players(finished, room):
+        del finished_rooms[room_id]
+        await sio.emit('error', {'message': 'Không có ván nào để tái đấu'}, room=sid)
+        return
+
+    # Đổi màu: người cầm O ván trước đi trước
+    match = await Match.objects.acreate(
+        player_x_id=finished['player_o'],
+        player_o_id=finished['player_x'],
+        room=room,
+        board_size=room.board_size,
+        rule_variant=room.rule_variant,
+        rated=room.rated,
+        current_turn='X'
+    )
+    del finished_rooms[room_id]
+    game_states[room_id] = new_game_state(match, await aget_record(room.host_id, room.player_2_id))
+    room.status = Room.Status.PLAYING
+    await room.asave(update_fields=['status'])
+    await sync_to_async(record_concurrency)(len(game_states))
+    broadcast(room_id, 'game_start', game_start_payload(room_id, room))
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(Rematch)
+async def rematch(sid, msg: Rematch):
+    await in_room(msg.room_id, _rematch, sid, msg)
+
+
+async def _reclaim_room(room_id):
+    """Phòng đã xong ván bị bỏ không quá ROOM_IDLE_AFTER_GAME giây: đóng phòng và xóa khỏi DB."""
+    finished = finished_rooms.get(room_id)
+    if not finished or time.monotonic() - finished['finished_at'] < settings.ROOM_IDLE_AFTER_GAME:
+        return
+    del finished_rooms[room_id]
+    await cancel_disconnect_timer(room_id)
+    deleted, _ = await Room.objects.filter(id=room_id, status=Room.Status.FULL).adelete()
+    if not deleted:
+        # Phòng đã đổi trạng thái (có người rời/vào) hoặc đã bị xóa: không đóng phòng đang dùng
+        return
+    # Phát trực tiếp trước khi giải tán phòng Socket.IO, không chờ flush của actor
+    await sio.emit('room_closed', {'room_id': room_id, 'message': 'Phòng đã đóng do không có ván mới'}, room=f"room_{room_id}")
+    await sio.close_room(f"room_{room_id}")
+    room_sessions.pop(room_id, None)
+
+
+async def _toggle_hints(sid, msg: ToggleHints):
+    """Người chơi bật/tắt gợi ý cho ván đang chơi."""
+    room_id = msg.room_id
+    game = game_states.get(room_id)
+    if not game or sid not in room_sessions.get(room_id, []):
+        await sio.emit('error', {'message': 'Bạn không ở trong ván đấu này'}, room=sid)
+        return
+    if game['rated']:
+        await sio.emit('error', {'message': 'Ván tính điểm không có gợi ý'}, room=sid)
+        return
+
+    if msg.enabled:
+        game['hint_sids'].add(sid)
+        await emit_hints(room_id, game)
+    else:
+        game['hint_sids'].discard(sid)
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(ToggleHints)
+async def toggle_hints(sid, msg: ToggleHints):
+    await in_room(msg.room_id, _toggle_hints, sid, msg)
+
+
+async def _watch_room(sid, msg: WatchRoom):
+    """
+    Vào xem một ván đang chơi: nhận nước đi (và gợi ý nếu ván không tính điểm) nhưng không được đánh.
+
+    Người chơi của ván không được vào xem, kể cả từ một kết nối khác, để không nhận gợi ý cho chính ván mình.
+    """
+    room_id = msg.room_id
+    user_id = presence.user_for(sid)
+    if not user_id:
+        await sio.emit('error', {'message': 'Unauthorized'}, room=sid)
+        return
+    game = game_states.get(room_id)
+    if not game:
+        await sio.emit('error', {'message': 'Phòng không có ván đang chơi'}, room=sid)
+        return
+    if symbol_for(game, user_id) or any(presence.user_for(s) == user_id for s in room_sessions.get(room_id, [])):
+        await sio.emit('error', {'message': 'Người chơi trong phòng không thể vào xem'}, room=sid)
+        return
+
+    await sio.enter_room(sid, f"room_{room_id}")
+    await sio.emit('sync_state', {
+        'board_state': game['board'],
+        'current_turn': game['current_turn'],
+        'match_id': game['match_id'],
+        'board_size': game['board_size'],
+        'rule_variant': game['rule_variant']
+    }, room=sid)
+    if not game['rated']:
+        game['hint_sids'].add(sid)
+        await emit_hints(room_id, game)
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(WatchRoom)
+async def watch_room(sid, msg: WatchRoom):
+    await in_room(msg.room_id, _watch_room, sid, msg)
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(JoinTournament)
+async def join_tournament(sid, msg: JoinTournament):
+    """Đăng ký nhận thông báo ghép cặp / chốt vòng của giải đấu."""
+    tournament_id = msg.tournament_id
+
+    user_id = presence.user_for(sid)
+
+    if not user_id:
+        await sio.emit('error', {'message': 'Unauthorized'}, room=sid)
+        return
+
+    registered = await TournamentPlayer.objects.filter(tournament_id=tournament_id, user_id=user_id).aexists()
+    if not registered:
+        await sio.emit('error', {'message': 'Bạn chưa đăng ký giải đấu này'}, room=sid)
+        return
+
+    await sio.enter_room(sid, f"tournament_{tournament_id}")
+
+
+
+def stop_replay_task(sid):
+    task = replay_tasks.pop(sid, None)
+    if task and not task.done():
+        task.cancel()
+
+
+async def stream_replay(sid, replay, from_move: int, interval: float):
+    """Phát lần lượt các nước đi từ from_move, mỗi nước cách nhau interval giây."""
+    size = replay['board_size']
+    moves = replay['moves']
+    await sio.emit('replay_start', {
+        'match_id': replay['match_id'],
+        'board_size': size,
+        'move': from_move,
+        'board': board_at(replay, from_move),
+        'total_moves': len(moves)
+    }, room=sid)
+    for number in range(from_move + 1, len(moves) + 1):
+        await asyncio.sleep(interval)
+        cell = moves[number - 1]
+        await sio.emit('replay_move', {
+            'move': number,
+            'row': cell // size,
+            'col': cell % size,
+            'player': 'X' if number % 2 else 'O'
+        }, room=sid)
+    await sio.emit('replay_end', {'match_id': replay['match_id']}, room=sid)
+    replay_tasks.pop(sid, None)
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(WatchReplay)
+async def watch_replay(sid, msg: WatchReplay):
+    """Xem lại trận đã kết thúc: phát từng nước theo thời gian thực."""
+    replay = await sync_to_async(get_replay)(msg.match_id)
+    if replay is None:
+        await sio.emit('error', {'message': 'Không tìm thấy trận đấu đã kết thúc'}, room=sid)
+        return
+
+    from_move = min(msg.from_move, len(replay['moves']))
+    # Khoảng cách giữa hai nước (ms), giới hạn 100ms - 5s
+    interval = min(max(msg.interval_ms, 100), 5000) / 1000
+
+    stop_replay_task(sid)
+    replay_tasks[sid] = asyncio.create_task(stream_replay(sid, replay, from_move, interval))
+
+
+@sio.event
+@flood_controlled
+@timed_handler
+@validated(StopReplay)
+async def stop_replay(sid, msg: StopReplay):
+    """Dừng phát lại."""
+    stop_replay_task(sid)
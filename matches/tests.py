@@ -1,3 +1,840 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from users import presence
+from users.models import PeriodStanding, RatingPoint, UserStats
+from users.throttling import TokenBucket
+
+from . import fairplay, flood, room_actor, socketio_handler
+from .encoding import ORDERED, POSITION, decode_moves, decode_times, encode_moves, encode_times
+from .fairplay import analyze_match, suspicion_score
+from .head_to_head import RECENT_GAMES, get_record, summary
+from .messages import JoinRoom, MakeMove, Rematch, ToggleHints, ValidationError, WatchReplay, WatchRoom
+from .models import HeadToHead, Match, Room, Tournament, TournamentPlayer
+from .monitoring import timed_handler
+from .rules import CARO, EXACT_FIVE, RENJU, STANDARD, forbidden_reason, is_winning_move
+from .settlement import settle_match
+from .tournament import RoundConflict, settle_round, start_next_round, swiss_pairings
+from .views import RoomListCreateView
+
+
+def make_user(name: str, **fields):
+    return get_user_model().objects.create_user(
+        email=f"{name}@example.com", password="matkhau123", username=name, full_name=name, **fields
+    )
+
+
+def make_players(prefix: str, count: int) -> list:
+    """Nhiều người chơi với mật khẩu không dùng được, không tốn thời gian băm."""
+    User = get_user_model()
+    return User.objects.bulk_create([
+        User(email=f"{prefix}{i}@example.com", username=f"{prefix}{i}", full_name=prefix, password="!")
+        for i in range(count)
+    ])
+
+
+def auth_headers(user) -> dict:
+    return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+
+def _entry(user_id: int, score: float = 0, elo: int = 1000, had_bye: bool = False):
+    return SimpleNamespace(
+        id=user_id, user_id=user_id, score=score, had_bye=had_bye, color_balance=0,
+        user=SimpleNamespace(elo=elo),
+    )
+
+
+def _faced(*games) -> dict:
+    faced = {}
+    for a, b in games:
+        faced.setdefault(a, set()).add(b)
+        faced.setdefault(b, set()).add(a)
+    return faced
+
+
+def board_from(*rows: str, size: int = 15) -> list:
+    """Bàn cờ size x size, các dòng đầu lấy từ chuỗi ('X', 'O', '.')."""
+    board = [[None] * size for _ in range(size)]
+    for r, line in enumerate(rows):
+        for c, cell in enumerate(line):
+            board[r][c] = cell if cell in "XO" else None
+    return board
+
+
+class RuleVariantTests(SimpleTestCase):
+    def test_caro_blocked_six_is_not_a_win_whichever_stone_is_last(self):
+        board = board_from(".OXXXXXXO")
+        for col in range(2, 8):
+            self.assertFalse(is_winning_move(board, 0, col, "X", CARO), col)
+            self.assertTrue(is_winning_move(board, 0, col, "X", STANDARD), col)
+
+    def test_caro_five_with_one_open_end_wins(self):
+        board = board_from("..XXXXXO")
+        for col in range(2, 7):
+            self.assertTrue(is_winning_move(board, 0, col, "X", CARO), col)
+
+    def test_caro_long_run_blocked_far_from_last_stone(self):
+        # Chuỗi 9 quân: hai đầu chặn nằm ngoài cửa sổ ±5 ô của quân vừa đi ở giữa
+        board = board_from("OXXXXXXXXXO")
+        self.assertFalse(is_winning_move(board, 0, 5, "X", CARO))
+        board[0][10] = None
+        self.assertTrue(is_winning_move(board, 0, 5, "X", CARO))
+
+    def test_exact_five_rejects_overline(self):
+        board = board_from("XXXXXX")
+        self.assertFalse(is_winning_move(board, 0, 2, "X", EXACT_FIVE))
+        board[0][5] = None
+        self.assertTrue(is_winning_move(board, 0, 2, "X", EXACT_FIVE))
+
+    def test_renju_double_four_on_one_line(self):
+        # X.XXX.X: đi vào một trong hai ô trống đều thành đúng 5 quân, hai nước bốn trên cùng đường
+        board = board_from(".....", "X.XXX.X")
+        self.assertEqual(forbidden_reason(board, 1, 3, "X", RENJU), "double_four")
+        # Tứ thông chỉ là một nước bốn
+        board = board_from(".....", ".XXXX..")
+        self.assertIsNone(forbidden_reason(board, 1, 2, "X", RENJU))
+
+    def test_renju_overline_and_double_three(self):
+        self.assertEqual(forbidden_reason(board_from("XXXXXX"), 0, 2, "X", RENJU), "overline")
+        board = board_from(".......", "...X...", "...X...", "..X.X..")
+        board[3][3] = "X"
+        self.assertEqual(forbidden_reason(board, 3, 3, "X", RENJU), "double_three")
+        self.assertIsNone(forbidden_reason(board, 3, 3, "O", RENJU))
+
+
+class SwissPairingTests(SimpleTestCase):
+    def pair_ids(self, pairs) -> set:
+        return {frozenset((a.user_id, b.user_id)) for a, b in pairs}
+
+    def test_pairs_neighbours_by_score(self):
+        entries = [_entry(1, 2), _entry(2, 2), _entry(3, 1), _entry(4, 0)]
+        pairs, bye = swiss_pairings(entries, {})
+        self.assertIsNone(bye)
+        self.assertEqual(self.pair_ids(pairs), {frozenset((1, 2)), frozenset((3, 4))})
+
+    def test_backtracks_instead_of_rematch(self):
+        # Ghép tham lam 1-3 khiến 2 và 4 (đã gặp nhau) phải đấu lại; vẫn có cách 1-4, 2-3
+        entries = [_entry(1, 3), _entry(2, 2), _entry(3, 1), _entry(4, 0)]
+        faced = _faced((1, 2), (2, 4), (3, 4))
+        pairs, _ = swiss_pairings(entries, faced)
+        self.assertEqual(self.pair_ids(pairs), {frozenset((1, 4)), frozenset((2, 3))})
+
+    def test_bye_moves_up_when_rest_cannot_pair(self):
+        entries = [_entry(1, 2), _entry(2, 1), _entry(3, 0)]
+        # Nếu 3 được miễn thì 1 và 2 phải đấu lại
+        pairs, bye = swiss_pairings(entries, _faced((1, 2)))
+        self.assertNotEqual(bye.user_id, 3)
+        self.assertTrue(all(frozenset((a.user_id, b.user_id)) != frozenset((1, 2)) for a, b in pairs))
+
+    def test_bye_skips_players_who_had_one(self):
+        entries = [_entry(1, 2), _entry(2, 1), _entry(3, 0, had_bye=True)]
+        _, bye = swiss_pairings(entries, {})
+        self.assertEqual(bye.user_id, 2)
+
+    def test_falls_back_to_rematches_when_unavoidable(self):
+        entries = [_entry(1, 1), _entry(2, 0)]
+        pairs, bye = swiss_pairings(entries, _faced((1, 2)))
+        self.assertIsNone(bye)
+        self.assertEqual(self.pair_ids(pairs), {frozenset((1, 2))})
+
+    def test_large_field_has_no_rematches(self):
+        entries = [_entry(i, elo=2000 - i) for i in range(1, 201)]
+        faced = {}
+        for _ in range(5):
+            pairs, _ = swiss_pairings(entries, faced)
+            self.assertEqual(len(pairs), 100)
+            for a, b in pairs:
+                self.assertNotIn(b.user_id, faced.get(a.user_id, ()))
+                faced.setdefault(a.user_id, set()).add(b.user_id)
+                faced.setdefault(b.user_id, set()).add(a.user_id)
+
+
+class TournamentRoundTests(TestCase):
+    def setUp(self):
+        self.organizer = make_user("organizer")
+        self.tournament = Tournament.objects.create(name="Giải thử", organizer=self.organizer, total_rounds=1)
+        for name in ("an", "binh", "chi"):
+            TournamentPlayer.objects.create(tournament=self.tournament, user=make_user(name))
+
+    def test_second_start_conflicts_while_round_in_progress(self):
+        tournament, matches, bye = start_next_round(self.tournament)
+        self.assertEqual(tournament.current_round, 1)
+        self.assertEqual(len(matches), 1)
+        self.assertIsNotNone(bye)
+        # Bản tournament cũ trong bộ nhớ vẫn ghi current_round = 0: điều kiện phải được đọc lại sau khi khóa
+        with self.assertRaises(RoundConflict):
+            start_next_round(self.tournament)
+        self.assertEqual(self.tournament.matches.count(), 1)
+
+    def test_round_view_returns_conflict(self):
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+        url = f"/api/tournaments/{self.tournament.id}/rounds/"
+        self.assertEqual(client.post(url).status_code, 201)
+        self.assertEqual(client.post(url).status_code, 409)
+
+
+class RoomContentionTests(TransactionTestCase):
+    """Chạy ở chế độ autocommit như production: các view bắt IntegrityError rồi truy vấn tiếp."""
+
+    joiners = 300
+
+    def setUp(self):
+        self.host = make_user("host")
+        self.players = make_players("joiner", self.joiners)
+
+    async def post_all(self, path: str, users: list, payload: dict) -> list:
+        client = AsyncClient()
+        responses = await asyncio.gather(*(
+            client.post(path, payload, content_type="application/json", headers=auth_headers(user)) for user in users
+        ))
+        return [response.status_code for response in responses]
+
+    async def test_hundreds_of_concurrent_joiners_fill_one_seat(self):
+        room = await Room.objects.acreate(room_name="Đông người", host=self.host)
+        codes = await self.post_all("/api/rooms/join/", self.players, {"room_id": room.id})
+
+        self.assertEqual(codes.count(200), 1)
+        self.assertEqual(codes.count(400), self.joiners - 1)
+        room = await Room.objects.aget(id=room.id)
+        self.assertEqual(room.status, Room.Status.PLAYING)
+        winner = self.players[codes.index(200)]
+        self.assertEqual(room.player_2_id, winner.id)
+
+    async def test_seat_reopens_after_leave_under_contention(self):
+        room = await Room.objects.acreate(room_name="Ra vào", host=self.host)
+        first, rest = self.players[:150], self.players[150:]
+        codes = await self.post_all("/api/rooms/join/", first, {"room_id": room.id})
+        seated = first[codes.index(200)]
+
+        # Người đang ngồi rời phòng trong lúc nhóm thứ hai cùng xin vào
+        client = AsyncClient()
+        leave = client.post("/api/rooms/leave/", {"room_id": room.id}, content_type="application/json", headers=auth_headers(seated))
+        results = await asyncio.gather(leave, self.post_all("/api/rooms/join/", rest, {"room_id": room.id}))
+        self.assertEqual(results[0].status_code, 200)
+
+        room = await Room.objects.aget(id=room.id)
+        joined_again = results[1].count(200)
+        self.assertLessEqual(joined_again, 1)
+        if joined_again:
+            self.assertEqual(room.status, Room.Status.PLAYING)
+            self.assertEqual(room.player_2_id, rest[results[1].index(200)].id)
+        else:
+            self.assertEqual((room.status, room.player_2_id), (Room.Status.WAITING, None))
+
+    async def test_concurrent_creates_leave_one_waiting_room_per_host(self):
+        codes = await self.post_all("/api/rooms/", [self.host] * 50, {"room_name": "Phòng", "board_size": 15})
+        self.assertEqual(codes.count(201), 1)
+        self.assertEqual(await Room.objects.filter(host=self.host, status=Room.Status.WAITING).acount(), 1)
+
+    async def test_banned_user_with_valid_token_cannot_create_or_join(self):
+        room = await Room.objects.acreate(room_name="Cấm", host=self.host)
+        banned = self.players[0]
+        headers = auth_headers(banned)
+        banned.is_active = False
+        await banned.asave(update_fields=["is_active"])
+
+        client = AsyncClient()
+        joined = await client.post("/api/rooms/join/", {"room_id": room.id}, content_type="application/json", headers=headers)
+        created = await client.post("/api/rooms/", {"room_name": "Phòng", "board_size": 15}, content_type="application/json", headers=headers)
+        self.assertEqual((joined.status_code, created.status_code), (401, 401))
+        self.assertEqual(created.json()["code"], "user_inactive")
+        self.assertFalse(await Room.objects.filter(host=banned).aexists())
+        self.assertIsNone((await Room.objects.aget(id=room.id)).player_2_id)
+
+    async def test_host_deleted_mid_request_is_not_reported_as_waiting_room(self):
+        deleted = self.players[0]
+        headers = auth_headers(deleted)
+        await deleted.adelete()
+        # Lần kiểm tra đầu request vẫn thấy tài khoản: INSERT gặp lỗi khóa ngoại host
+        checks = mock.AsyncMock(side_effect=[True, False])
+        with mock.patch.object(RoomListCreateView, "user_is_active", checks):
+            response = await AsyncClient().post(
+                "/api/rooms/", {"room_name": "Phòng", "board_size": 15}, content_type="application/json", headers=headers
+            )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_inactive")
+        self.assertEqual(checks.await_count, 2)
+
+
+class RoomListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        hosts = make_players("host", 3)
+        Room.objects.bulk_create([Room(room_name=f"phong {i}", host=host) for i, host in enumerate(hosts)])
+        self.headers = auth_headers(hosts[0])
+
+    def test_without_paging_parameters_returns_plain_list_of_all_rooms(self):
+        response = self.client.get("/api/rooms/", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_paging_parameters_return_pages_with_cursor(self):
+        first = self.client.get("/api/rooms/", {"limit": 2}, headers=self.headers).json()
+        self.assertEqual(len(first["results"]), 2)
+        rest = self.client.get("/api/rooms/", {"cursor": first["next_cursor"]}, headers=self.headers).json()
+        self.assertEqual(len(rest["results"]), 1)
+        self.assertIsNone(rest["next_cursor"])
+
+
+class MatchReplayTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.match = Match.objects.create(player_x=make_user("an"), player_o=make_user("binh"))
+        self.match.set_moves([[7, 7], [7, 8], [8, 8]])
+        self.match.save()
+
+    def get(self, match_id: int, **headers):
+        return self.client.get(f"/api/matches/{match_id}/replay/", **headers)
+
+    def test_guessed_etag_does_not_hide_missing_or_unfinished_match(self):
+        for match_id in (self.match.id, self.match.id + 100):
+            response = self.get(match_id, HTTP_IF_NONE_MATCH=f'"replay-{match_id}"')
+            self.assertEqual(response.status_code, 404)
+
+    def test_finished_match_supports_conditional_get(self):
+        self.match.end_time = timezone.now()
+        self.match.save(update_fields=["end_time"])
+        response = self.get(self.match.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["moves"], [7 * 15 + 7, 7 * 15 + 8, 8 * 15 + 8])
+        self.assertEqual(self.get(self.match.id, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+class WatchRoomTests(SimpleTestCase):
+    room_id = 9001
+
+    def setUp(self):
+        self.game = {
+            'board': [[None] * 15 for _ in range(15)], 'moves': [], 'current_turn': 'X', 'match_id': 1,
+            'player_x': 1, 'player_o': 2, 'board_size': 15, 'rule_variant': STANDARD, 'rated': True,
+            'hint_sids': set(), 'threats': None,
+        }
+        socketio_handler.game_states[self.room_id] = self.game
+        socketio_handler.room_sessions[self.room_id] = ["sid-x"]
+        self.addCleanup(socketio_handler.game_states.pop, self.room_id, None)
+        self.addCleanup(socketio_handler.room_sessions.pop, self.room_id, None)
+        for user_id, sid in ((1, "sid-x"), (1, "sid-x-tab2"), (3, "sid-watcher")):
+            presence.add_session(user_id, sid)
+            self.addCleanup(presence.remove_session, sid)
+        self.emit = self.enterContext(mock.patch.object(socketio_handler.sio, "emit", new_callable=mock.AsyncMock))
+        self.enterContext(mock.patch.object(socketio_handler.sio, "enter_room", new_callable=mock.AsyncMock))
+
+    def events(self) -> list:
+        return [call.args[0] for call in self.emit.await_args_list]
+
+    async def test_player_cannot_watch_own_game_from_another_tab(self):
+        await socketio_handler._watch_room("sid-x-tab2", WatchRoom.decode({"room_id": self.room_id}))
+        self.assertEqual(self.events(), ["error"])
+        self.assertEqual(self.game['hint_sids'], set())
+
+    async def test_spectator_gets_no_hints_in_rated_game(self):
+        await socketio_handler._watch_room("sid-watcher", WatchRoom.decode({"room_id": self.room_id}))
+        self.assertEqual(self.events(), ["sync_state"])
+        self.assertEqual(self.game['hint_sids'], set())
+
+    async def test_spectator_gets_hints_in_unrated_game(self):
+        self.game['rated'] = False
+        await socketio_handler._watch_room("sid-watcher", WatchRoom.decode({"room_id": self.room_id}))
+        self.assertEqual(self.events(), ["sync_state", "hints"])
+
+
+class SlowHandlerLogTests(SimpleTestCase):
+    @override_settings(SOCKET_TRACE_SAMPLE_RATE=0, SOCKET_SLOW_HANDLER_MS=0)
+    async def test_slow_handler_is_logged_without_sampling(self):
+        @timed_handler
+        async def handler():
+            return "ok"
+
+        with self.assertLogs("gomoku.realtime.slow", "WARNING") as logs:
+            self.assertEqual(await handler(), "ok")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["event"], "handler")
+        self.assertNotIn("spans", entry)
+
+
+class RoomActorKeyTests(SimpleTestCase):
+    async def test_string_and_int_room_ids_share_one_actor(self):
+        flushed = []
+
+        async def flush(room_id, events):
+            flushed.append((room_id, events))
+
+        async def command(room_id):
+            room_actor.broadcast(room_id, "ping", {})
+            return room_actor.active_rooms()
+
+        before = room_actor.active_rooms()
+        self.assertEqual(await room_actor.run_in_room("9002", flush, command, "9002"), before + 1)
+        self.assertEqual(await room_actor.run_in_room(9002, flush, command, 9002), before + 1)
+        self.assertEqual(flushed, [(9002, [("ping", {})])] * 2)
+        for room_id in ("9002 ", "-1", True):
+            with self.assertRaises(ValueError):
+                await room_actor.run_in_room(room_id, flush, command, room_id)
+
+
+class RematchFlowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.host, self.guest = make_user("an"), make_user("binh")
+        self.room = Room.objects.create(room_name="phong", host=self.host, player_2=self.guest, status=Room.Status.FULL)
+        match = Match.objects.create(player_x=self.host, player_o=self.guest, room=self.room, end_time=timezone.now())
+        room_id = self.room.id
+        socketio_handler.finished_rooms[room_id] = {
+            'match_id': match.id, 'player_x': self.host.id, 'player_o': self.guest.id, 'tournament': False,
+            'accepted': set(), 'finished_at': 0.0,
+        }
+        socketio_handler.room_sessions[room_id] = ["sid-host", "sid-guest"]
+        for state in (socketio_handler.finished_rooms, socketio_handler.game_states, socketio_handler.room_sessions, room_actor._actors):
+            self.addCleanup(state.pop, room_id, None)
+        for user, sid in ((self.host, "sid-host"), (self.guest, "sid-guest")):
+            presence.add_session(user.id, sid)
+            self.addCleanup(presence.remove_session, sid)
+        self.emit = self.enterContext(mock.patch.object(socketio_handler.sio, "emit", new_callable=mock.AsyncMock))
+        self.enterContext(mock.patch.object(socketio_handler.sio, "close_room", new_callable=mock.AsyncMock))
+
+    def events(self) -> list:
+        return [call.args[0] for call in self.emit.await_args_list]
+
+    async def rematch(self, sid: str):
+        msg = Rematch.decode({"room_id": self.room.id})
+        await socketio_handler.in_room(msg.room_id, socketio_handler._rematch, sid, msg)
+
+    async def test_both_accept_starts_new_game_with_colors_swapped(self):
+        await self.rematch("sid-host")
+        self.assertEqual(self.events(), ["rematch_requested"])
+        await self.rematch("sid-guest")
+        self.assertEqual(self.events()[-1], "game_start")
+
+        game = socketio_handler.game_states[self.room.id]
+        self.assertEqual((game['player_x'], game['player_o']), (self.guest.id, self.host.id))
+        self.assertNotIn(self.room.id, socketio_handler.finished_rooms)
+        await self.room.arefresh_from_db()
+        self.assertEqual(self.room.status, Room.Status.PLAYING)
+
+    async def test_leaving_over_rest_cancels_rematch(self):
+        response = await AsyncClient().post(
+            "/api/rooms/leave/", {"room_id": self.room.id}, content_type="application/json",
+            headers=auth_headers(self.guest),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.room.id, socketio_handler.finished_rooms)
+        await self.rematch("sid-host")
+        self.assertEqual(self.events(), ["error"])
+
+    async def test_reclaim_keeps_room_that_is_back_in_use(self):
+        await Room.objects.filter(id=self.room.id).aupdate(status=Room.Status.WAITING, player_2=None)
+        await socketio_handler.in_room(self.room.id, socketio_handler._reclaim_room, self.room.id)
+        self.assertTrue(await Room.objects.filter(id=self.room.id).aexists())
+        self.assertNotIn("room_closed", self.events())
+
+
+class MessageDecodeTests(SimpleTestCase):
+    def test_accepts_ints_and_digit_strings(self):
+        msg = MakeMove.decode({"room_id": "12", "row": 3, "col": "007"})
+        self.assertEqual((msg.room_id, msg.row, msg.col, msg.match_id), (12, 3, 7, None))
+        self.assertEqual(WatchReplay.decode({"match_id": 1, "interval_ms": "-50"}).interval_ms, -50)
+
+    def test_rejects_loose_int_strings(self):
+        for value in (" 5 ", "5\n", "+5", "1_0", "-0", "-5", "５", "5.0", True, 5.0, None):
+            with self.subTest(value=value), self.assertRaises(ValidationError) as caught:
+                MakeMove.decode({"room_id": value, "row": 0, "col": 0})
+            self.assertEqual(caught.exception.field, "room_id")
+
+    def test_rejects_missing_fields_and_out_of_range(self):
+        with self.assertRaises(ValidationError):
+            MakeMove.decode({"room_id": 1, "row": 0})
+        with self.assertRaises(ValidationError):
+            MakeMove.decode({"room_id": 1, "row": 0, "col": 99})
+        with self.assertRaises(ValidationError):
+            MakeMove.decode([1, 0, 0])
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.x, self.o = make_user("an"), make_user("binh")
+
+    def finish(self, winner=None, **fields):
+        match = Match.objects.create(player_x=self.x, player_o=self.o, winner=winner, **fields)
+        match.set_moves([[7, 7], [7, 8], [8, 8]])
+        match.end_time = timezone.now()
+        return match
+
+    def standings(self, user) -> dict:
+        return {
+            row.kind: (row.games, row.wins, row.losses, row.draws, row.elo_gain, row.points)
+            for row in PeriodStanding.objects.filter(user=user)
+        }
+
+    def test_win_updates_elo_rating_history_and_every_period(self):
+        elo = settle_match(self.finish(winner=self.x))
+        (old_x, new_x), (old_o, new_o) = elo[self.x.id], elo[self.o.id]
+        self.assertGreater(new_x, old_x)
+        self.assertLess(new_o, old_o)
+        self.x.refresh_from_db()
+        self.assertEqual((self.x.elo, self.x.wins), (new_x, 1))
+
+        self.assertEqual(
+            dict(RatingPoint.objects.values_list("user_id", "elo")), {self.x.id: new_x, self.o.id: new_o}
+        )
+        kinds = PeriodStanding.Kind.values
+        self.assertEqual(self.standings(self.x), {kind: (1, 1, 0, 0, new_x - old_x, 2) for kind in kinds})
+        self.assertEqual(self.standings(self.o), {kind: (1, 0, 1, 0, new_o - old_o, 0) for kind in kinds})
+        self.assertEqual(UserStats.objects.filter(user__in=[self.x, self.o]).count(), 2)
+
+    def test_draw_gives_one_point_each(self):
+        settle_match(self.finish())
+        for user in (self.x, self.o):
+            self.assertEqual({row[3] for row in self.standings(user).values()}, {1})
+            self.assertEqual({row[5] for row in self.standings(user).values()}, {1})
+
+    def test_casual_match_keeps_elo_and_standings(self):
+        elo = settle_match(self.finish(winner=self.x, rated=False))
+        self.assertEqual(elo, {self.x.id: (1000, 1000), self.o.id: (1000, 1000)})
+        self.assertFalse(RatingPoint.objects.exists())
+        self.assertFalse(PeriodStanding.objects.exists())
+        # Thống kê ván đấu vẫn được cộng
+        self.assertEqual(UserStats.objects.get(user=self.x).x_wins, 1)
+
+    def test_tournament_match_is_rated_when_round_settles(self):
+        tournament = Tournament.objects.create(name="Giải thử", organizer=self.x, total_rounds=1, current_round=1)
+        match = self.finish(winner=self.o, tournament=tournament, tournament_round=1)
+        settle_match(match)
+        self.x.refresh_from_db()
+        self.assertEqual(self.x.elo, 1000)
+        self.assertFalse(RatingPoint.objects.exists())
+        self.assertFalse(PeriodStanding.objects.exists())
+
+        self.assertTrue(settle_round(tournament.id, 1))
+        self.x.refresh_from_db()
+        self.assertLess(self.x.elo, 1000)
+        self.assertEqual(RatingPoint.objects.count(), 2)
+        self.assertEqual(self.standings(self.o)[PeriodStanding.Kind.WEEK][:3], (1, 1, 0))
+        # Chốt lại cùng vòng không được cộng lần hai
+        self.assertFalse(settle_round(tournament.id, 1))
+        self.assertEqual(RatingPoint.objects.count(), 2)
+
+
+class BackfillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.x, self.o, self.chi = make_user("an"), make_user("binh"), make_user("chi")
+
+    def match(self, player_o, winner, end_time):
+        match = Match.objects.create(player_x=self.x, player_o=player_o, winner=winner, end_time=end_time)
+        match.set_moves([[7, 7], [7, 8], [8, 8]])
+        match.save()
+        return match
+
+    def backfill(self, command: str):
+        """
+        Chạy lệnh với batch 1; hai trận được chốt ngay khi lệnh báo tiến độ lần đầu,
+        tức là sau khi lệnh đã bắt đầu đọc lịch sử.
+        """
+        late = []
+
+        class Progress(StringIO):
+            def write(inner, text):
+                if not late:
+                    late.append(settle_match(self.match(self.o, self.x, timezone.now())))
+                    late.append(settle_match(self.match(self.chi, None, timezone.now())))
+                return super().write(text)
+
+        call_command(command, batch_size=1, stdout=Progress())
+        self.assertEqual(len(late), 2)
+
+    def test_user_stats_backfill_keeps_matches_settled_while_streaming(self):
+        self.match(self.o, self.x, timezone.now() - timezone.timedelta(days=1))
+        self.backfill("backfill_user_stats")
+
+        x = UserStats.objects.get(user=self.x)
+        self.assertEqual((x.x_wins, x.x_draws, x.best_streak, x.current_streak), (2, 1, 2, 0))
+        o = UserStats.objects.get(user=self.o)
+        self.assertEqual((o.o_losses, o.current_streak), (2, -2))
+        # chi chỉ có trận chốt sau khi lệnh bắt đầu: dòng của chi không thuộc lần dựng lại này
+        self.assertEqual(UserStats.objects.get(user=self.chi).o_draws, 1)
+
+    def test_head_to_head_backfill_keeps_matches_settled_while_streaming(self):
+        old = self.match(self.o, self.x, timezone.now() - timezone.timedelta(days=1))
+        self.backfill("backfill_head_to_head")
+
+        record = summary(get_record(self.x.id, self.o.id), self.x.id, self.o.id)
+        self.assertEqual((record["games"], record["wins"]), (2, 2))
+        self.assertEqual(record["recent"][-1]["match_id"], old.id)
+        self.assertEqual(summary(get_record(self.x.id, self.chi.id), self.x.id, self.chi.id)["draws"], 1)
+
+
+class HintDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.host, self.guest = make_user("an"), make_user("binh")
+        for user, sid in ((self.host, "sid-host"), (self.guest, "sid-guest"), (make_user("chi"), "sid-watcher")):
+            presence.add_session(user.id, sid)
+            self.addCleanup(presence.remove_session, sid)
+        self.emit = self.enterContext(mock.patch.object(socketio_handler.sio, "emit", new_callable=mock.AsyncMock))
+        self.enterContext(mock.patch.object(socketio_handler.sio, "enter_room", new_callable=mock.AsyncMock))
+
+    async def start_game(self, rated: bool) -> int:
+        room = await Room.objects.acreate(room_name="phong", host=self.host, player_2=self.guest, rated=rated)
+        for state in (socketio_handler.game_states, socketio_handler.room_sessions, room_actor._actors):
+            self.addCleanup(state.pop, room.id, None)
+        for sid in ("sid-host", "sid-guest"):
+            msg = JoinRoom.decode({"room_id": room.id})
+            await socketio_handler.in_room(room.id, socketio_handler._join_room, sid, msg)
+        return room.id
+
+    async def send(self, room_id: int, command, sid: str, msg):
+        self.emit.reset_mock()
+        await socketio_handler.in_room(room_id, command, sid, msg)
+        return [(call.args[0], call.kwargs.get("room")) for call in self.emit.await_args_list]
+
+    async def test_casual_game_sends_hints_to_player_and_spectator(self):
+        room_id = await self.start_game(rated=False)
+        match = await Match.objects.aget(id=socketio_handler.game_states[room_id]['match_id'])
+        self.assertFalse(match.rated)
+
+        toggle = ToggleHints.decode({"room_id": room_id, "enabled": True})
+        self.assertEqual(await self.send(room_id, socketio_handler._toggle_hints, "sid-host", toggle), [("hints", "sid-host")])
+        watch = WatchRoom.decode({"room_id": room_id})
+        self.assertIn(("hints", "sid-watcher"), await self.send(room_id, socketio_handler._watch_room, "sid-watcher", watch))
+
+        move = MakeMove.decode({"room_id": room_id, "row": 7, "col": 7})
+        events = await self.send(room_id, socketio_handler._make_move, "sid-host", move)
+        self.assertIn(("hints", "sid-host"), events)
+        self.assertIn(("hints", "sid-watcher"), events)
+        payload = next(call.args[1] for call in self.emit.await_args_list if call.args[0] == "hints")
+        self.assertEqual((payload["room_id"], payload["move"]), (room_id, 1))
+
+    async def test_rated_game_sends_no_hints(self):
+        room_id = await self.start_game(rated=True)
+        toggle = ToggleHints.decode({"room_id": room_id, "enabled": True})
+        self.assertEqual(await self.send(room_id, socketio_handler._toggle_hints, "sid-host", toggle), [("error", "sid-host")])
+        watch = WatchRoom.decode({"room_id": room_id})
+        self.assertEqual(await self.send(room_id, socketio_handler._watch_room, "sid-watcher", watch), [("sync_state", "sid-watcher")])
+
+
+class FloodControlTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.enterContext(mock.patch("users.throttling.time.monotonic", lambda: self.now))
+        for name, value in (("_event_buckets", {}), ("_user_bucket", None), ("_strike_bucket", None)):
+            self.enterContext(mock.patch.object(flood, name, value))
+        self.server = self.enterContext(mock.patch.object(flood, "_server", mock.AsyncMock()))
+
+    def test_bucket_allows_burst_then_refills_at_rate(self):
+        bucket = TokenBucket(2, 4)
+        self.assertEqual([bucket.take("sid") for _ in range(5)], [True] * 4 + [False])
+        self.now += 0.5
+        self.assertEqual([bucket.take("sid") for _ in range(2)], [True, False])
+        # Hồi lâu cũng không vượt quá burst; khóa khác có ngân sách riêng
+        self.now += 60
+        self.assertEqual([bucket.take("sid") for _ in range(5)], [True] * 4 + [False])
+        self.assertTrue(bucket.take("other"))
+
+    @override_settings(SOCKET_EVENT_BUDGETS={"default": (0, 1)}, SOCKET_FLOOD_STRIKES=(0, 2))
+    def test_repeated_flooding_disconnects(self):
+        handled = []
+
+        @flood.flood_controlled
+        async def make_move(sid, data):
+            handled.append(sid)
+
+        for _ in range(3):
+            asyncio.run(make_move("sid-flood", {}))
+        self.assertEqual(handled, ["sid-flood"])
+        self.server.disconnect.assert_not_awaited()
+        self.assertEqual(self.server.emit.await_count, 2)
+
+        with self.assertLogs("matches.flood", "WARNING"):
+            asyncio.run(make_move("sid-flood", {}))
+        self.server.disconnect.assert_awaited_once_with("sid-flood")
+        # Kết nối mới dùng lại sid không mang theo số lần vi phạm cũ
+        flood.forget("sid-flood")
+        asyncio.run(make_move("sid-flood", {}))
+        self.assertEqual(len(handled), 2)
+
+
+class MoveEncodingTests(SimpleTestCase):
+    def test_round_trip_on_every_board_size(self):
+        rng = random.Random(7)
+        for size in Room.BoardSize.values:
+            cells = [[row, col] for row in range(size) for col in range(size)]
+            rng.shuffle(cells)
+            corners = [[0, 0], [0, size - 1], [size - 1, 0], [size - 1, size - 1]]
+            for moves in ([], corners, cells[:1], cells[:size + 3], cells):
+                with self.subTest(size=size, moves=len(moves)):
+                    self.assertEqual(decode_moves(encode_moves(moves, size), size), (ORDERED, moves))
+            self.assertEqual(decode_moves(encode_moves(corners, size, POSITION), size), (POSITION, corners))
+
+    def test_move_times_round_trip_and_clamp(self):
+        self.assertEqual(decode_times(encode_times([0, 1500, -3, 2 ** 40])), [0, 1500, 0, 2 ** 32 - 1])
+
+
+class CompactMatchBoardsTests(TestCase):
+    def setUp(self):
+        x, o = make_user("an"), make_user("binh")
+        fields = {"player_x": x, "player_o": o, "end_time": timezone.now()}
+        self.ordered = Match.objects.create(moves=[[7, 7], [7, 8], [8, 8]], **fields)
+        self.position = Match.objects.create(board_state=board_from("XO", "..X"), **fields)
+        self.invalid = Match.objects.create(board_state=board_from("OO"), **fields)
+
+    def compact(self) -> str:
+        out = StringIO()
+        call_command("compact_match_boards", pause=0, stdout=out)
+        return out.getvalue()
+
+    def test_compaction_preserves_history_and_is_idempotent(self):
+        self.assertIn("Đã chuyển 2 trận, bỏ qua 1", self.compact())
+        stored = {match.id: bytes(match.move_data or b"") for match in Match.objects.all()}
+
+        ordered = Match.objects.get(id=self.ordered.id)
+        self.assertEqual((ordered.moves, ordered.move_history()), ([], [[7, 7], [7, 8], [8, 8]]))
+        position = Match.objects.get(id=self.position.id)
+        self.assertEqual(position.board_grid(), board_from("XO", "..X"))
+        self.assertIsNone(Match.objects.get(id=self.invalid.id).move_data)
+
+        self.assertIn("Đã chuyển 0 trận, bỏ qua 1", self.compact())
+        self.assertEqual({match.id: bytes(match.move_data or b"") for match in Match.objects.all()}, stored)
+
+
+class GlobalStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.x, self.o = make_user("an"), make_user("binh")
+
+    def finish(self, winner, moves):
+        match = Match.objects.create(player_x=self.x, player_o=self.o, winner=winner, end_time=timezone.now())
+        match.set_moves(moves)
+        match.save()
+        return match
+
+    def rollup(self) -> str:
+        out = StringIO()
+        call_command("rollup_game_stats", pause=0, stdout=out)
+        return out.getvalue()
+
+    def test_each_match_is_counted_once(self):
+        settle_match(self.finish(self.x, [[7, 7], [7, 8], [8, 8]]))
+        self.finish(None, [[7, 7], [0, 0]])
+        self.finish(self.o, [[3, 3], [7, 7], [3, 4], [8, 8]])
+
+        self.assertIn("Đã cộng 2 trận", self.rollup())
+        self.assertIn("Đã cộng 0 trận", self.rollup())
+        self.assertFalse(Match.objects.filter(stats_recorded=False).exists())
+
+        response = self.client.get("/api/stats/", {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        self.assertEqual(
+            stats["results"], {"games": 3, "x_win_rate": 0.3333, "o_win_rate": 0.3333, "draw_rate": 0.3333}
+        )
+        self.assertEqual(stats["board_sizes"], [{"board_size": 15, "games": 3, "avg_moves": 3.0}])
+        self.assertEqual(stats["first_moves"]["15"][0], {"row": 7, "col": 7, "count": 2})
+        self.assertEqual(sum(day["games"] for day in stats["games_per_day"]), 3)
+
+    def test_days_is_validated(self):
+        for days in ("abc", "0", "366"):
+            self.assertEqual(self.client.get("/api/stats/", {"days": days}).status_code, 400)
+
+
+class HeadToHeadTests(TestCase):
+    def setUp(self):
+        self.a, self.b = make_user("an"), make_user("binh")
+
+    def settle(self, player_x, player_o, winner):
+        match = Match.objects.create(player_x=player_x, player_o=player_o, winner=winner, end_time=timezone.now())
+        match.set_moves([[7, 7], [7, 8], [8, 8]])
+        settle_match(match)
+        return match
+
+    def get(self, user, opponent, **params):
+        return self.client.get(f"/api/head-to-head/{user.id}/{opponent.id}/", params)
+
+    def test_record_is_shared_by_both_players_whoever_plays_x(self):
+        # b thắng 2 trận rồi a thắng 10 trận, đổi quân X/O mỗi trận; hòa 1 trận ở cuối
+        self.settle(self.b, self.a, self.b)
+        self.settle(self.a, self.b, self.b)
+        for number in range(10):
+            self.settle(*((self.a, self.b) if number % 2 else (self.b, self.a)), self.a)
+        last = self.settle(self.a, self.b, None)
+        self.assertEqual(HeadToHead.objects.count(), 1)
+
+        a_side = self.get(self.a, self.b).json()
+        self.assertEqual((a_side["games"], a_side["wins"], a_side["losses"], a_side["draws"]), (13, 10, 2, 1))
+        self.assertEqual(len(a_side["recent"]), RECENT_GAMES)
+        self.assertEqual(a_side["recent"][0], {
+            "match_id": last.id, "result": "draw", "board_size": 15, "end_time": last.end_time.isoformat(),
+        })
+        self.assertEqual({game["result"] for game in a_side["recent"][1:]}, {"win"})
+
+        b_side = self.get(self.b, self.a, limit=2).json()
+        self.assertEqual((b_side["wins"], b_side["losses"]), (2, 10))
+        self.assertEqual([game["result"] for game in b_side["recent"]], ["draw", "loss"])
+
+    def test_players_who_never_met_and_invalid_pairs(self):
+        stranger = make_user("chi")
+        self.assertEqual(self.get(self.a, stranger).json()["games"], 0)
+        self.assertEqual(self.get(self.a, self.a).status_code, 400)
+        self.assertEqual(self.get(self.a, self.b, limit="x").status_code, 400)
+
+
+class FairPlayTests(SimpleTestCase):
+    # Khai cuộc 8 nước yên tĩnh, X có ba quân hàng 7 bị O chặn bên trái
+    opening = [[7, 7], [7, 6], [7, 8], [0, 0], [7, 9], [0, 14], [9, 3], [14, 14]]
+
+    def analyze(self, moves, times=(), players=None):
+        return analyze_match({
+            "match_id": 1, "board_size": 15, "rule_variant": STANDARD, "moves": moves, "move_times": list(times),
+            "players": players or {"X": 1, "O": 2}, "top_candidates": 3,
+        })["results"]
+
+    def test_forced_moves_are_not_scored(self):
+        # X đi thành bốn (nước tự do); O đi đâu cũng là thế bắt buộc; X thắng ngay cũng là nước bắt buộc
+        line = self.opening + [[7, 10], [12, 12], [7, 11]]
+        x, o = self.analyze(line)
+        self.assertEqual((x["moves"], x["engine_matches"]), (1, 1))
+        self.assertEqual((o["moves"], o["engine_matches"]), (0, 0))
+
+        # Sau khi O chặn, nước kế tiếp của mỗi bên lại được chấm
+        x, o = self.analyze(self.opening + [[7, 10], [7, 11], [3, 10], [12, 3]])
+        self.assertEqual((x["moves"], o["moves"]), (2, 1))
+
+        # Người chơi None (khách, bot) không được chấm
+        self.assertEqual([row["user_id"] for row in self.analyze(line, players={"X": 1, "O": None})], [1])
+
+    def test_uniform_timing_is_flagged(self):
+        line = self.opening + [[7, 10], [12, 12], [7, 11]]
+        times = [1000 if number % 2 == 0 else 500 + 400 * (number % 4) for number in range(len(line))]
+        with mock.patch.object(fairplay, "MIN_TIMED_MOVES", 4):
+            x, o = self.analyze(line, times)
+        self.assertEqual((x["timing_cv"], x["flags"]), (0.0, [fairplay.UNIFORM_TIMING]))
+        self.assertEqual(o["flags"], [])
+        # Thiếu thời gian của một số nước: bỏ cả phần thời gian
+        self.assertIsNone(self.analyze(line, times[:-1])[0]["mean_move_ms"])
+
+    def test_suspicion_score_is_monotonic(self):
+        def score(moves, matches, timed=0, uniform=0):
+            return suspicion_score(moves, matches, timed, uniform, baseline=0.5, timing_weight=2.0)
+
+        # Cùng tỉ lệ trùng engine trên baseline: càng nhiều nước càng chắc chắn
+        scores = [score(moves, int(moves * 0.8)) for moves in (10, 40, 160, 640)]
+        self.assertEqual(scores, sorted(scores))
+        self.assertLess(scores[0], scores[-1])
+        # Thêm nước trùng engine hoặc ván có nhịp đều không làm điểm giảm
+        self.assertLess(score(100, 60), score(100, 70))
+        self.assertLess(score(100, 60, timed=10, uniform=2), score(100, 60, timed=10, uniform=5))
+        # Dưới baseline không bị cộng điểm âm
+        self.assertEqual(score(100, 30), 0.0)
+        self.assertEqual(score(0, 0), 0.0)
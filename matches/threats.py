@@ -0,0 +1,191 @@
+"""
+Threat detection: nước bốn, ba thông và thắng cưỡng bức, cập nhật dần theo từng nước đi
+
+ThreatTracker giữ kết quả phân tích của từng đường thẳng trọn vẹn (rules.full_lines).
+Một nước đi chỉ làm thay đổi các đường đi qua ô đó nên chỉ các đường này được phân
+tích lại. Bot hoặc công cụ phân tích có thể dùng place/remove để thử nước rồi hoàn tác.
+"""
+import time
+
+from .rules import RENJU, STANDARD, forbidden_reason, full_lines, is_five
+
+PLAYERS = ("X", "O")
+
+
+def _opponent(player: str) -> str:
+    return "O" if player == "X" else "X"
+
+
+def _win_points(cells: list, player: str, variant: str, start: int, stop: int) -> set:
+    """Các ô trống mà player đi vào sẽ thành đường thắng, xét các cửa sổ 5 ô bắt đầu trong [start, stop)."""
+    points = set()
+    opponent = _opponent(player)
+    for first in range(max(start, 0), min(stop, len(cells) - 4)):
+        window = cells[first:first + 5]
+        if opponent in window or window.count(player) != 4:
+            continue
+        i = first + window.index(None)
+        cells[i] = player
+        if is_five(cells, player, variant, i):
+            points.add(i)
+        cells[i] = None
+    return points
+
+
+def analyze_line(cells: list, player: str, variant: str = STANDARD) -> tuple:
+    """
+    Phân tích một đường thẳng cho người chơi player.
+
+    Returns:
+        (wins, makers): wins là vị trí các ô đi vào thì thắng ngay (player đang có nước bốn);
+        makers là {vị trí: số ô thắng tạo ra} cho các ô đi vào thì thành nước bốn,
+        số ô thắng >= 2 nghĩa là tứ thông (player đang có ba thông)
+    """
+    wins = _win_points(cells, player, variant, 0, len(cells))
+    candidates = set()
+    opponent = _opponent(player)
+    for first in range(len(cells) - 4):
+        window = cells[first:first + 5]
+        if opponent not in window and window.count(player) == 3:
+            candidates.update(first + j for j, cell in enumerate(window) if cell is None)
+
+    makers = {}
+    for i in candidates - wins:
+        cells[i] = player
+        # Ô thắng mới phải nằm trong cửa sổ chứa i
+        created = _win_points(cells, player, variant, i - 4, i + 1)
+        cells[i] = None
+        if created:
+            makers[i] = len(created)
+    return wins, makers
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class ThreatTracker:
+    """Trạng thái mối đe dọa của một ván, cập nhật theo từng nước đi."""
+
+    def __init__(self, size: int, variant: str = STANDARD, board: list = None):
+        self.size = size
+        self.variant = variant
+        self.lines, self.cell_lines = full_lines(size)
+        self.board = [list(row) for row in board] if board else [[None] * size for _ in range(size)]
+        # {player: {line_id: (wins, makers)}}, chỉ lưu đường có kết quả khác rỗng
+        self.results = {player: {} for player in PLAYERS}
+        for line_id, line in enumerate(self.lines):
+            if any(self.board[r][c] for r, c in line):
+                self._evaluate(line_id)
+
+    def _evaluate(self, line_id: int):
+        line = self.lines[line_id]
+        cells = [self.board[r][c] for r, c in line]
+        for player in PLAYERS:
+            wins, makers = analyze_line(cells, player, self.variant)
+            if wins or makers:
+                self.results[player][line_id] = (
+                    {line[i] for i in wins},
+                    {line[i]: count for i, count in makers.items()},
+                )
+            else:
+                self.results[player].pop(line_id, None)
+
+    def _update(self, row: int, col: int):
+        for line_id, _ in self.cell_lines[row * self.size + col]:
+            self._evaluate(line_id)
+
+    def place(self, row: int, col: int, player: str):
+        self.board[row][col] = player
+        self._update(row, col)
+
+    def remove(self, row: int, col: int):
+        self.board[row][col] = None
+        self._update(row, col)
+
+    def win_points(self, player: str) -> set:
+        """Các ô player đi vào thì thắng ngay."""
+        points = set()
+        for wins, _ in self.results[player].values():
+            points |= wins
+        return points
+
+    def four_points(self, player: str) -> dict:
+        """{ô: số ô thắng tạo ra trên đường đó} cho các ô player đi vào thì thành nước bốn."""
+        points = {}
+        for _, makers in self.results[player].values():
+            for cell, count in makers.items():
+                if self.board[cell[0]][cell[1]] is None:
+                    points[cell] = max(points.get(cell, 0), count)
+        return points
+
+    def _is_forbidden(self, row: int, col: int, player: str) -> bool:
+        if self.variant != RENJU or player != "X":
+            return False
+        self.board[row][col] = player
+        forbidden = forbidden_reason(self.board, row, col, player, self.variant) is not None
+        self.board[row][col] = None
+        return forbidden
+
+    def _vcf(self, attacker: str, depth: int, deadline: float):
+        """Chuỗi nước bốn liên tục dẫn tới thắng cho attacker (đang tới lượt), None nếu không tìm thấy."""
+        if time.perf_counter() > deadline:
+            raise SearchTimeout
+        wins = self.win_points(attacker)
+        if wins:
+            return [min(wins)]
+        defender = _opponent(attacker)
+        if depth == 0 or self.win_points(defender):
+            return None
+
+        # Ưu tiên ô tạo tứ thông (thắng ngay ở nước sau)
+        for cell, _ in sorted(self.four_points(attacker).items(), key=lambda item: -item[1]):
+            if self._is_forbidden(*cell, attacker):
+                continue
+            self.place(*cell, attacker)
+            try:
+                replies = self.win_points(attacker)
+                if len(replies) >= 2 and not self.win_points(defender):
+                    return [cell, min(replies)]
+                if len(replies) == 1:
+                    block = next(iter(replies))
+                    self.place(*block, defender)
+                    try:
+                        line = self._vcf(attacker, depth - 1, deadline)
+                    finally:
+                        self.remove(*block)
+                    if line:
+                        return [cell] + line
+            finally:
+                self.remove(*cell)
+        return None
+
+    def forced_win(self, player: str, deadline: float, depth: int = 8):
+        """Chuỗi nước thắng cưỡng bức (VCF) của player nếu player đang tới lượt; None nếu không có hoặc hết giờ."""
+        try:
+            return self._vcf(player, depth, deadline)
+        except SearchTimeout:
+            return None
+
+    def summary(self, to_move: str, budget: float) -> dict:
+        """
+        Gợi ý sau một nước đi, giới hạn trong budget giây.
+
+        fours là các ô đi vào thì thắng ngay, open_threes là các ô đi vào thành tứ thông.
+        forced_win chỉ được tìm cho người đang tới lượt.
+        """
+        deadline = time.perf_counter() + budget
+        threats = {
+            player: {
+                "fours": sorted(self.win_points(player)),
+                "open_threes": sorted(cell for cell, count in self.four_points(player).items() if count >= 2),
+            }
+            for player in PLAYERS
+        }
+        moves = self.forced_win(to_move, deadline)
+        return {
+            "threats": {player: {key: [list(cell) for cell in cells] for key, cells in data.items()}
+                        for player, data in threats.items()},
+            "forced_win": {"player": to_move, "moves": [list(cell) for cell in moves]} if moves else None,
+            "complete": time.perf_counter() <= deadline,
+        }
@@ -0,0 +1,321 @@
+"""
+Tournament scheduling for Gomoku (Swiss / round-robin)
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from users.cache import bump_users
+from users.rating_history import record as record_rating
+from users.standings import record as record_standings
+
+from .elo_calculator import calculate_elo_change, calculate_elo_draw
+from .models import Match, Room, Tournament, TournamentPlayer
+
+MAX_PAIRING_STEPS = 200_000  # Giới hạn số bước quay lui khi ghép cặp một vòng
+
+
+class RoundConflict(Exception):
+    """Không thể bắt đầu vòng mới ở trạng thái hiện tại của giải; args[0] là lý do cho client."""
+
+
+def _assign_colors(a: TournamentPlayer, b: TournamentPlayer) -> tuple:
+    """Người cầm X ít hơn được đi trước (X)."""
+    if a.color_balance <= b.color_balance:
+        return a, b
+    return b, a
+
+
+def _pair_unplayed(ranked: list, faced: dict, budget: list):
+    """
+    Ghép toàn bộ ranked thành cặp chưa từng gặp nhau, ưu tiên người gần nhất bên dưới.
+
+    Tìm theo chiều sâu bằng ngăn xếp: khi người xếp cao nhất còn lại không còn ai để ghép thì
+    quay lui, đổi đối thủ của cặp vừa ghép trước đó sang người kế tiếp.
+
+    Args:
+        budget: [số bước còn lại], dùng chung cho mọi lần thử để giới hạn tổng thời gian
+
+    Returns:
+        list (entry, entry) hoặc None nếu không có cách ghép nào (hoặc hết budget)
+    """
+    count = len(ranked)
+    used = [False] * count
+    stack = []  # Các cặp đã ghép (chỉ số người trên, chỉ số người dưới)
+    first = candidate = 0
+    while True:
+        while first < count and used[first]:
+            first += 1
+        if first == count:
+            return [(ranked[a], ranked[b]) for a, b in stack]
+
+        opponents = faced.get(ranked[first].user_id, ())
+        partner = None
+        for i in range(max(candidate, first + 1), count):
+            if not used[i] and ranked[i].user_id not in opponents:
+                partner = i
+                break
+        budget[0] -= 1
+        if partner is not None:
+            used[first] = used[partner] = True
+            stack.append((first, partner))
+            candidate = 0
+            continue
+
+        if not stack or budget[0] <= 0:
+            return None
+        first, partner = stack.pop()
+        used[first] = used[partner] = False
+        candidate = partner + 1
+
+
+def swiss_pairings(entries: list, faced: dict) -> tuple:
+    """
+    Ghép cặp hệ Thụy Sĩ cho một vòng.
+
+    Người chơi được xếp theo điểm rồi theo ELO; mỗi người gặp người gần nhất bên dưới mà
+    mình chưa từng đối đầu, quay lui khi ghép tham lam đi vào ngõ cụt. Người được miễn đấu
+    là người xếp thấp nhất chưa từng được miễn mà phần còn lại vẫn ghép được. Chỉ khi không
+    có cách ghép nào tránh được đấu lại (vd số vòng nhiều hơn số đối thủ) thì mới ghép lần
+    lượt theo bảng xếp hạng.
+
+    Args:
+        entries: Danh sách TournamentPlayer (đã select_related user)
+        faced: {user_id: set(user_id đã gặp)}
+
+    Returns:
+        (pairs, bye): pairs là list (entry_x, entry_o), bye là entry được miễn đấu hoặc None
+    """
+    ranked = sorted(entries, key=lambda e: (-e.score, -e.user.elo, e.id))
+    budget = [MAX_PAIRING_STEPS]
+
+    if len(ranked) % 2 == 0:
+        byes = [None]
+    else:
+        # Người chưa được miễn từ dưới lên, rồi tới những người đã được miễn
+        byes = [i for i in range(len(ranked) - 1, -1, -1) if not ranked[i].had_bye]
+        byes += [i for i in range(len(ranked) - 1, -1, -1) if ranked[i].had_bye]
+
+    pairs = bye = None
+    for bye_index in byes:
+        players = ranked if bye_index is None else ranked[:bye_index] + ranked[bye_index + 1:]
+        pairs = _pair_unplayed(players, faced, budget)
+        if pairs is not None:
+            bye = None if bye_index is None else ranked[bye_index]
+            break
+        if budget[0] <= 0:
+            break
+    if pairs is None:
+        # Không tránh được đấu lại: ghép lần lượt theo bảng xếp hạng
+        bye = None if byes[0] is None else ranked[byes[0]]
+        players = [entry for entry in ranked if entry is not bye]
+        pairs = list(zip(players[::2], players[1::2]))
+    return [_assign_colors(a, b) for a, b in pairs], bye
+
+
+def round_robin_pairings(entries: list, round_number: int) -> tuple:
+    """
+    Ghép cặp vòng tròn theo phương pháp xoay vòng (bảng Berger).
+
+    Args:
+        entries: Danh sách TournamentPlayer
+        round_number: Số thứ tự vòng, bắt đầu từ 1
+
+    Returns:
+        (pairs, bye): Giống swiss_pairings
+    """
+    # Thứ tự đăng ký cố định nên lịch đấu các vòng không trùng nhau
+    seeded = sorted(entries, key=lambda e: e.id)
+    if len(seeded) % 2:
+        seeded.append(None)
+
+    size = len(seeded)
+    shift = (round_number - 1) % (size - 1)
+    rest = seeded[1:]
+    if shift:
+        rest = rest[-shift:] + rest[:-shift]
+    rotated = [seeded[0]] + rest
+
+    pairs = []
+    bye = None
+    for i in range(size // 2):
+        a, b = rotated[i], rotated[size - 1 - i]
+        if a is None or b is None:
+            bye = a or b
+            continue
+        pairs.append(_assign_colors(a, b))
+    return pairs, bye
+
+
+def _faced_opponents(tournament: Tournament) -> dict:
+    """Tập đối thủ đã gặp của từng người, lấy từ các trận của giải (một truy vấn theo index)."""
+    faced = defaultdict(set)
+    for player_x, player_o in tournament.matches.values_list("player_x_id", "player_o_id"):
+        faced[player_x].add(player_o)
+        faced[player_o].add(player_x)
+    return faced
+
+
+def _increment_grouped(queryset, field: str, deltas: dict, floor_zero: tuple = ()):
+    """
+    Cộng dồn bộ đếm bằng F(); các dòng có cùng mức thay đổi được gom vào một câu UPDATE.
+
+    Args:
+        queryset: QuerySet gốc để lọc
+        field: Tên cột dùng để lọc (vd "id", "user_id")
+        deltas: {giá trị field: {tên cột: lượng cộng thêm}}
+        floor_zero: Các cột không được xuống dưới 0
+    """
+    groups = defaultdict(list)
+    for key, delta in deltas.items():
+        groups[tuple(sorted(delta.items()))].append(key)
+    for delta, keys in groups.items():
+        values = {}
+        for column, amount in delta:
+            expression = F(column) + amount
+            values[column] = Greatest(expression, Value(0)) if column in floor_zero else expression
+        queryset.filter(**{f"{field}__in": keys}).update(**values)
+
+
+def start_next_round(tournament: Tournament) -> tuple:
+    """
+    Ghép cặp vòng kế tiếp và tạo toàn bộ phòng + trận của vòng đó.
+
+    Phòng và trận mỗi loại chỉ tốn một lần bulk_create. Điều kiện bắt đầu vòng được kiểm tra
+    sau khi khóa dòng giải đấu nên hai request đồng thời không thể cùng mở một vòng.
+
+    Returns:
+        (tournament, matches, bye): Giải đấu sau khi cập nhật, các Match vừa tạo, entry được miễn đấu
+
+    Raises:
+        RoundConflict: Giải đã kết thúc, vòng trước chưa chốt, đã đủ số vòng hoặc chưa đủ người
+    """
+    with transaction.atomic():
+        tournament = Tournament.objects.select_for_update().get(id=tournament.id)
+        if tournament.status == Tournament.Status.FINISHED:
+            raise RoundConflict("Giải đấu đã kết thúc.")
+        if tournament.round_in_progress:
+            raise RoundConflict("Vòng hiện tại chưa kết thúc.")
+        if tournament.current_round and tournament.current_round >= tournament.total_rounds:
+            raise RoundConflict("Đã đấu đủ số vòng.")
+        entries = list(tournament.entries.select_related("user"))
+        if len(entries) < 2:
+            raise RoundConflict("Cần ít nhất 2 người chơi.")
+        round_number = tournament.current_round + 1
+
+        if tournament.format == Tournament.Format.ROUND_ROBIN:
+            if round_number == 1:
+                tournament.total_rounds = len(entries) - 1 + len(entries) % 2
+            pairs, bye = round_robin_pairings(entries, round_number)
+        else:
+            pairs, bye = swiss_pairings(entries, _faced_opponents(tournament))
+
+        rooms = Room.objects.bulk_create([
+            Room(
+                room_name=f"{tournament.name} - V{round_number} - B{board}",
+                host_id=entry_x.user_id,
+                player_2_id=entry_o.user_id,
+                board_size=tournament.board_size,
+                rule_variant=tournament.rule_variant,
+                status=Room.Status.PLAYING,
+            )
+            for board, (entry_x, entry_o) in enumerate(pairs, start=1)
+        ])
+        matches = Match.objects.bulk_create([
+            Match(
+                player_x_id=entry_x.user_id,
+                player_o_id=entry_o.user_id,
+                room=room,
+                board_size=tournament.board_size,
+                rule_variant=tournament.rule_variant,
+                tournament=tournament,
+                tournament_round=round_number,
+            )
+            for (entry_x, entry_o), room in zip(pairs, rooms)
+        ])
+
+        entries_qs = TournamentPlayer.objects.filter(tournament=tournament)
+        entries_qs.filter(id__in=[entry_x.id for entry_x, _ in pairs]).update(color_balance=F("color_balance") + 1)
+        entries_qs.filter(id__in=[entry_o.id for _, entry_o in pairs]).update(color_balance=F("color_balance") - 1)
+        if bye:
+            entries_qs.filter(id=bye.id).update(had_bye=True, score=F("score") + 1)
+
+        tournament.current_round = round_number
+        tournament.status = Tournament.Status.RUNNING
+        tournament.save(update_fields=["current_round", "total_rounds", "status"])
+    return tournament, matches, bye
+
+
+def round_payload(tournament: Tournament, matches: list, bye) -> dict:
+    """Dữ liệu thông báo vòng mới, gửi một lần cho toàn bộ người chơi."""
+    return {
+        "tournament_id": tournament.id,
+        "round": tournament.current_round,
+        "pairings": [
+            {
+                "room_id": match.room_id,
+                "match_id": match.id,
+                "player_x": match.player_x_id,
+                "player_o": match.player_o_id,
+            }
+            for match in matches
+        ],
+        "bye": bye.user_id if bye else None,
+    }
+
+
+def settle_round(tournament_id: int, round_number: int) -> bool:
+    """
+    Chốt kết quả một vòng trong một transaction: điểm bảng xếp hạng, thắng/thua và ELO.
+
+    ELO được tính theo điểm trước vòng nên kết quả không phụ thuộc thứ tự các trận.
+
+    Returns:
+        False nếu vòng chưa đấu xong hoặc đã được chốt trước đó
+    """
+    with transaction.atomic():
+        tournament = Tournament.objects.select_for_update().get(id=tournament_id)
+        if tournament.settled_round >= round_number:
+            return False
+        matches = list(
+            tournament.matches.filter(tournament_round=round_number).select_related("player_x", "player_o")
+        )
+        if any(match.end_time is None for match in matches):
+            return False
+
+        scores = {}
+        stats = {}
+        for match in matches:
+            player_x, player_o = match.player_x, match.player_o
+            if match.winner_id is None:
+                x_change, o_change = calculate_elo_draw(player_x.elo, player_o.elo)
+                for user, change in ((player_x, x_change), (player_o, o_change)):
+                    scores[user.id] = {"score": 0.5, "draws": 1}
+                    stats[user.id] = {"elo": change, "draws": 1}
+                continue
+
+            winner, loser = (player_x, player_o) if match.winner_id == player_x.id else (player_o, player_x)
+            winner_change, loser_change = calculate_elo_change(winner.elo, loser.elo)
+            scores[winner.id] = {"score": 1, "wins": 1}
+            scores[loser.id] = {"losses": 1}
+            stats[winner.id] = {"elo": winner_change, "wins": 1}
+            stats[loser.id] = {"elo": loser_change, "losses": 1}
+
+        # Cập nhật dạng F() để không ghi đè kết quả các ván thường chơi song song
+        _increment_grouped(tournament.entries.all(), "user_id", scores)
+        _increment_grouped(get_user_model().objects.all(), "id", stats, floor_zero=("elo",))
+        record_rating(dict(get_user_model().objects.filter(id__in=stats).values_list("id", "elo")))
+        record_standings({
+            user_id: ("win" if "wins" in delta else "loss" if "losses" in delta else "draw", delta["elo"])
+            for user_id, delta in stats.items()
+        })
+        transaction.on_commit(lambda: bump_users(*stats))
+
+        tournament.settled_round = round_number
+        if round_number >= tournament.total_rounds:
+            tournament.status = Tournament.Status.FINISHED
+        tournament.save(update_fields=["settled_round", "status"])
+    return True
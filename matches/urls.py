@@ -1,10 +1,33 @@
 from django.urls import path
 
-from .views import MatchHistoryView, RoomJoinView, RoomLeaveView, RoomListCreateView
+from .views import (
+    GlobalStatsView,
+    HeadToHeadView,
+    MatchHistoryView,
+    MatchReplayView,
+    RealtimeProfilerView,
+    RealtimeStatsView,
+    RoomJoinView,
+    RoomLeaveView,
+    RoomListCreateView,
+    TournamentJoinView,
+    TournamentListCreateView,
+    TournamentRoundView,
+    TournamentStandingsView,
+)
 
 urlpatterns = [
     path("rooms/", RoomListCreateView.as_view(), name="rooms"),
     path("rooms/join/", RoomJoinView.as_view(), name="rooms_join"),
     path("rooms/leave/", RoomLeaveView.as_view(), name="rooms_leave"),
     path("matches/history/", MatchHistoryView.as_view(), name="match_history"),
+    path("matches/<int:pk>/replay/", MatchReplayView.as_view(), name="match_replay"),
+    path("head-to-head/<int:user_id>/<int:opponent_id>/", HeadToHeadView.as_view(), name="head_to_head"),
+    path("tournaments/", TournamentListCreateView.as_view(), name="tournaments"),
+    path("tournaments/<int:pk>/join/", TournamentJoinView.as_view(), name="tournament_join"),
+    path("tournaments/<int:pk>/rounds/", TournamentRoundView.as_view(), name="tournament_rounds"),
+    path("tournaments/<int:pk>/standings/", TournamentStandingsView.as_view(), name="tournament_standings"),
+    path("stats/", GlobalStatsView.as_view(), name="global_stats"),
+    path("realtime/stats/", RealtimeStatsView.as_view(), name="realtime_stats"),
+    path("realtime/profiler/", RealtimeProfilerView.as_view(), name="realtime_profiler"),
 ]
@@ -1,119 +1,350 @@
-from django.db.models import Q
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Match, Room
-from .serializers import MatchHistorySerializer, RoomSerializer
+from users.views import AsyncAPIView
 
+from . import lobby
+from .models import Match, Room, Tournament, TournamentPlayer
+from .serializers import (
+	MatchHistorySerializer,
+	RoomSerializer,
+	TournamentSerializer,
+	TournamentStandingSerializer,
+)
+from .analytics import get_global_stats
+from .head_to_head import RECENT_GAMES, get_record, summary
+from .monitoring import profiler, realtime_stats
+from .replay import get_replay, replay_exists
+from .socketio_handler import game_states, room_membership_changed, sio
+from .tournament import RoundConflict, round_payload, start_next_round
 
-class RoomListCreateView(APIView):
+
+class RoomListCreateView(AsyncAPIView):
+	authentication_required = True
+	active_user_methods = ("post",)
+	max_limit = 100
+
+	async def get(self, request):
+		"""
+		Tìm phòng, mới tạo trước. Tham số: status (mặc định waiting), board_size, has_password (0/1),
+		q (tiền tố tên phòng), elo_min, elo_max, limit, cursor (next_cursor của trang trước).
+
+		Có limit hoặc cursor: trả về một trang {"results": [...], "next_cursor": ...}. Không có cả hai:
+		trả về danh sách tất cả các phòng khớp như API cũ (client cũ không gửi tham số phân trang).
+		"""
+		params = request.GET
+		room_status = params.get("status", Room.Status.WAITING)
+		if room_status not in Room.Status.values:
+			return JsonResponse({"detail": "status không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			filters = {
+				name: int(params[name])
+				for name in ("board_size", "elo_min", "elo_max")
+				if params.get(name, "") != ""
+			}
+			limit = int(params.get("limit", settings.LOBBY_PAGE_SIZE))
+			if params.get("cursor"):
+				filters["cursor"] = lobby.decode_cursor(params["cursor"])
+		except ValueError:
+			return JsonResponse({"detail": "Tham số tìm kiếm không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		if params.get("has_password") in ("0", "1"):
+			filters["has_password"] = params["has_password"] == "1"
+		filters["prefix"] = params.get("q", "").strip()
+		paged = "limit" in params or "cursor" in params
+		# Không phân trang: đọc theo trang lớn nhất rồi ghép lại
+		filters["limit"] = max(1, min(limit, self.max_limit)) if paged else self.max_limit
+
+		rooms, next_cursor = await lobby.asearch(room_status, **filters)
+		if not paged:
+			while next_cursor is not None:
+				page, next_cursor = await lobby.asearch(
+					room_status, **{**filters, "cursor": lobby.decode_cursor(next_cursor)}
+				)
+				rooms += page
+		# View chạy cùng event loop với Socket.IO nên đọc thẳng trạng thái ván đang chơi
+		for room in rooms:
+			game = game_states.get(room["room_id"])
+			if game is not None:
+				room["live"] = {"moves": len(game["moves"]), "current_turn": game["current_turn"]}
+		if not paged:
+			return JsonResponse(rooms, safe=False, status=status.HTTP_200_OK)
+		return JsonResponse({"results": rooms, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
+	async def post(self, request):
+		data = self.parse_body(request)
+		if data is None:
+			return JsonResponse({"detail": "Dữ liệu không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		serializer = RoomSerializer(data=data)
+		if not serializer.is_valid():
+			return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+		# Ràng buộc unique_waiting_room_per_host chặn phòng chờ thứ hai ngay trong câu INSERT
+		for attempt in range(2):
+			try:
+				room = await Room.objects.acreate(host_id=request.user_id, **serializer.validated_data)
+				lobby.invalidate()
+				return JsonResponse({"room_id": room.id, "room_name": room.room_name}, status=status.HTTP_201_CREATED)
+			except IntegrityError:
+				# Phòng chờ cũ có thể đã stale: dọn rồi thử lại một lần
+				if attempt == 0 and await sync_to_async(Room.prune_stale)():
+					lobby.invalidate()
+
+		existing_room_id = await Room.objects.filter(
+			host_id=request.user_id,
+			status=Room.Status.WAITING
+		).values_list("id", flat=True).afirst()
+		if existing_room_id is None and not await self.user_is_active(request.user_id):
+			# Lỗi khóa ngoại host: tài khoản bị xóa/khóa sau lần kiểm tra đầu request
+			return self.unauthorized({"detail": "Tài khoản không tồn tại hoặc đã bị khóa.", "code": "user_inactive"})
+		return JsonResponse({
+			"detail": "Bạn đã có phòng đang chờ. Vui lòng rời phòng trước khi tạo phòng mới.",
+			"existing_room_id": existing_room_id
+		}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RoomJoinView(AsyncAPIView):
+	authentication_required = True
+	active_user_methods = ("post",)
+	http_method_names = ["post"]
+
+	async def post(self, request):
+		data = self.parse_body(request)
+		if data is None:
+			return JsonResponse({"detail": "Dữ liệu không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		room_id = data.get("room_id")
+		password = data.get("password")
+		user_id = request.user_id
+
+		# Một câu UPDATE có điều kiện: chỉ một người thắng được chỗ trống khi nhiều người cùng vào
+		password_ok = Q(password__isnull=True) | Q(password="")
+		if password:
+			password_ok |= Q(password=password)
+		joined = await (
+			Room.objects.filter(id=room_id, status=Room.Status.WAITING, player_2__isnull=True)
+			.exclude(host_id=user_id)
+			.filter(password_ok)
+			.aupdate(player_2_id=user_id, status=Room.Status.PLAYING)
+		)
+		if joined:
+			lobby.invalidate()
+			room = await Room.objects.select_related("host", "player_2").aget(id=room_id)
+			await room_membership_changed(room.id)
+			return JsonResponse(RoomSerializer(room).data, status=status.HTTP_200_OK)
+
+		# Không vào được: đọc lại phòng để trả về lý do
+		room = await Room.objects.filter(id=room_id).afirst()
+		if room is None:
+			return JsonResponse({"detail": "Room không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+		if room.status != Room.Status.WAITING:
+			return JsonResponse({"detail": "Phòng không ở trạng thái chờ."}, status=status.HTTP_400_BAD_REQUEST)
+		if room.player_2_id == user_id:
+			return JsonResponse({"detail": "Bạn đã ở trong phòng."}, status=status.HTTP_400_BAD_REQUEST)
+		if room.host_id == user_id:
+			return JsonResponse({"detail": "Bạn là chủ phòng."}, status=status.HTTP_400_BAD_REQUEST)
+		if room.has_password and password != room.password:
+			return JsonResponse({"detail": "Sai mật khẩu phòng."}, status=status.HTTP_403_FORBIDDEN)
+		return JsonResponse({"detail": "Phòng không ở trạng thái chờ."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RoomLeaveView(AsyncAPIView):
+	authentication_required = True
+	http_method_names = ["post"]
+
+	async def post(self, request):
+		data = self.parse_body(request)
+		if data is None:
+			return JsonResponse({"detail": "Dữ liệu không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		room_id = data.get("room_id")
+		user_id = request.user_id
+
+		deleted, _ = await Room.objects.filter(id=room_id, host_id=user_id).adelete()
+		if deleted:
+			lobby.invalidate()
+			await room_membership_changed(int(room_id))
+			return JsonResponse({"detail": "Phòng đã bị xóa do host rời."}, status=status.HTTP_200_OK)
+
+		# Một câu UPDATE ở chế độ autocommit nên không cần atomic để bắt IntegrityError
+		try:
+			left = await Room.objects.filter(id=room_id, player_2_id=user_id).aupdate(player_2=None, status=Room.Status.WAITING)
+		except IntegrityError:
+			# Host đã mở phòng chờ khác trong lúc chơi: phòng này không thể quay về chờ nữa
+			left, _ = await Room.objects.filter(id=room_id, player_2_id=user_id).adelete()
+		if left:
+			lobby.invalidate()
+			await room_membership_changed(int(room_id))
+			return JsonResponse({"detail": "Bạn đã rời phòng."}, status=status.HTTP_200_OK)
+
+		if not await Room.objects.filter(id=room_id).aexists():
+			return JsonResponse({"detail": "Room không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+		return JsonResponse({"detail": "Bạn không ở trong phòng này."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MatchHistoryView(AsyncAPIView):
+	authentication_required = True
+
+	async def get(self, request):
+		user_id = request.user_id
+		matches = (
+			Match.objects.filter(Q(player_x_id=user_id) | Q(player_o_id=user_id))
+			.select_related("player_x", "player_o")
+			.order_by("-end_time", "-start_time")
+		)
+		rows = [MatchHistorySerializer.from_match(match, user_id) async for match in matches]
+		return JsonResponse(MatchHistorySerializer(rows, many=True).data, safe=False, status=status.HTTP_200_OK)
+
+
+class MatchReplayView(APIView):
+	permission_classes = [permissions.AllowAny]
+
+	def get(self, request, pk):
+		# Kiểm tra trước: ETag đoán được nên không được trả 304 cho trận không tồn tại/chưa kết thúc
+		if not replay_exists(pk):
+			return Response({"detail": "Không tìm thấy trận đấu đã kết thúc."}, status=status.HTTP_404_NOT_FOUND)
+
+		# Trận đã kết thúc không bao giờ thay đổi nên ETag cố định và cho cache vĩnh viễn
+		etag = f'"replay-{pk}"'
+		response = get_conditional_response(request, etag=etag)
+		if response is None:
+			replay = get_replay(pk)
+			if replay is None:
+				return Response({"detail": "Không tìm thấy trận đấu đã kết thúc."}, status=status.HTTP_404_NOT_FOUND)
+			response = Response(replay, status=status.HTTP_200_OK)
+		response["ETag"] = etag
+		response["Cache-Control"] = "public, max-age=31536000, immutable"
+		return response
+
+class HeadToHeadView(APIView):
+	"""Thành tích đối đầu của user_id với opponent_id (?limit= số trận gần nhất)."""
+	permission_classes = [permissions.AllowAny]
+
+	def get(self, request, user_id, opponent_id):
+		if user_id == opponent_id:
+			return Response({"detail": "Cần hai người chơi khác nhau."}, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			limit = int(request.query_params.get("limit", RECENT_GAMES))
+		except ValueError:
+			return Response({"detail": "limit phải là số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+		limit = max(0, min(limit, RECENT_GAMES))
+		return Response(summary(get_record(user_id, opponent_id), user_id, opponent_id, limit), status=status.HTTP_200_OK)
+
+
+class TournamentListCreateView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
 
 	def get(self, request):
-		Room.prune_stale()
-		rooms = Room.objects.filter(status=Room.Status.WAITING).order_by("-created_at")
-		serializer = RoomSerializer(rooms, many=True)
+		tournaments = (
+			Tournament.objects.exclude(status=Tournament.Status.FINISHED)
+			.select_related("organizer")
+			.annotate(player_count=Count("entries"))
+			.order_by("-created_at")
+		)
+		serializer = TournamentSerializer(tournaments, many=True)
 		return Response(serializer.data, status=status.HTTP_200_OK)
 
 	def post(self, request):
-		# Dọn dẹp các phòng stale trước khi kiểm tra
-		Room.prune_stale()
-		
-		# Kiểm tra xem user đã có phòng nào đang chờ (waiting)
-		existing_room = Room.objects.filter(
-			host=request.user,
-			status=Room.Status.WAITING
-		).first()
-		
-		if existing_room:
-			# Kiểm tra xem phòng này có thực sự tồn tại không (double-check)
-			try:
-				existing_room.refresh_from_db()
-				return Response({
-					"detail": "Bạn đã có phòng đang chờ. Vui lòng rời phòng trước khi tạo phòng mới.",
-					"existing_room_id": existing_room.id
-				}, status=status.HTTP_400_BAD_REQUEST)
-			except Room.DoesNotExist:
-				# Phòng đã bị xóa, cho phép tạo phòng mới
-				pass
-		
-		serializer = RoomSerializer(data=request.data, context={"request": request})
+		serializer = TournamentSerializer(data=request.data, context={"request": request})
 		if serializer.is_valid():
-			room = serializer.save()
-			return Response({"room_id": room.id, "room_name": room.room_name}, status=status.HTTP_201_CREATED)
+			tournament = serializer.save()
+			return Response({"tournament_id": tournament.id, "name": tournament.name}, status=status.HTTP_201_CREATED)
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RoomJoinView(APIView):
+class TournamentJoinView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
 
-	def post(self, request):
-		room_id = request.data.get("room_id")
-		password = request.data.get("password")
+	def post(self, request, pk):
 		try:
-			room = Room.objects.get(id=room_id)
-		except Room.DoesNotExist:
-			return Response({"detail": "Room không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
-
-		if room.host is None:
-			room.delete()
-			return Response({"detail": "Room không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
-
-		if room.status != Room.Status.WAITING:
-			return Response({"detail": "Phòng không ở trạng thái chờ."}, status=status.HTTP_400_BAD_REQUEST)
-		if room.player_2 and room.player_2_id == request.user.id:
-			return Response({"detail": "Bạn đã ở trong phòng."}, status=status.HTTP_400_BAD_REQUEST)
-		if room.host_id == request.user.id:
-			return Response({"detail": "Bạn là chủ phòng."}, status=status.HTTP_400_BAD_REQUEST)
-
-		if room.has_password:
-			if not password or password != room.password:
-				return Response({"detail": "Sai mật khẩu phòng."}, status=status.HTTP_403_FORBIDDEN)
+			tournament = Tournament.objects.get(pk=pk)
+		except Tournament.DoesNotExist:
+			return Response({"detail": "Giải đấu không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
 
-		room.player_2 = request.user
-		room.status = Room.Status.PLAYING
-		room.save(update_fields=["player_2", "status"])
+		if tournament.status != Tournament.Status.REGISTERING:
+			return Response({"detail": "Giải đấu đã khóa đăng ký."}, status=status.HTTP_400_BAD_REQUEST)
 
-		return Response(RoomSerializer(room).data, status=status.HTTP_200_OK)
+		_, created = TournamentPlayer.objects.get_or_create(tournament=tournament, user=request.user)
+		if not created:
+			return Response({"detail": "Bạn đã đăng ký giải đấu này."}, status=status.HTTP_400_BAD_REQUEST)
+		return Response({"detail": "Đăng ký thành công."}, status=status.HTTP_200_OK)
 
 
-class RoomLeaveView(APIView):
+class TournamentRoundView(APIView):
 	permission_classes = [permissions.IsAuthenticated]
 
-	def post(self, request):
-		room_id = request.data.get("room_id")
+	def post(self, request, pk):
 		try:
-			room = Room.objects.get(id=room_id)
-		except Room.DoesNotExist:
-			return Response({"detail": "Room không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+			tournament = Tournament.objects.get(pk=pk)
+		except Tournament.DoesNotExist:
+			return Response({"detail": "Giải đấu không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
 
-		user = request.user
+		if tournament.organizer_id != request.user.id:
+			return Response({"detail": "Chỉ ban tổ chức được bắt đầu vòng mới."}, status=status.HTTP_403_FORBIDDEN)
 
-		if room.host_id == user.id:
-			room.delete()
-			return Response({"detail": "Phòng đã bị xóa do host rời."}, status=status.HTTP_200_OK)
+		# Điều kiện vòng được kiểm tra trong transaction đã khóa giải đấu
+		try:
+			tournament, matches, bye = start_next_round(tournament)
+		except RoundConflict as exc:
+			return Response({"detail": exc.args[0]}, status=status.HTTP_409_CONFLICT)
+		payload = round_payload(tournament, matches, bye)
+		# Một lần broadcast cho toàn bộ người chơi của giải
+		async_to_sync(sio.emit)("tournament_round_started", payload, room=f"tournament_{tournament.id}")
+		return Response(payload, status=status.HTTP_201_CREATED)
 
-		if room.player_2_id == user.id:
-			room.player_2 = None
-			room.status = Room.Status.WAITING
-			room.save(update_fields=["player_2", "status"])
-			return Response({"detail": "Bạn đã rời phòng."}, status=status.HTTP_200_OK)
 
-		# Nếu vì lý do nào đó không còn người chơi nào, dọn phòng zombie
-		if room.current_players == 0:
-			room.delete()
-			return Response({"detail": "Phòng đã bị xóa."}, status=status.HTTP_200_OK)
+class TournamentStandingsView(APIView):
+	permission_classes = [permissions.AllowAny]
 
-		return Response({"detail": "Bạn không ở trong phòng này."}, status=status.HTTP_400_BAD_REQUEST)
+	def get(self, request, pk):
+		if not Tournament.objects.filter(pk=pk).exists():
+			return Response({"detail": "Giải đấu không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+		entries = TournamentPlayer.objects.filter(tournament_id=pk).select_related("user").order_by("-score", "-user__elo")
+		data = TournamentStandingSerializer(entries, many=True).data
+		return Response(data, status=status.HTTP_200_OK)
 
 
-class MatchHistoryView(APIView):
-	permission_classes = [permissions.IsAuthenticated]
+class GlobalStatsView(APIView):
+	"""Thống kê chung của hệ thống (?days=30), đọc từ các bảng tổng hợp."""
+	permission_classes = [permissions.AllowAny]
+	max_days = 365
 
 	def get(self, request):
-		user = request.user
-		matches = Match.objects.filter(Q(player_x=user) | Q(player_o=user)).order_by("-end_time", "-start_time")
+		try:
+			days = int(request.query_params.get("days", 30))
+		except ValueError:
+			return Response({"detail": "days phải là số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+		if not 1 <= days <= self.max_days:
+			return Response({"detail": f"days phải từ 1 đến {self.max_days}."}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(get_global_stats(days), status=status.HTTP_200_OK)
+
+
+class RealtimeStatsView(APIView):
+	permission_classes = [permissions.IsAdminUser]
 
-		data = [MatchHistorySerializer.from_match(match, user) for match in matches]
+	def get(self, request):
+		data = realtime_stats()
+		data["profiler"] = profiler.status()
 		return Response(data, status=status.HTTP_200_OK)
+
+
+class RealtimeProfilerView(APIView):
+	"""Bật/tắt profiler lấy mẫu của tầng realtime mà không cần khởi động lại."""
+	permission_classes = [permissions.IsAdminUser]
+
+	def get(self, request):
+		return Response(profiler.status(), status=status.HTTP_200_OK)
+
+	def post(self, request):
+		enabled = request.data.get("enabled")
+		if not isinstance(enabled, bool):
+			return Response({"detail": "enabled phải là true hoặc false."}, status=status.HTTP_400_BAD_REQUEST)
+		if enabled:
+			profiler.start()
+		else:
+			profiler.stop()
+		return Response(profiler.status(), status=status.HTTP_200_OK)
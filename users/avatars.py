@@ -0,0 +1,140 @@
+"""
+Avatar processing: kiểm tra ảnh, bỏ metadata và tạo ảnh thu nhỏ WebP/JPEG
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import bump_users
+from .models import CustomUser
+
+# Kích thước (px) của các bản thu nhỏ: danh sách / trang hồ sơ
+AVATAR_LIST_SIZE = 64
+AVATAR_PROFILE_SIZE = 256
+AVATAR_SIZES = (AVATAR_LIST_SIZE, AVATAR_PROFILE_SIZE)
+AVATAR_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+AVATAR_CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+# Thư mục chứa bản đã xử lý; tên file theo hash nội dung nên có thể cache vĩnh viễn
+AVATAR_VARIANT_DIR = "avatars/v"
+MAX_AVATAR_BYTES = 10 * 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="avatar")
+
+
+def variant_path(digest: str, size: int, ext: str) -> str:
+    return f"{AVATAR_VARIANT_DIR}/{digest}/{size}.{ext}"
+
+
+def avatar_url(user, size: int, request=None):
+    """
+    URL ảnh đại diện ở kích thước gần nhất đã tạo.
+
+    URL của bản đã xử lý không có phần mở rộng: avatar_variant chọn WebP hoặc JPEG theo
+    header Accept của chính request tải ảnh (API JSON không biết trình duyệt hỗ trợ gì).
+    Khi ảnh mới tải lên chưa xử lý xong thì trả về ảnh gốc.
+    """
+    if not user.avatar:
+        return None
+    if user.avatar_hash:
+        size = min((s for s in AVATAR_SIZES if s >= size), default=AVATAR_SIZES[-1])
+        url = default_storage.url(f"{AVATAR_VARIANT_DIR}/{user.avatar_hash}/{size}")
+    else:
+        url = user.avatar.url
+    if request:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def negotiate_format(accept: str) -> str:
+    """Phần mở rộng của bản thu nhỏ phù hợp với header Accept: WebP nếu client nhận, không thì JPEG."""
+    return "webp" if "image/webp" in accept else "jpg"
+
+
+def _reject(user_id: int, name: str):
+    """Ảnh không hợp lệ: xóa file và bỏ avatar (nếu người dùng chưa đổi ảnh khác)."""
+    if CustomUser.objects.filter(pk=user_id, avatar=name).update(avatar=None):
+        default_storage.delete(name)
+        bump_users(user_id)
+
+
+def process_avatar(user_id: int):
+    """Tạo các bản thu nhỏ cho ảnh đại diện vừa tải lên rồi xóa ảnh gốc."""
+    try:
+        user = CustomUser.objects.filter(pk=user_id).first()
+        if not user or not user.avatar or user.avatar_hash:
+            return
+        name = user.avatar.name
+
+        with default_storage.open(name, "rb") as f:
+            data = f.read(MAX_AVATAR_BYTES + 1)
+        if len(data) > MAX_AVATAR_BYTES:
+            _reject(user_id, name)
+            return
+
+        try:
+            Image.open(BytesIO(data)).verify()
+            image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert("RGB")
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+            _reject(user_id, name)
+            return
+
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        for size in AVATAR_SIZES:
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            for ext, fmt in AVATAR_FORMATS.items():
+                path = variant_path(digest, size, ext)
+                if default_storage.exists(path):
+                    continue
+                buffer = BytesIO()
+                # Không truyền exif/icc nên metadata của ảnh gốc bị loại bỏ
+                thumbnail.save(buffer, fmt, quality=85)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+
+        # Chỉ ghi nếu người dùng chưa đổi sang ảnh khác trong lúc xử lý
+        updated = CustomUser.objects.filter(pk=user_id, avatar=name).update(
+            avatar=variant_path(digest, AVATAR_SIZES[-1], "jpg"),
+            avatar_hash=digest,
+        )
+        if updated:
+            default_storage.delete(name)
+            bump_users(user_id)
+        else:
+            # Người dùng đã đổi ảnh khác trong lúc xử lý: bỏ ảnh gốc và các bản vừa tạo
+            default_storage.delete(name)
+            delete_variants(digest)
+    finally:
+        close_old_connections()
+
+
+def delete_variants(digest: str):
+    """
+    Xóa các bản thu nhỏ của digest khi không còn người dùng nào trỏ tới; người dùng tải lên
+    cùng một ảnh dùng chung bản thu nhỏ nên không xóa khi còn người khác dùng.
+    """
+    if not digest or CustomUser.objects.filter(avatar_hash=digest).exists():
+        return
+    for size in AVATAR_SIZES:
+        for ext in AVATAR_FORMATS:
+            default_storage.delete(variant_path(digest, size, ext))
+
+
+def _cleanup_variants(digest: str):
+    try:
+        delete_variants(digest)
+    finally:
+        close_old_connections()
+
+
+def schedule_avatar_processing(user_id: int):
+    """Đẩy việc xử lý ảnh sang worker nền sau khi transaction hiện tại commit."""
+    transaction.on_commit(lambda: _executor.submit(process_avatar, user_id))
+
+
+def schedule_variant_cleanup(digest: str):
+    """Xóa bản thu nhỏ của ảnh cũ ở worker nền sau khi transaction hiện tại commit."""
+    transaction.on_commit(lambda: _executor.submit(_cleanup_variants, digest))
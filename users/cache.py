@@ -0,0 +1,147 @@
+"""
+Versioned response cache: ETag/Last-Modified cho các endpoint đọc công khai
+
+Mỗi nhóm dữ liệu (một người dùng, bảng xếp hạng) có một version là dấu thời gian
+micro giây, được đổi khi hồ sơ cập nhật hoặc khi chốt trận. Request có
+If-None-Match khớp version hiện tại nhận 304 mà không cần truy vấn ORM; Last-Modified
+chỉ để tham khảo, không dùng để quyết định 304.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+LEADERBOARD_VERSION = "leaderboard"
+LOBBY_VERSION = "lobby"
+USER_DIRECTORY_VERSION = "user_directory"
+
+_stats = Counter()
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def user_version(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def bump(*keys):
+    """Đổi version để mọi response đã cache của các nhóm này hết hiệu lực."""
+    now = time.time_ns() // 1000
+    _cache().set_many({f"resp:version:{key}": now for key in keys}, timeout=None)
+
+
+def bump_users(*user_ids, leaderboard: bool = True):
+    """Đổi version hồ sơ của các người dùng (và bảng xếp hạng nếu cần)."""
+    keys = [user_version(user_id) for user_id in user_ids]
+    if leaderboard:
+        keys.append(LEADERBOARD_VERSION)
+    bump(*keys)
+
+
+def current_version(key: str) -> int:
+    cache = _cache()
+    cache_key = f"resp:version:{key}"
+    version = cache.get(cache_key)
+    if version is None:
+        # Chưa có (khởi động lại / bị evict): tạo mới, các response cũ coi như hết hạn
+        cache.add(cache_key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(cache_key)
+    return version
+
+
+def _lookup(request, version_key: str, variant: str):
+    """
+    Returns:
+        (etag, last_modified, 304 hoặc None, khóa body, body đã cache hoặc None)
+    """
+    version = current_version(version_key)
+    etag = f'"{variant}-{version}"'
+    # Làm tròn lên giây tiếp theo để không sớm hơn lần đổi thật
+    last_modified = -(-version // 1_000_000)
+
+    # Chỉ xét If-None-Match: Last-Modified chỉ chính xác tới giây nên một lần bump trong cùng
+    # giây với If-Modified-Since của client sẽ bị coi là chưa đổi
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        _stats["not_modified"] += 1
+        not_modified["ETag"] = etag
+        return etag, last_modified, not_modified, None, None
+
+    # Host nằm trong khóa vì một số serializer trả về URL tuyệt đối
+    body_key = f"resp:body:{variant}:{version}:{request.get_host()}"
+    data = _cache().get(body_key)
+    _stats["misses" if data is None else "hits"] += 1
+    return etag, last_modified, None, body_key, data
+
+
+def _validators(response, etag: str, last_modified: int):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cached_response(request, version_key: str, variant: str, build):
+    """
+    Trả response GET kèm ETag/Last-Modified theo version của nhóm dữ liệu.
+
+    Args:
+        request: Request hiện tại
+        version_key: Khóa version, vd user_version(pk) hoặc LEADERBOARD_VERSION
+        variant: Phân biệt các dạng response dùng chung một version
+        build: Hàm không tham số trả về Response khi cache miss; chỉ response 200 được lưu
+
+    Returns:
+        304 nếu client đã có bản mới nhất, ngược lại là Response (từ cache hoặc build)
+    """
+    etag, last_modified, not_modified, body_key, data = _lookup(request, version_key, variant)
+    if not_modified is not None:
+        return not_modified
+    if data is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        _cache().set(body_key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    return _validators(response, etag, last_modified)
+
+
+async def acached_response(request, version_key: str, variant: str, build):
+    """
+    Như cached_response cho view async, dùng chung cache body với bản sync.
+
+    Cache mặc định là LocMemCache nên đọc/ghi trực tiếp trong event loop, không qua thread.
+
+    Args:
+        build: Coroutine không tham số trả về (status, data) khi cache miss
+    """
+    etag, last_modified, not_modified, body_key, data = _lookup(request, version_key, variant)
+    if not_modified is not None:
+        return not_modified
+    if data is None:
+        code, data = await build()
+        if code != status.HTTP_200_OK:
+            return JsonResponse(data, status=code)
+        _cache().set(body_key, data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    return _validators(JsonResponse(data, safe=False), etag, last_modified)
+
+
+def cache_stats() -> dict:
+    """Số liệu của process hiện tại; 304 được tính là hit."""
+    hits = _stats["hits"] + _stats["not_modified"]
+    total = hits + _stats["misses"]
+    return {
+        "hits": _stats["hits"],
+        "not_modified": _stats["not_modified"],
+        "misses": _stats["misses"],
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
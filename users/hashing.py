@@ -0,0 +1,75 @@
+"""
+Password hashing pool: chạy PBKDF2 trong process riêng, giới hạn số việc chờ
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = None
+_in_flight = 0
+
+
+class HashPoolFull(Exception):
+    """Pool đã đủ việc đang chạy + đang chờ, request nên bị từ chối ngay (429)."""
+
+
+def _init_worker():
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gomoku.settings")
+    django.setup()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn thay vì fork: process cha đang chạy event loop và nhiều thread
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor):
+    """Bỏ pool đã hỏng (nếu chưa bị request khác thay) để lần gọi sau tạo pool mới."""
+    global _executor
+    if _executor is broken:
+        _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run(func, *args):
+    global _in_flight
+    if _in_flight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HashPoolFull()
+    # Chỉ thay đổi trong thread của event loop nên không cần lock
+    _in_flight += 1
+    try:
+        for attempt in range(2):
+            executor = _get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # Một worker chết (OOM, bị kill) làm hỏng cả pool: tạo pool mới và thử lại một lần
+                _discard_executor(executor)
+                if attempt:
+                    raise
+    finally:
+        _in_flight -= 1
+
+
+async def ahash_password(password: str) -> str:
+    """Băm mật khẩu (tương đương make_password) trong pool."""
+    return await _run(make_password, password)
+
+
+async def acheck_password(password: str, encoded: str) -> bool:
+    """Kiểm tra mật khẩu (tương đương check_password, không tự nâng cấp hash) trong pool."""
+    return await _run(check_password, password, encoded)
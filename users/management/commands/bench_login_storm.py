@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import time
+from statistics import quantiles
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+
+READ_PATHS = ("/api/users/leaderboard/", "/api/users/{user_id}/")
+
+
+async def _request(
+    handler, method: str, path: str, client_ip: str = "127.0.0.1", body: dict = None, token: str = None
+) -> int:
+    """Gửi một request thẳng vào ASGI handler (đủ middleware như khi chạy uvicorn); trả về status."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"localhost"), (b"content-type", b"application/json")]
+    if token is not None:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "server": ("localhost", 80), "client": (client_ip, 0), "headers": headers,
+    }
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    result = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+
+    await handler(scope, receive, send)
+    return result["status"]
+
+
+def _summary(latencies: list) -> str:
+    if len(latencies) < 2:
+        return f"{len(latencies)} request"
+    cuts = quantiles(latencies, n=100)
+    return f"{len(latencies)} request, p50 {cuts[49]:.1f} ms, p99 {cuts[98]:.1f} ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: p99 của các endpoint đọc không liên quan (bảng xếp hạng, hồ sơ) khi rảnh và khi có "
+        "cơn bão đăng nhập, chạy trong process qua ASGI. Tạo tạm người chơi bench_* rồi xóa khi xong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=64, help="Số client đăng nhập liên tục")
+        parser.add_argument("--readers", type=int, default=8, help="Số client gọi endpoint đọc")
+        parser.add_argument("--duration", type=float, default=10.0, help="Số giây mỗi pha")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = f"bench_{uuid4().hex[:6]}"
+        password = "bench-password"
+        # Băm một lần cho mọi tài khoản; mỗi tài khoản một email để throttle theo email không chặn storm
+        password_hash = make_password(password)
+        users = User.objects.bulk_create([
+            User(
+                email=f"{prefix}_{i}@bench.invalid", username=f"{prefix}_{i}", full_name=prefix,
+                password=password_hash,
+            )
+            for i in range(max(options["logins"], 1))
+        ])
+        # 429 là kết quả mong đợi của storm, không in cảnh báo cho từng request
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        try:
+            asyncio.run(self.run(users, password, options))
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    async def run(self, users, password, options):
+        duration = options["duration"]
+        idle = await self.phase(users, password, 0, options["readers"], duration)
+        self.stdout.write(f"Rảnh:           {_summary(idle['reads'])}")
+        storm = await self.phase(users, password, options["logins"], options["readers"], duration)
+        self.stdout.write(f"Bão đăng nhập:  {_summary(storm['reads'])}")
+        self.stdout.write(
+            f"Đăng nhập: {storm['logins'][200]} thành công, {storm['logins'][429]} bị từ chối 429, "
+            f"{storm['logins']['other']} lỗi khác"
+        )
+
+    async def phase(self, users, password, logins: int, readers: int, duration: float) -> dict:
+        result = {"reads": [], "logins": {200: 0, 429: 0, "other": 0}}
+        deadline = time.monotonic() + duration
+
+        handler = ASGIHandler()
+
+        async def login(index: int):
+            user = users[index % len(users)]
+            sent = 0
+            while time.monotonic() < deadline:
+                sent += 1
+                # Mỗi request một IP để đo giới hạn của pool chứ không phải throttle theo IP
+                code = await _request(
+                    handler, "POST", "/api/auth/login/", f"10.{index % 250}.{sent // 250 % 250}.{sent % 250}",
+                    {"email": user.email, "password": password},
+                )
+                result["logins"][code if code in (200, 429) else "other"] += 1
+
+        async def read(index: int):
+            paths = [path.format(user_id=users[index % len(users)].id) for path in READ_PATHS]
+            sent = 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                await _request(handler, "GET", paths[sent % len(paths)])
+                result["reads"].append((time.perf_counter() - started) * 1000)
+                sent += 1
+
+        await asyncio.gather(*(login(i) for i in range(logins)), *(read(i) for i in range(readers)))
+        return result
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from users.models import RatingPoint
+from users.rating_history import DAY, RAW, compact, cutoffs
+
+
+class Command(BaseCommand):
+    help = (
+        "Gộp lịch sử ELO cũ thành điểm theo ngày/tuần (xem users/rating_history.py), "
+        "từng lô người chơi theo id; chạy lại được bất cứ lúc nào."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--pause", type=float, default=0.05, help="Số giây nghỉ giữa các lô")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        raw_cutoff, day_cutoff = cutoffs()
+        due = Q(resolution=RAW, time__lt=raw_cutoff) | Q(resolution=DAY, time__lt=day_cutoff)
+        last_id = 0
+        users = removed = 0
+
+        while True:
+            user_ids = list(
+                RatingPoint.objects.filter(due, user_id__gt=last_id)
+                .order_by("user_id")
+                .values_list("user_id", flat=True)
+                .distinct()[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            for user_id in user_ids:
+                removed += compact(user_id)
+            users += len(user_ids)
+            self.stdout.write(f"Đã gộp lịch sử của {users} người chơi (tới id {last_id})...")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Đã gộp lịch sử ELO của {users} người chơi, bớt {removed} dòng."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Xóa dần refresh token đã hết hạn (outstanding + blacklisted) theo từng lô nhỏ; chạy định kỳ bằng cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.05, help="Số giây nghỉ giữa các lô")
+
+    def handle(self, *args, **options):
+        purged = purge_expired_tokens(batch_size=options["batch_size"], pause=options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Đã xóa {purged} token hết hạn."))
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.cache import LEADERBOARD_VERSION, bump
+from users.models import Season
+from users.standings import archive_season, current_season, prune_periods
+
+
+class Command(BaseCommand):
+    help = (
+        "Kết thúc mùa hiện tại và mở mùa mới, chép bảng xếp hạng mùa cũ sang SeasonResult rồi xóa bộ đếm "
+        "theo từng lô; đồng thời xóa bộ đếm tuần/tháng quá LEADERBOARD_PERIOD_RETENTION_DAYS ngày. "
+        "Bị dừng giữa chừng thì chạy lại với --resume để chép nốt mà không mở thêm mùa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--resume", action="store_true", help="Chỉ chép nốt các mùa đã kết thúc, không mở mùa mới")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        if not options["resume"]:
+            # Mở mùa mới trước để các trận chốt từ giờ được cộng vào mùa mới
+            with transaction.atomic():
+                season = Season.objects.select_for_update().get(pk=current_season().pk)
+                now = timezone.now()
+                season.ended_at = now
+                season.save(update_fields=["ended_at"])
+                Season.objects.create(number=season.number + 1, started_at=now)
+            self.stdout.write(f"Đã kết thúc mùa {season.number}, mở mùa {season.number + 1}.")
+
+        for season in Season.objects.filter(ended_at__isnull=False, archived=False).order_by("number"):
+            players = archive_season(season, batch_size, progress=self.stdout.write)
+            self.stdout.write(f"Đã lưu bảng xếp hạng mùa {season.number} ({players} người chơi).")
+
+        before = timezone.now() - timedelta(days=settings.LEADERBOARD_PERIOD_RETENTION_DAYS)
+        pruned = prune_periods(before, batch_size)
+        bump(LEADERBOARD_VERSION)
+        self.stdout.write(self.style.SUCCESS(f"Hoàn tất chuyển mùa, đã xóa {pruned} bộ đếm tuần/tháng cũ."))
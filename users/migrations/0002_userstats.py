@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('x_wins', models.PositiveIntegerField(default=0)),
+                ('x_losses', models.PositiveIntegerField(default=0)),
+                ('x_draws', models.PositiveIntegerField(default=0)),
+                ('o_wins', models.PositiveIntegerField(default=0)),
+                ('o_losses', models.PositiveIntegerField(default=0)),
+                ('o_draws', models.PositiveIntegerField(default=0)),
+                ('by_board_size', models.JSONField(default=dict)),
+                ('current_streak', models.IntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('total_moves', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
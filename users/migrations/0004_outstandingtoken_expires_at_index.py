@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+        ('users', '0003_customuser_avatar_hash'),
+    ]
+
+    operations = [
+        # Bảng của simplejwt không có index trên expires_at, cần cho việc xóa dần token hết hạn
+        migrations.RunSQL(
+            sql='CREATE INDEX token_blacklist_outstanding_expires_idx ON token_blacklist_outstandingtoken (expires_at);',
+            reverse_sql='DROP INDEX token_blacklist_outstanding_expires_idx;',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outstandingtoken_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField(choices=[(0, 'raw'), (1, 'day'), (2, 'week')], default=0)),
+                ('time', models.DateTimeField()),
+                ('elo', models.IntegerField()),
+                ('elo_min', models.IntegerField()),
+                ('elo_max', models.IntegerField()),
+                ('games', models.PositiveIntegerField(default=1)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'time'], name='rating_point_user_time_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolution', 0), _negated=True), fields=('user', 'resolution', 'time'), name='unique_rating_rollup')],
+            },
+        ),
+    ]
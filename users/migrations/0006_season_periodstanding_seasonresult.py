@@ -0,0 +1,64 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_ratingpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Season',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(unique=True)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('archived', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PeriodStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('week', 'Tuần'), ('month', 'Tháng'), ('season', 'Mùa')], max_length=10)),
+                ('period', models.CharField(max_length=16)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('elo_gain', models.IntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'period', '-wins', '-elo_gain', 'user'], name='standing_wins_idx'), models.Index(fields=['kind', 'period', '-elo_gain', '-wins', 'user'], name='standing_elo_gain_idx'), models.Index(fields=['kind', 'period', '-points', '-elo_gain', 'user'], name='standing_points_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'period', 'user'), name='unique_period_standing')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SeasonResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('elo', models.IntegerField()),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('elo_gain', models.IntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='users.season')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['season', 'rank'], name='users_seaso_season__1087e2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('season', 'user'), name='unique_season_result')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+from users.normalize import normalize
+
+
+def fill_search_columns(apps, schema_editor):
+    """Điền tên đã chuẩn hóa cho người dùng hiện có, từng lô."""
+    CustomUser = apps.get_model('users', 'CustomUser')
+    users = []
+    for user in CustomUser.objects.only('id', 'username', 'full_name').iterator(chunk_size=1000):
+        user.username_search = normalize(user.username)
+        user.full_name_search = normalize(user.full_name)
+        users.append(user)
+        if len(users) >= 1000:
+            CustomUser.objects.bulk_update(users, ['username_search', 'full_name_search'])
+            users = []
+    CustomUser.objects.bulk_update(users, ['username_search', 'full_name_search'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_season_periodstanding_seasonresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='full_name_search',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='username_search',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+    ]
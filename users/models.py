@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from uuid import uuid4
 
+from .normalize import normalize
+
 
 class CustomUser(AbstractUser):
     # Giữ username làm định danh chính, email vẫn unique để đăng ký/khôi phục
@@ -13,6 +15,11 @@ class CustomUser(AbstractUser):
     losses = models.PositiveIntegerField(default=0, verbose_name="Số trận thua")
     draws = models.PositiveIntegerField(default=0, verbose_name="Số trận hòa")
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, verbose_name="Ảnh đại diện")
+    # Hash nội dung ảnh đã xử lý, rỗng khi ảnh mới tải lên chưa tạo xong bản thu nhỏ
+    avatar_hash = models.CharField(max_length=16, blank=True, default="")
+    # username/full_name đã bỏ dấu và chữ hoa để tìm theo tiền tố (xem search.py), cập nhật trong save()
+    username_search = models.CharField(max_length=150, blank=True, default="", db_index=True, editable=False)
+    full_name_search = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -20,8 +27,194 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.elo})"
 
+    def save(self, *args, **kwargs):
+        self.username_search = normalize(self.username)
+        self.full_name_search = normalize(self.full_name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"username", "full_name"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "username_search", "full_name_search"}
+        super().save(*args, **kwargs)
+
     @staticmethod
     def generate_username_from_email(email: str) -> str:
         local_part = email.split("@", 1)[0]
         # đảm bảo unique bằng cách gắn chuỗi ngắn ngẫu nhiên
-        return f"{local_part}_{uuid4().hex[:6]}"
\ No newline at end of file
+        return f"{local_part}_{uuid4().hex[:6]}"
+
+class UserStats(models.Model):
+    """Thống kê chi tiết, được cộng dồn khi chốt trận để không phải quét bảng Match."""
+
+    RESULT_SUFFIXES = {"win": "wins", "loss": "losses", "draw": "draws"}
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+    x_wins = models.PositiveIntegerField(default=0)
+    x_losses = models.PositiveIntegerField(default=0)
+    x_draws = models.PositiveIntegerField(default=0)
+    o_wins = models.PositiveIntegerField(default=0)
+    o_losses = models.PositiveIntegerField(default=0)
+    o_draws = models.PositiveIntegerField(default=0)
+    # {"15": {"games": n, "wins": n}, ...}
+    by_board_size = models.JSONField(default=dict)
+    # Dương: chuỗi thắng, âm: chuỗi thua, 0: vừa hòa
+    current_streak = models.IntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    total_moves = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    @property
+    def games(self) -> int:
+        return self.x_wins + self.x_losses + self.x_draws + self.o_wins + self.o_losses + self.o_draws
+
+    @property
+    def avg_game_length(self) -> float:
+        return round(self.total_moves / self.games, 1) if self.games else 0.0
+
+    def record(self, symbol: str, result: str, board_size: int, moves: int):
+        """
+        Cộng dồn một trận vào thống kê.
+
+        Args:
+            symbol: 'X' hoặc 'O'
+            result: 'win', 'loss' hoặc 'draw'
+            board_size: Kích thước bàn cờ của trận
+            moves: Tổng số nước đi của trận
+        """
+        field = f"{symbol.lower()}_{self.RESULT_SUFFIXES[result]}"
+        setattr(self, field, getattr(self, field) + 1)
+
+        size_stats = self.by_board_size.setdefault(str(board_size), {"games": 0, "wins": 0})
+        size_stats["games"] += 1
+        if result == "win":
+            size_stats["wins"] += 1
+
+        if result == "win":
+            self.current_streak = self.current_streak + 1 if self.current_streak > 0 else 1
+            self.best_streak = max(self.best_streak, self.current_streak)
+        elif result == "loss":
+            self.current_streak = self.current_streak - 1 if self.current_streak < 0 else -1
+        else:
+            self.current_streak = 0
+
+        self.total_moves += moves
+
+
+class RatingPoint(models.Model):
+    """
+    Một điểm trong lịch sử ELO (xem rating_history.py).
+
+    Điểm RAW được ghi ở mỗi lần chốt trận; điểm cũ được gộp thành DAY rồi WEEK, khi đó elo là
+    giá trị cuối kỳ, elo_min/elo_max là thấp/cao nhất trong kỳ và games là số điểm RAW đã gộp.
+    """
+
+    class Resolution(models.IntegerChoices):
+        RAW = 0, "raw"
+        DAY = 1, "day"
+        WEEK = 2, "week"
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="rating_points")
+    resolution = models.PositiveSmallIntegerField(choices=Resolution.choices, default=Resolution.RAW)
+    # RAW: thời điểm chốt trận; DAY/WEEK: đầu ngày/đầu tuần (thứ Hai) của kỳ
+    time = models.DateTimeField()
+    elo = models.IntegerField()
+    elo_min = models.IntegerField()
+    elo_max = models.IntegerField()
+    games = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Một truy vấn khoảng thời gian cho biểu đồ, mọi độ phân giải nằm chung một dãy
+            models.Index(fields=["user", "time"], name="rating_point_user_time_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "resolution", "time"],
+                condition=~models.Q(resolution=0),
+                name="unique_rating_rollup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.time:%Y-%m-%d %H:%M}: {self.elo}"
+
+
+class Season(models.Model):
+    """Mùa xếp hạng; mùa hiện tại là mùa chưa có ended_at (xem standings.py)."""
+    number = models.PositiveIntegerField(unique=True)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Bảng xếp hạng mùa đã được chép sang SeasonResult và bộ đếm của mùa đã được xóa
+    archived = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Season {self.number}"
+
+    @property
+    def key(self) -> str:
+        return f"S{self.number}"
+
+
+class PeriodStanding(models.Model):
+    """Kết quả của một người chơi trong một tuần/tháng/mùa, cộng dồn khi chốt trận."""
+
+    class Kind(models.TextChoices):
+        WEEK = "week", "Tuần"
+        MONTH = "month", "Tháng"
+        SEASON = "season", "Mùa"
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # Khóa kỳ: "2026-W43" (tuần ISO), "2026-10" (tháng), "S3" (mùa)
+    period = models.CharField(max_length=16)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="standings")
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    elo_gain = models.IntegerField(default=0)
+    # Thắng 2 điểm, hòa 1 điểm
+    points = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "period", "user"], name="unique_period_standing"),
+        ]
+        # Mỗi cách xếp hạng đọc top N thẳng từ index, không sắp xếp lúc đọc
+        indexes = [
+            models.Index(fields=["kind", "period", "-wins", "-elo_gain", "user"], name="standing_wins_idx"),
+            models.Index(fields=["kind", "period", "-elo_gain", "-wins", "user"], name="standing_elo_gain_idx"),
+            models.Index(fields=["kind", "period", "-points", "-elo_gain", "user"], name="standing_points_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.user_id}: {self.wins}/{self.games}"
+
+
+class SeasonResult(models.Model):
+    """Ảnh chụp bảng xếp hạng cuối mùa."""
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name="results")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="season_results")
+    rank = models.PositiveIntegerField()
+    elo = models.IntegerField()
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    elo_gain = models.IntegerField(default=0)
+    points = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["season", "user"], name="unique_season_result"),
+        ]
+        indexes = [
+            models.Index(fields=["season", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"{self.season_id} #{self.rank}: {self.user_id}"
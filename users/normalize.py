@@ -0,0 +1,15 @@
+"""
+Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu tiếng Việt, không phân biệt hoa thường
+
+"Nguyễn Văn Đức" -> "nguyen van duc". đ/Đ không phải chữ có dấu trong Unicode (không tách
+được bằng NFD) nên được đổi riêng.
+"""
+import unicodedata
+
+_SPECIAL = str.maketrans({"đ": "d", "Đ": "d"})
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFD", (text or "").translate(_SPECIAL))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
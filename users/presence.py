@@ -0,0 +1,88 @@
+"""
+Presence: người dùng nào đang online, theo các kết nối Socket.IO của process hiện tại
+
+Mỗi người dùng có thể mở nhiều tab (nhiều sid). Người dùng online khi còn ít nhất
+một sid. Thay đổi trạng thái được gom lại và phát theo lô (xem PRESENCE_BATCH_WINDOW);
+người vừa vào rồi ra trong cùng một cửa sổ sẽ không được phát.
+"""
+_sessions = {}  # {user_id: {sid, ...}}
+_users = {}     # {sid: user_id}
+# Trạng thái của người dùng tại lần phát gần nhất, chỉ lưu người có thay đổi từ đó tới nay
+_changed = {}   # {user_id: online_before}
+
+
+def _mark(user_id: int, online_before: bool):
+    _changed.setdefault(user_id, online_before)
+
+
+def add_session(user_id: int, sid: str) -> bool:
+    """Ghi nhận kết nối mới; True nếu người dùng vừa chuyển sang online."""
+    sids = _sessions.setdefault(user_id, set())
+    came_online = not sids
+    sids.add(sid)
+    _users[sid] = user_id
+    if came_online:
+        _mark(user_id, False)
+    return came_online
+
+
+def remove_session(sid: str):
+    """
+    Bỏ một kết nối.
+
+    Returns:
+        (user_id, went_offline); user_id là None nếu sid không thuộc người dùng nào
+    """
+    user_id = _users.pop(sid, None)
+    if user_id is None:
+        return None, False
+    sids = _sessions.get(user_id, set())
+    sids.discard(sid)
+    if sids:
+        return user_id, False
+    _sessions.pop(user_id, None)
+    _mark(user_id, True)
+    return user_id, True
+
+
+def user_for(sid: str):
+    """user_id của kết nối, None nếu chưa xác thực."""
+    return _users.get(sid)
+
+
+def sids_for(user_id: int) -> set:
+    """Các sid đang mở của người dùng (bản sao)."""
+    return set(_sessions.get(user_id, ()))
+
+
+def is_online(user_id: int) -> bool:
+    return user_id in _sessions
+
+
+def online_count() -> int:
+    return len(_sessions)
+
+
+def online_user_ids() -> list:
+    return list(_sessions)
+
+
+def has_changes() -> bool:
+    return bool(_changed)
+
+
+def pop_changes() -> dict:
+    """
+    Lấy và xóa các thay đổi từ lần phát trước.
+
+    Returns:
+        {"online": [user_id, ...], "offline": [user_id, ...]}, chỉ gồm người có trạng thái
+        khác với lần phát trước
+    """
+    online, offline = [], []
+    for user_id, online_before in _changed.items():
+        now = user_id in _sessions
+        if now != online_before:
+            (online if now else offline).append(user_id)
+    _changed.clear()
+    return {"online": online, "offline": offline}
@@ -0,0 +1,132 @@
+"""
+Rating history: chuỗi ELO theo thời gian cho biểu đồ hồ sơ, điểm cũ được gộp để dung lượng có giới hạn
+
+- Mỗi lần chốt trận ghi một điểm RAW cho mỗi người chơi (record).
+- compact gộp điểm RAW cũ hơn RATING_HISTORY_RAW_DAYS ngày thành điểm DAY, điểm DAY cũ hơn
+  RATING_HISTORY_DAY_DAYS ngày thành điểm WEEK; số dòng của một người chơi vì vậy tăng theo
+  thời gian chứ không theo số trận đã chơi.
+- series đọc mọi điểm trong khoảng bằng một truy vấn trên index (user, time) rồi gom theo độ
+  phân giải yêu cầu; phần đã bị gộp thô hơn độ phân giải yêu cầu được trả nguyên.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RatingPoint
+
+RAW = RatingPoint.Resolution.RAW
+DAY = RatingPoint.Resolution.DAY
+WEEK = RatingPoint.Resolution.WEEK
+RESOLUTIONS = {"raw": RAW, "day": DAY, "week": WEEK}
+
+_FIELDS = ("resolution", "time", "elo", "elo_min", "elo_max", "games")
+
+
+def record(ratings: dict, at=None):
+    """Ghi điểm RAW {user_id: ELO mới}; gọi trong transaction chốt trận."""
+    at = at or timezone.now()
+    RatingPoint.objects.bulk_create([
+        RatingPoint(user_id=user_id, time=at, elo=elo, elo_min=elo, elo_max=elo)
+        for user_id, elo in ratings.items()
+    ])
+
+
+def period_start(value, resolution):
+    """Đầu kỳ chứa thời điểm value: đầu ngày hoặc đầu tuần (thứ Hai) theo giờ địa phương."""
+    if resolution == RAW:
+        return value
+    day = timezone.localtime(value).date()
+    if resolution == WEEK:
+        day -= timedelta(days=day.weekday())
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def downsample(rows, resolution) -> list:
+    """
+    Gom các điểm (theo thứ tự thời gian) thành một điểm mỗi kỳ của resolution.
+
+    Args:
+        rows: Các tuple theo _FIELDS
+    """
+    points = []
+    for row_resolution, time, elo, elo_min, elo_max, games in rows:
+        start = time if row_resolution >= resolution else period_start(time, resolution)
+        if points and points[-1]["time"] == start:
+            last = points[-1]
+            last["elo"] = elo
+            last["min"] = min(last["min"], elo_min)
+            last["max"] = max(last["max"], elo_max)
+            last["games"] += games
+        else:
+            points.append({"time": start, "elo": elo, "min": elo_min, "max": elo_max, "games": games})
+    return points
+
+
+def _range(user_id: int, days: int):
+    since = timezone.now() - timedelta(days=days)
+    return RatingPoint.objects.filter(user_id=user_id, time__gte=since).order_by("time", "id").values_list(*_FIELDS)
+
+
+def series(user_id: int, resolution, days: int) -> list:
+    """Chuỗi ELO trong days ngày gần nhất ở độ phân giải resolution."""
+    return downsample(_range(user_id, days), resolution)
+
+
+async def aseries(user_id: int, resolution, days: int) -> list:
+    return downsample([row async for row in _range(user_id, days)], resolution)
+
+
+def _rollup(user_id: int, source, target, cutoff) -> int:
+    """Gộp các điểm source trước cutoff thành điểm target; trả về số dòng giảm đi."""
+    with transaction.atomic():
+        rows = list(
+            RatingPoint.objects.select_for_update()
+            .filter(user_id=user_id, resolution=source, time__lt=cutoff)
+            .order_by("time", "id")
+            .values_list("id", *_FIELDS)
+        )
+        if not rows:
+            return 0
+        merged = downsample([row[1:] for row in rows], target)
+        existing = {
+            point.time: point
+            for point in RatingPoint.objects.select_for_update().filter(
+                user_id=user_id, resolution=target, time__in=[point["time"] for point in merged]
+            )
+        }
+        created, updated = [], []
+        for point in merged:
+            rollup = existing.get(point["time"])
+            if rollup is None:
+                created.append(RatingPoint(
+                    user_id=user_id, resolution=target, time=point["time"], elo=point["elo"],
+                    elo_min=point["min"], elo_max=point["max"], games=point["games"],
+                ))
+                continue
+            # Kỳ đã được gộp một phần ở lần trước (vd điểm từ backfill tới muộn)
+            rollup.elo = point["elo"]
+            rollup.elo_min = min(rollup.elo_min, point["min"])
+            rollup.elo_max = max(rollup.elo_max, point["max"])
+            rollup.games += point["games"]
+            updated.append(rollup)
+        RatingPoint.objects.filter(id__in=[row[0] for row in rows]).delete()
+        RatingPoint.objects.bulk_create(created)
+        RatingPoint.objects.bulk_update(updated, ["elo", "elo_min", "elo_max", "games"])
+    return len(rows) - len(created)
+
+
+def cutoffs(now=None) -> tuple:
+    """(mốc gộp RAW -> DAY, mốc gộp DAY -> WEEK), căn theo đầu kỳ để không gộp dở một kỳ."""
+    now = now or timezone.now()
+    return (
+        period_start(now - timedelta(days=settings.RATING_HISTORY_RAW_DAYS), DAY),
+        period_start(now - timedelta(days=settings.RATING_HISTORY_DAY_DAYS), WEEK),
+    )
+
+
+def compact(user_id: int, now=None) -> int:
+    """Gộp lịch sử cũ của một người chơi; trả về số dòng đã giảm."""
+    raw_cutoff, day_cutoff = cutoffs(now)
+    return _rollup(user_id, RAW, DAY, raw_cutoff) + _rollup(user_id, DAY, WEEK, day_cutoff)
@@ -0,0 +1,186 @@
+"""
+Player search: tìm người chơi theo tiền tố username/full_name, không phân biệt hoa thường và dấu
+
+Tên được chuẩn hóa bằng normalize ("Nguyễn Văn Đức" -> "nguyen van duc") và lưu ở các cột
+username_search/full_name_search có index. Autocomplete đọc một chỉ mục trong bộ nhớ: ba
+danh sách khóa đã sắp xếp cho username, họ tên đầy đủ và phần họ tên tính từ mỗi từ sau
+("van duc", "duc") để gõ tên gọi cũng tìm được; tìm tiền tố bằng bisect.
+
+Mỗi danh sách khóa được chia thành các khối INDEX_BLOCK phần tử, mỗi khối giữ thêm các vị trí
+của nó xếp theo ELO giảm dần. Các khóa có cùng tiền tố là một đoạn liên tiếp nên CANDIDATES
+người ELO cao nhất của đoạn được lấy bằng cách trộn các khối nằm trong đoạn (heapq.merge),
+không phải duyệt cả đoạn, kể cả với tiền tố có rất nhiều người như "nguyen".
+
+Chỉ mục được dựng lại trong thread khi USER_DIRECTORY_VERSION đổi (đăng ký, sửa hồ sơ), tối
+đa một lần mỗi USER_SEARCH_INDEX_REFRESH giây, và ít nhất mỗi MAX_INDEX_AGE giây; ELO trong
+chỉ mục là ảnh chụp lúc dựng, chỉ dùng để chọn ứng viên. Kết quả được xếp lại theo ELO hiện
+tại đọc từ DB theo khóa chính, trạng thái online từ presence. Khi chưa có chỉ mục (vừa khởi
+động) request được trả lời bằng truy vấn khoảng trên hai cột đã chuẩn hóa.
+"""
+import asyncio
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+
+from . import presence
+from .cache import USER_DIRECTORY_VERSION, bump, current_version
+from .models import CustomUser
+from .normalize import normalize
+
+MAX_INDEX_AGE = 300
+CANDIDATES = 50  # Số user_id ELO cao nhất lấy từ chỉ mục trước khi xếp lại theo ELO hiện tại
+INDEX_BLOCK = 512  # Số khóa mỗi khối được xếp sẵn theo ELO
+
+# Thứ tự ưu tiên của loại khớp
+USERNAME, FULL_NAME, WORD = 0, 1, 2
+
+_END = "\U0010ffff"
+_lock = threading.Lock()
+_index = None
+_rebuild_task = None
+
+
+def invalidate():
+    """Báo danh sách người chơi đã đổi tên/thêm người; gọi sau khi đăng ký hoặc sửa hồ sơ."""
+    bump(USER_DIRECTORY_VERSION)
+
+
+class PlayerIndex:
+    """Ảnh chụp tên người chơi đã chuẩn hóa; không đổi sau khi dựng, được thay nguyên khối."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        entries = ([], [], [])  # Theo loại khớp: USERNAME, FULL_NAME, WORD
+        for user_id, username, full_name, elo in rows:
+            entries[USERNAME].append((username, user_id, elo))
+            words = full_name.split()
+            for start in range(len(words)):
+                entries[FULL_NAME if start == 0 else WORD].append((" ".join(words[start:]), user_id, elo))
+        self.keys = []
+        self.ids = []
+        # blocks[kind][b]: [(-elo, vị trí)] của các vị trí trong khối b, ELO cao trước
+        self.blocks = []
+        for kind_entries in entries:
+            kind_entries.sort()
+            self.keys.append([key for key, _, _ in kind_entries])
+            self.ids.append([user_id for _, user_id, _ in kind_entries])
+            self.blocks.append([
+                sorted((-elo, position) for position, (_, _, elo) in enumerate(kind_entries[start:start + INDEX_BLOCK], start))
+                for start in range(0, len(kind_entries), INDEX_BLOCK)
+            ])
+
+    def _by_elo(self, kind: int, lo: int, hi: int):
+        """Các vị trí trong đoạn [lo, hi) của loại kind, ELO cao trước."""
+        blocks = self.blocks[kind]
+        runs = []
+        for b in range(lo // INDEX_BLOCK, (hi - 1) // INDEX_BLOCK + 1):
+            if lo <= b * INDEX_BLOCK and (b + 1) * INDEX_BLOCK <= hi:
+                runs.append(blocks[b])
+            else:
+                # Khối ở hai đầu đoạn chỉ nằm trong đoạn một phần
+                runs.append([item for item in blocks[b] if lo <= item[1] < hi])
+        return (position for _, position in heapq.merge(*runs))
+
+    def search(self, query: str, limit: int) -> list:
+        """
+        Tối đa limit (user_id, loại khớp) có tiền tố query (đã chuẩn hóa): loại khớp ưu tiên hơn
+        trước, trong cùng loại ELO (lúc dựng chỉ mục) cao trước.
+
+        Mỗi loại chỉ trộn các khối nằm trong đoạn khớp tiền tố nên thời gian tăng theo số khối
+        của đoạn, không theo số người có cùng tiền tố (vd "nguyen").
+        """
+        found = {}
+        for kind in (USERNAME, FULL_NAME, WORD):
+            keys, ids = self.keys[kind], self.ids[kind]
+            lo = bisect_left(keys, query)
+            hi = bisect_left(keys, query + _END, lo)
+            if lo == hi:
+                continue
+            for position in self._by_elo(kind, lo, hi):
+                found.setdefault(ids[position], kind)
+                if len(found) >= limit:
+                    return list(found.items())
+        return list(found.items())
+
+
+def _fresh(index) -> bool:
+    if index is None:
+        return False
+    age = time.monotonic() - index.built_at
+    return age < MAX_INDEX_AGE and (
+        age < settings.USER_SEARCH_INDEX_REFRESH or index.version == current_version(USER_DIRECTORY_VERSION)
+    )
+
+
+def rebuild():
+    global _index
+    with _lock:
+        if _fresh(_index):
+            return
+        version = current_version(USER_DIRECTORY_VERSION)
+        rows = CustomUser.objects.filter(is_active=True).values_list("id", "username_search", "full_name_search", "elo")
+        _index = PlayerIndex(rows.iterator(chunk_size=2000), version)
+
+
+def _schedule_rebuild():
+    global _rebuild_task
+    if _rebuild_task is None or _rebuild_task.done():
+        _rebuild_task = asyncio.get_running_loop().create_task(sync_to_async(rebuild, thread_sensitive=False)())
+
+
+async def _candidates_from_db(query: str, limit: int) -> list:
+    """
+    Truy vấn khoảng [query, query + U+10FFFF) dùng được index B-tree thường ở mọi DB, ELO cao trước;
+    khớp username trước rồi mới tới họ tên.
+    """
+    found = {}
+    for kind, column in ((USERNAME, "username_search"), (FULL_NAME, "full_name_search")):
+        rows = (
+            CustomUser.objects.filter(is_active=True)
+            .filter(Q(**{f"{column}__gte": query, f"{column}__lt": query + _END}))
+            .order_by("-elo", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        async for user_id in rows:
+            found.setdefault(user_id, kind)
+        if len(found) >= limit:
+            break
+    return list(found.items())[:limit]
+
+
+async def asearch(text: str, limit: int) -> list:
+    """
+    Tìm người chơi theo tiền tố, ưu tiên khớp username, rồi họ tên, rồi tên gọi; cùng loại thì ELO cao trước.
+
+    Returns:
+        Danh sách CustomUser (chỉ các cột cần cho kết quả) kèm thuộc tính is_online
+    """
+    query = normalize(text)
+    if not query:
+        # Chuỗi rỗng là tiền tố của mọi khóa: không trả về cả danh sách người chơi
+        return []
+    index = _index
+    if _fresh(index):
+        candidates = index.search(query, CANDIDATES)
+    else:
+        _schedule_rebuild()
+        candidates = index.search(query, CANDIDATES) if index is not None else await _candidates_from_db(query, CANDIDATES)
+    if not candidates:
+        return []
+
+    kinds = dict(candidates)
+    users = [
+        user async for user in CustomUser.objects.filter(id__in=kinds, is_active=True).only(
+            "id", "username", "full_name", "elo", "avatar", "avatar_hash"
+        )
+    ]
+    users.sort(key=lambda user: (kinds[user.id], -user.elo, user.username))
+    for user in users[:limit]:
+        user.is_online = presence.is_online(user.id)
+    return users[:limit]
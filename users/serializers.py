@@ -1,8 +1,10 @@
-from django.contrib.auth import authenticate
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 
-from .models import CustomUser
+from .avatars import AVATAR_LIST_SIZE, AVATAR_PROFILE_SIZE, avatar_url, schedule_avatar_processing, schedule_variant_cleanup
+from .models import CustomUser, UserStats
+from .tokens import FilteredRefreshToken
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -21,34 +23,34 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop("confirm_password")
         password = validated_data.pop("password")
+        # Hash có thể được tính sẵn ở pool băm mật khẩu (xem users/hashing.py)
+        password_hash = validated_data.pop("password_hash", None)
         email = validated_data.get("email")
         username = CustomUser.generate_username_from_email(email)
-        user = CustomUser.objects.create(username=username, **validated_data)
-        user.set_password(password)
+        user = CustomUser(username=username, **validated_data)
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save()
         return user
 
 
 class LoginSerializer(serializers.Serializer):
+    """Chỉ kiểm tra định dạng; việc so mật khẩu chạy ở pool băm (xem LoginView)."""
+
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
-    access = serializers.CharField(read_only=True)
-    refresh = serializers.CharField(read_only=True)
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
 
     def validate(self, attrs):
-        email = attrs.get("email")
-        password = attrs.get("password")
-
-        user = authenticate(username=email, password=password)
-        if not user:
-            raise serializers.ValidationError("Email hoặc mật khẩu không đúng.")
-        if not user.is_active:
-            raise serializers.ValidationError("Tài khoản đã bị vô hiệu hóa.")
-
-        tokens = RefreshToken.for_user(user)
-        attrs["access"] = str(tokens.access_token)
-        attrs["refresh"] = str(tokens)
-        return attrs
+        try:
+            return super().validate(attrs)
+        except TokenError as exc:
+            raise serializers.ValidationError({"refresh": [str(exc)]})
 
 
 class UserMeSerializer(serializers.ModelSerializer):
@@ -57,44 +59,62 @@ class UserMeSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "wins", "losses", "elo"]
 
 
+class UserStatsSerializer(serializers.ModelSerializer):
+    games = serializers.IntegerField(read_only=True)
+    avg_game_length = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UserStats
+        fields = [
+            "games",
+            "x_wins",
+            "x_losses",
+            "x_draws",
+            "o_wins",
+            "o_losses",
+            "o_draws",
+            "by_board_size",
+            "current_streak",
+            "best_streak",
+            "avg_game_length",
+        ]
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    stats = UserStatsSerializer(read_only=True)
 
     class Meta:
         model = CustomUser
-        fields = ["id", "full_name", "username", "email", "wins", "losses", "draws", "elo", "avatar"]
+        fields = ["id", "full_name", "username", "email", "wins", "losses", "draws", "elo", "avatar", "stats"]
 
     def get_avatar(self, obj):
         request = self.context.get("request") if hasattr(self, "context") else None
-        if obj.avatar:
-            url = obj.avatar.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
-        return None
+        return avatar_url(obj, AVATAR_PROFILE_SIZE, request)
 
 
 class LeaderboardSerializer(serializers.ModelSerializer):
+    avatar = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
-        fields = ["id", "full_name", "elo", "wins", "losses", "draws"]
+        fields = ["id", "full_name", "elo", "wins", "losses", "draws", "avatar"]
+
+    def get_avatar(self, obj):
+        return avatar_url(obj, AVATAR_LIST_SIZE, self.context.get("request"))
 
 
 class PublicProfileSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    stats = UserStatsSerializer(read_only=True)
 
     class Meta:
         model = CustomUser
-        fields = ["username", "elo", "wins", "losses", "draws", "avatar", "full_name"]
+        fields = ["username", "elo", "wins", "losses", "draws", "avatar", "full_name", "stats"]
 
     def get_avatar(self, obj):
         request = self.context.get("request") if hasattr(self, "context") else None
-        if obj.avatar:
-            url = obj.avatar.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
-        return None
+        return avatar_url(obj, AVATAR_PROFILE_SIZE, request)
 
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
@@ -112,3 +132,16 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         if value and CustomUser.objects.exclude(pk=user.pk).filter(email=value).exists():
             raise serializers.ValidationError("Email đã được sử dụng.")
         return value
+
+    def update(self, instance, validated_data):
+        avatar_changed = "avatar" in validated_data
+        old_digest = instance.avatar_hash
+        if avatar_changed:
+            validated_data["avatar_hash"] = ""
+        instance = super().update(instance, validated_data)
+        if avatar_changed and instance.avatar:
+            # Ảnh gốc được xử lý ở worker nền, trong lúc chờ vẫn trả về ảnh gốc
+            schedule_avatar_processing(instance.id)
+        if avatar_changed and old_digest:
+            schedule_variant_cleanup(old_digest)
+        return instance
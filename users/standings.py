@@ -0,0 +1,136 @@
+"""
+Periodic leaderboards: bảng xếp hạng theo tuần, tháng và mùa, cộng dồn khi chốt trận
+
+Mỗi người chơi có một dòng PeriodStanding cho mỗi kỳ có chơi, được cộng bằng F() trong
+transaction chốt trận. Kỳ tuần/tháng chuyển tự nhiên theo khóa kỳ của thời điểm chốt; mùa
+chỉ đổi khi lệnh rollover_season chạy: kết thúc mùa hiện tại, chép bảng xếp hạng sang
+SeasonResult rồi xóa bộ đếm theo từng lô. Không request nào phải gộp bảng Match.
+"""
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PeriodStanding, Season, SeasonResult
+
+WEEK = PeriodStanding.Kind.WEEK
+MONTH = PeriodStanding.Kind.MONTH
+SEASON = PeriodStanding.Kind.SEASON
+
+# Cách xếp hạng: cột chính rồi các cột phụ khi bằng nhau
+ORDERINGS = {
+    "wins": ("-wins", "-elo_gain", "user_id"),
+    "elo_gain": ("-elo_gain", "-wins", "user_id"),
+    "points": ("-points", "-elo_gain", "user_id"),
+}
+DEFAULT_ORDER = {WEEK: "wins", MONTH: "elo_gain", SEASON: "points"}
+
+RESULT_POINTS = {"win": 2, "draw": 1, "loss": 0}
+RESULT_FIELDS = {"win": "wins", "loss": "losses", "draw": "draws"}
+
+
+def week_key(at) -> str:
+    year, week, _ = timezone.localtime(at).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(at) -> str:
+    return f"{timezone.localtime(at):%Y-%m}"
+
+
+def current_season() -> Season:
+    """Mùa đang diễn ra; tạo mùa 1 nếu chưa có mùa nào."""
+    season = Season.objects.filter(ended_at__isnull=True).order_by("-number").first()
+    if season is None:
+        season, _ = Season.objects.get_or_create(number=1, defaults={"started_at": timezone.now()})
+    return season
+
+
+async def acurrent_season() -> Season:
+    season = await Season.objects.filter(ended_at__isnull=True).order_by("-number").afirst()
+    if season is None:
+        season, _ = await Season.objects.aget_or_create(number=1, defaults={"started_at": timezone.now()})
+    return season
+
+
+def record(results: dict, at=None):
+    """
+    Cộng kết quả trận vào các kỳ hiện tại; gọi trong transaction chốt trận.
+
+    Args:
+        results: {user_id: (kết quả 'win'/'loss'/'draw', ELO thay đổi)}
+        at: Thời điểm chốt, quyết định tuần/tháng
+    """
+    at = at or timezone.now()
+    periods = ((WEEK, week_key(at)), (MONTH, month_key(at)), (SEASON, current_season().key))
+    PeriodStanding.objects.bulk_create(
+        [PeriodStanding(kind=kind, period=period, user_id=user_id) for kind, period in periods for user_id in results],
+        ignore_conflicts=True,
+    )
+    in_periods = Q()
+    for kind, period in periods:
+        in_periods |= Q(kind=kind, period=period)
+    for user_id, (result, elo_change) in results.items():
+        field = RESULT_FIELDS[result]
+        PeriodStanding.objects.filter(in_periods, user_id=user_id).update(
+            games=F("games") + 1,
+            **{field: F(field) + 1},
+            elo_gain=F("elo_gain") + elo_change,
+            points=F("points") + RESULT_POINTS[result],
+        )
+
+
+def _delete_batched(queryset, batch_size: int) -> int:
+    """Xóa theo từng lô id để mỗi câu DELETE ngắn, không khóa bảng lâu."""
+    deleted = last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        last_id = ids[-1]
+        deleted += PeriodStanding.objects.filter(id__in=ids).delete()[0]
+
+
+def archive_season(season: Season, batch_size: int, progress=None) -> int:
+    """
+    Chép bảng xếp hạng của một mùa đã kết thúc sang SeasonResult rồi xóa bộ đếm, từng lô.
+
+    Chạy lại được nếu bị dừng giữa chừng: bản chép dở được xóa và chép lại, bộ đếm chỉ bị
+    xóa sau khi đã chép xong.
+
+    Returns:
+        Số người chơi trong bảng xếp hạng mùa
+    """
+    SeasonResult.objects.filter(season=season).delete()
+    standings = (
+        PeriodStanding.objects.filter(kind=SEASON, period=season.key)
+        .order_by(*ORDERINGS[DEFAULT_ORDER[SEASON]])
+        .values_list("user_id", "user__elo", "games", "wins", "losses", "draws", "elo_gain", "points")
+    )
+    results = []
+    rank = 0
+    for user_id, elo, games, wins, losses, draws, elo_gain, points in standings.iterator(chunk_size=batch_size):
+        rank += 1
+        results.append(SeasonResult(
+            season=season, user_id=user_id, rank=rank, elo=elo, games=games,
+            wins=wins, losses=losses, draws=draws, elo_gain=elo_gain, points=points,
+        ))
+        if len(results) >= batch_size:
+            SeasonResult.objects.bulk_create(results)
+            results = []
+            if progress:
+                progress(f"Đã lưu {rank} kết quả mùa {season.number}...")
+    SeasonResult.objects.bulk_create(results)
+
+    _delete_batched(PeriodStanding.objects.filter(kind=SEASON, period=season.key), batch_size)
+    season.archived = True
+    season.save(update_fields=["archived"])
+    return rank
+
+
+def prune_periods(before, batch_size: int) -> int:
+    """Xóa bộ đếm tuần/tháng của các kỳ kết thúc trước thời điểm before."""
+    return _delete_batched(
+        PeriodStanding.objects.filter(
+            Q(kind=WEEK, period__lt=week_key(before)) | Q(kind=MONTH, period__lt=month_key(before))
+        ),
+        batch_size,
+    )
@@ -1,3 +1,304 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+
+from . import avatars, hashing, presence, rating_history, search, standings
+from .avatars import AVATAR_LIST_SIZE, avatar_url, variant_path
+from .cache import bump_users
+from .models import PeriodStanding, RatingPoint, Season, SeasonResult
+from .tokens import FilteredRefreshToken
+
+
+def make_user(name: str, **fields):
+    return get_user_model().objects.create_user(
+        email=f"{name}@example.com", password="matkhau123", username=name, full_name=name, **fields
+    )
+
+
+class AvatarVariantTests(TestCase):
+    digest = "0123456789abcdef"
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        for ext in ("webp", "jpg"):
+            default_storage.save(variant_path(self.digest, AVATAR_LIST_SIZE, ext), ContentFile(ext.encode()))
+        self.user = make_user("an", avatar=variant_path(self.digest, 256, "jpg"), avatar_hash=self.digest)
+        self.url = avatar_url(self.user, AVATAR_LIST_SIZE)
+
+    def test_negotiates_format_from_accept(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/avif,image/webp,*/*")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(b"".join(response.streaming_content), b"webp")
+        self.assertIn("Accept", response["Vary"])
+
+        response = self.client.get(self.url, HTTP_ACCEPT="image/png,image/*")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(b"".join(response.streaming_content), b"jpg")
+
+    def test_explicit_extension_and_conditional_get(self):
+        response = self.client.get(f"{self.url}.jpg", HTTP_ACCEPT="image/webp")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.client.get(f"{self.url}.jpg", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_variant_is_404(self):
+        self.assertEqual(self.client.get(f"/media/avatars/v/{'f' * 16}/64").status_code, 404)
+        self.assertEqual(self.client.get(f"/media/avatars/v/{self.digest}/65").status_code, 404)
+
+    def upload(self, user, color: str):
+        """Đổi ảnh đại diện qua API; worker nền chạy ngay trong test."""
+        buffer = BytesIO()
+        Image.new("RGB", (300, 300), color).save(buffer, "PNG")
+        client = APIClient()
+        client.force_authenticate(user)
+        self.enterContext(mock.patch.object(avatars._executor, "submit", lambda func, *args: func(*args)))
+        self.enterContext(mock.patch.object(avatars, "close_old_connections"))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(
+                "/api/users/profile/", {"avatar": SimpleUploadedFile("a.png", buffer.getvalue())}, format="multipart"
+            )
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        return user.avatar_hash
+
+    def test_new_avatar_deletes_old_variants_unless_shared(self):
+        old = [variant_path(self.digest, AVATAR_LIST_SIZE, ext) for ext in ("webp", "jpg")]
+        other = make_user("binh", avatar=self.user.avatar.name, avatar_hash=self.digest)
+
+        first = self.upload(self.user, "red")
+        self.assertNotEqual(first, self.digest)
+        self.assertTrue(all(default_storage.exists(path) for path in old))
+
+        self.upload(other, "blue")
+        self.assertFalse(any(default_storage.exists(path) for path in old))
+        self.assertTrue(default_storage.exists(variant_path(first, AVATAR_LIST_SIZE, "webp")))
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("an")
+        self.url = f"/api/users/{self.user.id}/"
+
+    def test_etag_decides_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        bump_users(self.user.id)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_alone_never_returns_stale_304(self):
+        response = self.client.get(self.url)
+        # Lần đổi nằm trong cùng giây với Last-Modified client đang giữ
+        bump_users(self.user.id)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(4102444800))
+        self.assertEqual(response.status_code, 200)
+
+
+def _shutdown_hash_pool():
+    if hashing._executor is not None:
+        hashing._executor.shutdown(cancel_futures=True)
+        hashing._executor = None
+
+
+class PasswordHashPoolTests(SimpleTestCase):
+    async def test_recovers_after_worker_dies(self):
+        self.addCleanup(_shutdown_hash_pool)
+        encoded = await hashing.ahash_password("matkhau123")
+        broken = hashing._executor
+        for process in list(broken._processes.values()):
+            process.kill()
+
+        self.assertTrue(await hashing.acheck_password("matkhau123", encoded))
+        self.assertIsNot(hashing._executor, broken)
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.addCleanup(_shutdown_hash_pool)
+        self.user = make_user("an")
+
+    def login(self, password: str):
+        return self.client.post(
+            "/api/auth/login/", {"email": self.user.email, "password": password}, content_type="application/json"
+        )
+
+    def test_inactive_account_gets_generic_error(self):
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        wrong, right = self.login("sai-mat-khau"), self.login("matkhau123")
+        self.assertEqual(right.status_code, 400)
+        self.assertEqual(right.json(), wrong.json())
+
+    def test_active_account_gets_tokens(self):
+        response = self.login("matkhau123")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("refresh_token", response.json())
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        self.user = make_user("an")
+
+    def refresh(self, token: str):
+        return self.client.post("/api/auth/refresh/", {"refresh": token}, content_type="application/json")
+
+    def test_logout_revokes_refresh_token_without_shared_cache(self):
+        token = str(FilteredRefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.client.post("/api/auth/logout/", {"refresh_token": token}, content_type="application/json").status_code, 200)
+        # Cache riêng từng process không được dùng để bỏ qua DB: bỏ cả cache vẫn bị từ chối
+        cache.clear()
+        self.assertEqual(self.refresh(token).status_code, 400)
+
+    def test_shared_cache_skips_db_only_for_tokens_not_revoked(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "tokens": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir},
+        }
+        with override_settings(CACHES=shared, TOKEN_BLACKLIST_CACHE_ALIAS="tokens"):
+            revoked, valid = FilteredRefreshToken.for_user(self.user), FilteredRefreshToken.for_user(self.user)
+            revoked.blacklist()
+            FilteredRefreshToken(str(valid))  # Nạp bộ lọc
+            with self.assertNumQueries(0):
+                FilteredRefreshToken(str(valid))
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(str(revoked))
+
+            # Cache bị xóa (vd Redis khởi động lại): bộ lọc được nạp lại từ DB
+            caches["tokens"].clear()
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(str(revoked))
+
+
+class PlayerIndexTests(SimpleTestCase):
+    def build(self, rows):
+        return search.PlayerIndex(rows, version=0)
+
+    def test_common_prefix_returns_highest_elo_not_first_alphabetically(self):
+        # Tên xếp sau theo bảng chữ cái có ELO cao hơn: lấy theo thứ tự tên sẽ trả về người yếu nhất
+        rows = [(i, f"nguyen{i:04d}", f"nguyen van {i:04d}", 1000 + i) for i in range(1, 2001)]
+        for block in (search.INDEX_BLOCK, 7):
+            with self.subTest(block=block), mock.patch.object(search, "INDEX_BLOCK", block):
+                found = self.build(rows).search("nguyen", 10)
+                self.assertEqual(found, [(i, search.USERNAME) for i in range(2000, 1990, -1)])
+
+    def test_match_kind_ranks_before_elo(self):
+        rows = [(1, "an", "tran binh", 900), (2, "zed", "an nguyen", 2000), (3, "khoa", "le an", 3000)]
+        found = self.build(rows).search("an", 3)
+        self.assertEqual(found, [(1, search.USERNAME), (2, search.FULL_NAME), (3, search.WORD)])
+        self.assertEqual(self.build(rows).search("binh", 3), [(1, search.WORD)])
+        self.assertEqual(self.build(rows).search("x", 3), [])
+
+    async def test_query_that_normalizes_to_nothing_matches_nobody(self):
+        index = self.build([(1, "an", "tran binh", 900)])
+        self.assertEqual(index.search("", 3), [(1, search.USERNAME)])
+        with mock.patch.object(search, "_index", index):
+            self.assertEqual(await search.asearch("\u0301\u0303", 10), [])
+        response = await self.async_client.get("/api/users/search/", {"q": "\u0301"})
+        self.assertEqual(response.status_code, 400)
+
+
+class RatingHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("an")
+
+    def test_compact_rolls_old_points_into_days_and_keeps_the_series(self):
+        now = timezone.now()
+        old_day = rating_history.period_start(now - timedelta(days=40), RatingPoint.Resolution.DAY)
+        for hour, elo in ((1, 1010), (2, 990), (3, 1020)):
+            rating_history.record({self.user.id: elo}, old_day + timedelta(hours=hour))
+        rating_history.record({self.user.id: 1030}, now)
+
+        self.assertEqual(rating_history.compact(self.user.id, now), 2)
+        day = RatingPoint.objects.get(user=self.user, resolution=RatingPoint.Resolution.DAY)
+        self.assertEqual((day.elo, day.elo_min, day.elo_max, day.games), (1020, 990, 1020, 3))
+
+        response = self.client.get(f"/api/users/{self.user.id}/rating-history/", {"resolution": "raw", "days": 60})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([point["elo"] for point in response.json()["points"]], [1020, 1030])
+
+
+class SeasonRolloverTests(TestCase):
+    def test_rollover_archives_ranking_and_clears_season_counters(self):
+        first, second = make_user("an"), make_user("binh")
+        standings.record({first.id: ("win", 16), second.id: ("loss", -16)})
+        standings.record({first.id: ("draw", 0), second.id: ("draw", 0)})
+
+        call_command("rollover_season", stdout=StringIO())
+
+        season = Season.objects.get(number=1)
+        self.assertTrue(season.archived)
+        self.assertEqual(Season.objects.get(ended_at__isnull=True).number, 2)
+        results = list(SeasonResult.objects.filter(season=season).order_by("rank").values_list("user_id", "points"))
+        self.assertEqual(results, [(first.id, 3), (second.id, 1)])
+        self.assertFalse(PeriodStanding.objects.filter(kind=PeriodStanding.Kind.SEASON).exists())
+        # Bộ đếm tuần/tháng của kỳ hiện tại vẫn giữ nguyên
+        self.assertEqual(PeriodStanding.objects.filter(kind=PeriodStanding.Kind.WEEK).count(), 2)
+
+
+class PresenceTests(SimpleTestCase):
+    user_id = 9001
+
+    def setUp(self):
+        presence.pop_changes()
+        self.addCleanup(presence.pop_changes)
+
+    def connect(self, *sids) -> list:
+        for sid in sids:
+            self.addCleanup(presence.remove_session, sid)
+        return [presence.add_session(self.user_id, sid) for sid in sids]
+
+    def test_user_stays_online_until_last_tab_closes(self):
+        self.assertEqual(self.connect("tab-1", "tab-2"), [True, False])
+        self.assertEqual(presence.sids_for(self.user_id), {"tab-1", "tab-2"})
+
+        self.assertEqual(presence.remove_session("tab-1"), (self.user_id, False))
+        self.assertTrue(presence.is_online(self.user_id))
+        self.assertEqual(presence.remove_session("tab-2"), (self.user_id, True))
+        self.assertFalse(presence.is_online(self.user_id))
+        self.assertEqual(presence.remove_session("tab-2"), (None, False))
+
+    def test_changes_are_coalesced_per_batch(self):
+        self.connect("tab-1", "tab-2")
+        self.assertEqual(presence.pop_changes(), {"online": [self.user_id], "offline": []})
+        self.assertFalse(presence.has_changes())
+
+        # Ra rồi vào lại trong cùng một cửa sổ: trạng thái không đổi so với lần phát trước
+        presence.remove_session("tab-1")
+        presence.remove_session("tab-2")
+        self.connect("tab-3")
+        self.assertEqual(presence.pop_changes(), {"online": [], "offline": []})
+
+        presence.remove_session("tab-3")
+        self.assertEqual(presence.pop_changes(), {"online": [], "offline": [self.user_id]})
+
+    def test_brief_visit_is_never_announced(self):
+        self.connect("tab-1")
+        presence.remove_session("tab-1")
+        self.assertEqual(presence.pop_changes(), {"online": [], "offline": []})
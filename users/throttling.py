@@ -0,0 +1,83 @@
+"""
+Sliding-window attempt throttling lưu trong bộ nhớ process
+"""
+import time
+from collections import defaultdict, deque
+
+
+class SlidingWindowCounter:
+    """Giới hạn số lần thử của mỗi khóa (IP, email...) trong một cửa sổ thời gian trượt."""
+
+    SWEEP_EVERY = 1024
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._hits = defaultdict(deque)
+        self._calls = 0
+
+    def hit(self, key: str) -> float:
+        """
+        Ghi nhận một lần thử.
+
+        Returns:
+            Số giây phải chờ trước khi được thử tiếp, 0 nếu lần thử này được phép
+        """
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+
+        hits = self._hits[key]
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return hits[0] + self.window - now
+        hits.append(now)
+        return 0
+
+    def _sweep(self, now: float):
+        """Bỏ các khóa không còn lần thử nào trong cửa sổ để bộ nhớ không tăng mãi."""
+        cutoff = now - self.window
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
+
+
+class TokenBucket:
+    """
+    Token bucket theo khóa: mỗi khóa có tối đa burst token, hồi rate token mỗi giây.
+
+    Chỉ lưu (số token, thời điểm cập nhật) cho mỗi khóa nên mỗi lần kiểm tra là O(1).
+    """
+
+    SWEEP_EVERY = 4096
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._calls = 0
+
+    def take(self, key, cost: float = 1.0) -> bool:
+        """Lấy cost token của khóa; False nếu không đủ (không trừ token)."""
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < cost:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - cost, now)
+        return True
+
+    def forget(self, key):
+        self._buckets.pop(key, None)
+
+    def _sweep(self, now: float):
+        """Bỏ các khóa đã hồi đầy token (không khác gì khóa mới)."""
+        full_after = self.burst / self.rate if self.rate else float("inf")
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
@@ -0,0 +1,113 @@
+"""
+Token blacklist fast path: bộ lọc jti trong cache dùng chung để phần lớn lượt refresh không cần hỏi DB
+
+Mỗi jti bị thu hồi (logout, xoay vòng refresh token) được ghi vào cache TOKEN_BLACKLIST_CACHE_ALIAS
+tới khi token hết hạn; lần đầu gặp cache trống (mới khởi động, bị xóa) thì nạp lại mọi jti còn hạn
+từ bảng BlacklistedToken rồi mới đặt cờ đã nạp. Chỉ khi jti có trong cache mới kiểm tra lại bằng DB.
+
+Bộ lọc phải nằm ở cache mà mọi worker cùng thấy và không tự loại khóa (vd Redis noeviction):
+thu hồi ở worker này phải có hiệu lực ở worker khác. Khi chưa cấu hình alias, hoặc alias trỏ
+tới cache riêng từng process (LocMemCache, DummyCache), mọi lượt refresh đều hỏi DB như cũ.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+_LOADED_KEY = "jwt:blacklisted:loaded"
+
+
+def _cache_key(jti: str) -> str:
+    return f"jwt:blacklisted:{jti}"
+
+
+def _shared_cache():
+    """Cache dùng chung của bộ lọc, hoặc None nếu không có (khi đó luôn hỏi DB)."""
+    alias = settings.TOKEN_BLACKLIST_CACHE_ALIAS
+    if not alias:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def _ensure_loaded(cache):
+    if cache.get(_LOADED_KEY):
+        return
+    # Khóa cũ nhất còn hạn sống tối đa bằng thời hạn refresh token
+    timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    jtis = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        .values_list("token__jti", flat=True)
+        .iterator(chunk_size=5000)
+    )
+    batch = {}
+    for jti in jtis:
+        batch[_cache_key(jti)] = True
+        if len(batch) >= 5000:
+            cache.set_many(batch, timeout=timeout)
+            batch = {}
+    cache.set_many(batch, timeout=timeout)
+    cache.set(_LOADED_KEY, True, timeout=None)
+
+
+def might_be_blacklisted(jti: str) -> bool:
+    """False nghĩa là chắc chắn chưa bị thu hồi; True thì cần kiểm tra lại bằng DB."""
+    cache = _shared_cache()
+    if cache is None:
+        return True
+    _ensure_loaded(cache)
+    return cache.get(_cache_key(jti)) is not None
+
+
+def remember_blacklisted(jti: str, exp: int):
+    """Ghi jti vừa bị thu hồi vào cache dùng chung tới khi token hết hạn."""
+    cache = _shared_cache()
+    if cache is not None:
+        cache.set(_cache_key(jti), True, timeout=max(int(exp - time.time()), 1))
+
+
+def purge_expired_tokens(batch_size: int = 500, pause: float = 0.0) -> int:
+    """
+    Xóa dần các token đã hết hạn theo thứ tự expires_at (có index), mỗi lần một lô nhỏ.
+
+    Args:
+        batch_size: Số dòng OutstandingToken xóa mỗi lô (BlacklistedToken bị xóa theo cascade)
+        pause: Số giây nghỉ giữa các lô để không giữ khóa bảng lâu
+
+    Returns:
+        Tổng số OutstandingToken đã xóa
+    """
+    purged = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=aware_utcnow())
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken chỉ truy vấn bảng blacklist khi bộ lọc báo có thể đã bị thu hồi."""
+
+    def check_blacklist(self):
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        remember_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        return result
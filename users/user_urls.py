@@ -1,9 +1,23 @@
 from django.urls import path
 
-from .views import LeaderboardView, ProfileUpdateView, PublicProfileView
+from .views import (
+    LeaderboardView,
+    OnlineUsersView,
+    PeriodLeaderboardView,
+    ProfileUpdateView,
+    PublicProfileView,
+    RatingHistoryView,
+    ResponseCacheStatsView,
+    UserSearchView,
+)
 
 urlpatterns = [
     path("leaderboard/", LeaderboardView.as_view(), name="leaderboard"),
+    path("leaderboard/<str:period>/", PeriodLeaderboardView.as_view(), name="period_leaderboard"),
     path("profile/", ProfileUpdateView.as_view(), name="profile_update"),
     path("<int:pk>/", PublicProfileView.as_view(), name="user_profile"),
+    path("<int:pk>/rating-history/", RatingHistoryView.as_view(), name="rating_history"),
+    path("search/", UserSearchView.as_view(), name="user_search"),
+    path("online/", OnlineUsersView.as_view(), name="online_users"),
+    path("cache-stats/", ResponseCacheStatsView.as_view(), name="response_cache_stats"),
 ]
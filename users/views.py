@@ -1,11 +1,30 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import permissions, status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import CustomUser
+from . import presence, search
+from .avatars import AVATAR_CONTENT_TYPES, AVATAR_LIST_SIZE, AVATAR_SIZES, avatar_url, negotiate_format, variant_path
+from .cache import LEADERBOARD_VERSION, acached_response, bump, bump_users, cache_stats, cached_response, user_version
+from .hashing import HashPoolFull, acheck_password, ahash_password
+from .models import CustomUser, PeriodStanding, Season, SeasonResult
+from .rating_history import RESOLUTIONS, aseries
+from .standings import DEFAULT_ORDER, ORDERINGS, SEASON, acurrent_season, month_key, week_key
 from .serializers import (
+	FilteredTokenRefreshSerializer,
 	LeaderboardSerializer,
 	LoginSerializer,
 	ProfileSerializer,
@@ -14,34 +33,159 @@ from .serializers import (
 	RegisterSerializer,
 	UserMeSerializer,
 )
+from .throttling import SlidingWindowCounter
+from .tokens import FilteredRefreshToken
 
+ip_throttle = SlidingWindowCounter(*settings.AUTH_THROTTLE_IP)
+email_throttle = SlidingWindowCounter(*settings.AUTH_THROTTLE_EMAIL)
 
-class RegisterView(APIView):
-	permission_classes = [permissions.AllowAny]
 
-	def post(self, request):
-		serializer = RegisterSerializer(data=request.data)
-		if serializer.is_valid():
-			user = serializer.save()
-			tokens = RefreshToken.for_user(user)
-			return Response({
-				"token": str(tokens.access_token),
-				"user_id": user.id,
-			}, status=status.HTTP_201_CREATED)
-		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def too_many_requests(detail, retry_after):
+	response = JsonResponse({"detail": detail}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+	response["Retry-After"] = str(math.ceil(retry_after))
+	return response
 
 
-class LoginView(APIView):
-	permission_classes = [permissions.AllowAny]
+class AsyncAPIView(View):
+	"""
+	Endpoint async chạy thẳng trên event loop dùng chung với Socket.IO: ORM async, không
+	chuyển sang thread như APIView. JWT được kiểm tra không cần truy vấn DB: request.user là
+	TokenUser và request.user_id là id người dùng (None nếu chưa đăng nhập); trả về JsonResponse.
 
-	def post(self, request):
-		serializer = LoginSerializer(data=request.data)
-		if serializer.is_valid():
-			return Response({
-				"access_token": serializer.validated_data["access"],
-				"refresh_token": serializer.validated_data["refresh"],
-			}, status=status.HTTP_200_OK)
-		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+	Token không bị thu hồi khi tài khoản bị khóa hay xóa, nên các method ghi liệt kê trong
+	active_user_methods kiểm tra thêm tài khoản còn hoạt động (một truy vấn theo khóa chính).
+	"""
+	authentication = JWTStatelessUserAuthentication()
+	authentication_required = False
+	active_user_methods = ()
+
+	@classmethod
+	def as_view(cls, **initkwargs):
+		# Giống APIView: API xác thực bằng JWT, không dùng session nên bỏ CSRF
+		return csrf_exempt(super().as_view(**initkwargs))
+
+	async def dispatch(self, request, *args, **kwargs):
+		request.user_id = None
+		if self.authentication is not None:
+			# Giống APIView: token sai bị từ chối kể cả ở endpoint không bắt buộc đăng nhập
+			try:
+				result = self.authentication.authenticate(request)
+			except AuthenticationFailed as exc:
+				return self.unauthorized(exc.detail)
+			if result is not None:
+				request.user = result[0]
+				# Claim user_id trong token là chuỗi
+				request.user_id = int(request.user.id)
+				if request.method.lower() in self.active_user_methods and not await self.user_is_active(request.user_id):
+					return self.unauthorized({"detail": "Tài khoản không tồn tại hoặc đã bị khóa.", "code": "user_inactive"})
+			elif self.authentication_required:
+				return self.unauthorized(NotAuthenticated.default_detail)
+		return await super().dispatch(request, *args, **kwargs)
+
+	@staticmethod
+	async def user_is_active(user_id):
+		return await CustomUser.objects.filter(id=user_id, is_active=True).aexists()
+
+	def unauthorized(self, detail):
+		response = JsonResponse(detail if isinstance(detail, dict) else {"detail": detail}, status=status.HTTP_401_UNAUTHORIZED)
+		response["WWW-Authenticate"] = self.authentication.authenticate_header(None)
+		return response
+
+	@staticmethod
+	def parse_body(request):
+		if request.content_type == "application/json":
+			try:
+				return json.loads(request.body or b"{}")
+			except ValueError:
+				return None
+		return request.POST
+
+
+class AsyncAuthView(AsyncAPIView):
+	"""
+	Endpoint đăng nhập/đăng ký chạy async: PBKDF2 chạy ở pool process riêng
+	nên không chiếm worker xử lý các request khác.
+	"""
+	authentication = None
+	http_method_names = ["post"]
+
+	@staticmethod
+	def throttled(*waits):
+		wait = max(waits)
+		if wait:
+			return too_many_requests("Thử quá nhiều lần, vui lòng thử lại sau.", wait)
+		return None
+
+	@staticmethod
+	def busy():
+		return too_many_requests("Máy chủ đang bận, vui lòng thử lại sau.", 1)
+
+
+class RegisterView(AsyncAuthView):
+	async def post(self, request):
+		throttled = self.throttled(ip_throttle.hit(request.META.get("REMOTE_ADDR", "")))
+		if throttled:
+			return throttled
+		data = self.parse_body(request)
+		if data is None:
+			return JsonResponse({"detail": "Dữ liệu không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+
+		serializer = RegisterSerializer(data=data)
+		if not await sync_to_async(serializer.is_valid)():
+			return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			password_hash = await ahash_password(serializer.validated_data["password"])
+		except HashPoolFull:
+			return self.busy()
+
+		user = await sync_to_async(serializer.save)(password_hash=password_hash)
+		bump(LEADERBOARD_VERSION)
+		search.invalidate()
+		tokens = await sync_to_async(RefreshToken.for_user)(user)
+		return JsonResponse({
+			"token": str(tokens.access_token),
+			"user_id": user.id,
+		}, status=status.HTTP_201_CREATED)
+
+
+class LoginView(AsyncAuthView):
+	async def post(self, request):
+		data = self.parse_body(request)
+		if data is None:
+			return JsonResponse({"detail": "Dữ liệu không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+		serializer = LoginSerializer(data=data)
+		if not serializer.is_valid():
+			return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+		email = serializer.validated_data["email"]
+		password = serializer.validated_data["password"]
+
+		throttled = self.throttled(
+			ip_throttle.hit(request.META.get("REMOTE_ADDR", "")),
+			email_throttle.hit(email.lower()),
+		)
+		if throttled:
+			return throttled
+
+		user = await CustomUser.objects.filter(email=email).afirst()
+		try:
+			if user:
+				valid = await acheck_password(password, user.password)
+			else:
+				# Vẫn băm một lần để thời gian phản hồi không lộ email có tồn tại hay không
+				await ahash_password(password)
+				valid = False
+		except HashPoolFull:
+			return self.busy()
+
+		# Như authenticate(): tài khoản bị vô hiệu hóa nhận cùng lỗi, không lộ mật khẩu đã đúng
+		if not valid or not user.is_active:
+			return JsonResponse({"non_field_errors": ["Email hoặc mật khẩu không đúng."]}, status=status.HTTP_400_BAD_REQUEST)
+
+		tokens = await sync_to_async(RefreshToken.for_user)(user)
+		return JsonResponse({
+			"access_token": str(tokens.access_token),
+			"refresh_token": str(tokens),
+		}, status=status.HTTP_200_OK)
 
 
 class LogoutView(APIView):
@@ -52,7 +196,7 @@ class LogoutView(APIView):
 		if not refresh_token:
 			return Response({"detail": "Missing refresh_token"}, status=status.HTTP_400_BAD_REQUEST)
 		try:
-			token = RefreshToken(refresh_token)
+			token = FilteredRefreshToken(refresh_token)
 			token.blacklist()
 		except Exception:
 			return Response({"detail": "Token không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
@@ -63,17 +207,26 @@ class RefreshTokenView(APIView):
 	permission_classes = [permissions.AllowAny]
 
 	def post(self, request):
-		serializer = TokenRefreshSerializer(data=request.data)
+		serializer = FilteredTokenRefreshSerializer(data=request.data)
 		if serializer.is_valid():
 			return Response({"access_token": serializer.validated_data.get("access")}, status=status.HTTP_200_OK)
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class MeView(APIView):
+	# Xác thực chỉ bằng chữ ký token để request 304 không phải truy vấn user
+	authentication_classes = [JWTStatelessUserAuthentication]
 	permission_classes = [permissions.IsAuthenticated]
 
 	def get(self, request):
-		data = UserMeSerializer(request.user).data
+		user_id = request.user.id
+		return cached_response(request, user_version(user_id), f"me:{user_id}", lambda: self.build(user_id))
+
+	def build(self, user_id):
+		user = CustomUser.objects.filter(pk=user_id, is_active=True).first()
+		if user is None:
+			return Response({"detail": "Không tìm thấy người dùng."}, status=status.HTTP_404_NOT_FOUND)
+		data = UserMeSerializer(user).data
 		return Response(data, status=status.HTTP_200_OK)
 
 
@@ -85,25 +238,158 @@ class ProfileView(APIView):
 		return Response(data, status=status.HTTP_200_OK)
 
 
-class LeaderboardView(APIView):
-	permission_classes = [permissions.AllowAny]
+class LeaderboardView(AsyncAPIView):
+	async def get(self, request):
+		return await acached_response(request, LEADERBOARD_VERSION, "leaderboard", lambda: self.build(request))
 
-	def get(self, request):
-		users = CustomUser.objects.order_by("-elo", "-wins")[:20]
-		data = LeaderboardSerializer(users, many=True).data
-		return Response(data, status=status.HTTP_200_OK)
+	async def build(self, request):
+		users = [user async for user in CustomUser.objects.order_by("-elo", "-wins")[:20]]
+		return status.HTTP_200_OK, LeaderboardSerializer(users, many=True, context={"request": request}).data
 
 
-class PublicProfileView(APIView):
-	permission_classes = [permissions.AllowAny]
+async def _aenumerate(queryset, start=1):
+	rank = start
+	async for row in queryset:
+		yield rank, row
+		rank += 1
 
-	def get(self, request, pk):
+
+class PeriodLeaderboardView(AsyncAPIView):
+	"""
+	Bảng xếp hạng theo kỳ đọc từ PeriodStanding: week (mặc định theo số trận thắng), month (theo ELO
+	tăng thêm), season (theo điểm); đổi cách xếp bằng ?order=wins|elo_gain|points, xem mùa cũ bằng ?season=N.
+	"""
+	limit = 20
+
+	async def get(self, request, period):
+		if period not in PeriodStanding.Kind.values:
+			return JsonResponse({"detail": "Không tìm thấy bảng xếp hạng."}, status=status.HTTP_404_NOT_FOUND)
+		order = request.GET.get("order", DEFAULT_ORDER[period])
+		if order not in ORDERINGS:
+			return JsonResponse({"detail": f"order phải là một trong: {', '.join(ORDERINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+		season = request.GET.get("season")
+		if season is not None:
+			if period != SEASON:
+				return JsonResponse({"detail": "season chỉ dùng cho bảng xếp hạng mùa."}, status=status.HTTP_400_BAD_REQUEST)
+			try:
+				number = int(season)
+			except ValueError:
+				return JsonResponse({"detail": "season phải là số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+			variant = f"leaderboard:archive:{number}:{order}"
+			return await acached_response(request, LEADERBOARD_VERSION, variant, lambda: self.build_archive(request, number, order))
+
+		now = timezone.now()
+		if period == SEASON:
+			key = (await acurrent_season()).key
+		else:
+			key = week_key(now) if period == PeriodStanding.Kind.WEEK else month_key(now)
+		# Khóa kỳ nằm trong variant nên sang tuần/tháng mới là có response mới dù version chưa đổi
+		variant = f"leaderboard:{period}:{key}:{order}"
+		return await acached_response(request, LEADERBOARD_VERSION, variant, lambda: self.build(request, period, key, order))
+
+	def entry(self, request, rank, row):
+		return {
+			"rank": rank,
+			"user": LeaderboardSerializer(row.user, context={"request": request}).data,
+			"games": row.games,
+			"wins": row.wins,
+			"losses": row.losses,
+			"draws": row.draws,
+			"elo_gain": row.elo_gain,
+			"points": row.points,
+		}
+
+	async def build(self, request, period, key, order):
+		rows = PeriodStanding.objects.filter(kind=period, period=key).select_related("user").order_by(*ORDERINGS[order])
+		results = [self.entry(request, rank, row) async for rank, row in _aenumerate(rows[:self.limit])]
+		return status.HTTP_200_OK, {"period": period, "key": key, "order": order, "results": results}
+
+	async def build_archive(self, request, number, order):
+		rows = SeasonResult.objects.filter(season__number=number, season__archived=True).select_related("user")
+		if order == DEFAULT_ORDER[SEASON]:
+			rows = rows.order_by("rank")
+		else:
+			rows = rows.order_by(*ORDERINGS[order])
+		results = []
+		async for rank, row in _aenumerate(rows[:self.limit]):
+			entry = self.entry(request, rank, row)
+			entry["final_rank"] = row.rank
+			entry["final_elo"] = row.elo
+			results.append(entry)
+		if not results and not await Season.objects.filter(number=number, archived=True).aexists():
+			return status.HTTP_404_NOT_FOUND, {"detail": "Mùa này chưa kết thúc hoặc không tồn tại."}
+		return status.HTTP_200_OK, {"period": SEASON, "key": f"S{number}", "order": order, "results": results}
+
+
+class PublicProfileView(AsyncAPIView):
+	async def get(self, request, pk):
+		return await acached_response(request, user_version(pk), f"profile:{pk}", lambda: self.build(request, pk))
+
+	async def build(self, request, pk):
 		try:
-			user = CustomUser.objects.get(pk=pk)
+			user = await CustomUser.objects.select_related("stats").aget(pk=pk)
 		except CustomUser.DoesNotExist:
-			return Response({"detail": "Không tìm thấy người dùng."}, status=status.HTTP_404_NOT_FOUND)
-		data = PublicProfileSerializer(user, context={"request": request}).data
-		return Response(data, status=status.HTTP_200_OK)
+			return status.HTTP_404_NOT_FOUND, {"detail": "Không tìm thấy người dùng."}
+		return status.HTTP_200_OK, PublicProfileSerializer(user, context={"request": request}).data
+
+
+class RatingHistoryView(AsyncAPIView):
+	"""Lịch sử ELO cho biểu đồ: ?resolution=raw|day|week (mặc định day), ?days=365."""
+	max_days = 3650
+
+	async def get(self, request, pk):
+		resolution = request.GET.get("resolution", "day")
+		if resolution not in RESOLUTIONS:
+			return JsonResponse({"detail": f"resolution phải là một trong: {', '.join(RESOLUTIONS)}."}, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			days = int(request.GET.get("days", 365))
+		except ValueError:
+			return JsonResponse({"detail": "days phải là số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+		if not 1 <= days <= self.max_days:
+			return JsonResponse({"detail": f"days phải từ 1 đến {self.max_days}."}, status=status.HTTP_400_BAD_REQUEST)
+		variant = f"rating:{pk}:{resolution}:{days}"
+		return await acached_response(request, user_version(pk), variant, lambda: self.build(pk, resolution, days))
+
+	async def build(self, pk, resolution, days):
+		points = await aseries(pk, RESOLUTIONS[resolution], days)
+		if not points and not await CustomUser.objects.filter(pk=pk).aexists():
+			return status.HTTP_404_NOT_FOUND, {"detail": "Không tìm thấy người dùng."}
+		return status.HTTP_200_OK, {"user_id": pk, "resolution": resolution, "days": days, "points": points}
+
+
+class UserSearchView(AsyncAPIView):
+	"""Tìm người chơi theo tiền tố username/họ tên (?q=), không phân biệt hoa thường và dấu; ?limit tối đa 20."""
+	max_query_length = 50
+	max_limit = 20
+
+	async def get(self, request):
+		query = request.GET.get("q", "").strip()
+		if not query or len(query) > self.max_query_length:
+			return JsonResponse({"detail": f"q phải có từ 1 đến {self.max_query_length} ký tự."}, status=status.HTTP_400_BAD_REQUEST)
+		if not search.normalize(query):
+			# vd chỉ gồm dấu thanh đứng riêng
+			return JsonResponse({"detail": "q không có ký tự nào để tìm."}, status=status.HTTP_400_BAD_REQUEST)
+		try:
+			limit = int(request.GET.get("limit", 10))
+		except ValueError:
+			return JsonResponse({"detail": "limit phải là số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+		if not 1 <= limit <= self.max_limit:
+			return JsonResponse({"detail": f"limit phải từ 1 đến {self.max_limit}."}, status=status.HTTP_400_BAD_REQUEST)
+
+		users = await search.asearch(query, limit)
+		results = [
+			{
+				"id": user.id,
+				"username": user.username,
+				"full_name": user.full_name,
+				"elo": user.elo,
+				"avatar": avatar_url(user, AVATAR_LIST_SIZE, request),
+				"is_online": user.is_online,
+			}
+			for user in users
+		]
+		return JsonResponse({"query": query, "results": results}, status=status.HTTP_200_OK)
 
 
 class ProfileUpdateView(APIView):
@@ -117,5 +403,64 @@ class ProfileUpdateView(APIView):
 		serializer = ProfileUpdateSerializer(request.user, data=request.data, partial=True)
 		if serializer.is_valid():
 			serializer.save()
+			bump_users(request.user.id)
+			search.invalidate()
 			return Response(ProfileSerializer(request.user, context={"request": request}).data, status=status.HTTP_200_OK)
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class OnlineUsersView(APIView):
+	"""Ảnh chụp trạng thái online; ?ids=1,2,3 để chỉ hỏi một nhóm người dùng (vd danh sách bạn bè)."""
+	permission_classes = [permissions.AllowAny]
+	max_ids = 200
+
+	def get(self, request):
+		ids = request.query_params.get("ids")
+		if ids is None:
+			user_ids = presence.online_user_ids()
+		else:
+			try:
+				requested = [int(user_id) for user_id in ids.split(",") if user_id]
+			except ValueError:
+				return Response({"detail": "ids phải là danh sách số nguyên."}, status=status.HTTP_400_BAD_REQUEST)
+			if len(requested) > self.max_ids:
+				return Response({"detail": f"Tối đa {self.max_ids} ids mỗi lần."}, status=status.HTTP_400_BAD_REQUEST)
+			user_ids = [user_id for user_id in requested if presence.is_online(user_id)]
+		return Response({"online_count": presence.online_count(), "online": user_ids}, status=status.HTTP_200_OK)
+
+
+class ResponseCacheStatsView(APIView):
+	permission_classes = [permissions.IsAdminUser]
+
+	def get(self, request):
+		return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+def avatar_variant(request, digest, size, ext=None):
+	"""
+	Phục vụ ảnh đại diện đã xử lý bằng FileResponse; tên file theo hash nội dung nên cache vĩnh viễn.
+
+	URL không có phần mở rộng được chọn WebP/JPEG theo Accept (kèm Vary: Accept); URL có
+	phần mở rộng (.webp/.jpg) trả đúng file đó, có thể giao cho web server phục vụ thẳng
+	từ MEDIA_ROOT.
+	"""
+	size = int(size)
+	if size not in AVATAR_SIZES:
+		raise Http404
+	negotiated = ext is None
+	if negotiated:
+		ext = negotiate_format(request.headers.get("Accept", ""))
+	path = variant_path(digest, size, ext)
+	etag = f'"{digest}-{size}-{ext}"'
+
+	response = get_conditional_response(request, etag=etag)
+	if response is None:
+		try:
+			response = FileResponse(default_storage.open(path, "rb"), content_type=AVATAR_CONTENT_TYPES[ext])
+		except FileNotFoundError:
+			raise Http404
+	response["ETag"] = etag
+	response["Cache-Control"] = "public, max-age=31536000, immutable"
+	if negotiated:
+		patch_vary_headers(response, ("Accept",))
+	return response